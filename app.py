@@ -4,11 +4,10 @@ import os
 from functools import wraps
 from flask_cors import CORS
 import json
-import difflib
-import unicodedata
 import re
-import csv
 import random
+import math
+import itertools
 
 # =====================================================
 # Assicura che Python possa trovare i moduli locali
@@ -20,10 +19,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # IMPORT MODULI LOCALI (CHAT ORA FUNZIONA)
 # =====================================================
 from nutrition_ai import calcola_bmi
-from dispensa_ai import suggerisci_usi
+from dispensa_ai import suggerisci_usi, alert_utenti, DispensaScadenze
 from coach import genera_messaggio
 from utils import match_ricette, genera_procedimento
 from chat import register_chat_routes
+from indice_ngram import IndiceNgram, IndiceDizionario
+from catalogo_ricette import CatalogoRicette, firma_file
+from vocabolario_ingredienti import VocabolarioIngredienti, copertura_ids
+import motore_copertura
+from filtro_cibi import FiltroCibi
+from quantita import ParserQuantita, pesi_pezzo
+from piano_pasti import PianoPasti
+from ricette_utente import carica_ricette_utente, JournalRicette
+from metriche import registra_metriche, fase
+import snapshot_dati
+import archivio_nutrienti
+from archivio_nutrienti import ArchivioNutrienti, ALIAS as ALIMENTI_ALIAS, strip_accents, slugify_name
+from cache_risposte import CacheLRU, CacheRisposte, chiave_richiesta, CAPIENZA as CACHE_CAPIENZA, TTL as CACHE_TTL
 
 print("✅ Moduli AI caricati correttamente.")
 
@@ -32,86 +44,58 @@ print("✅ Moduli AI caricati correttamente.")
 # ===============================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# SNAPSHOT BINARIO (compila_dati.py): se è aggiornato sostituisce i JSON
+SNAPSHOT_DATI = snapshot_dati.apri(BASE_DIR)
+
 # RICETTE BASE
-try:
-    with open(os.path.join(BASE_DIR, "data", "italian_recipes.json"), "r", encoding="utf-8") as f:
-        ITALIAN_RECIPES = json.load(f)
-    if not isinstance(ITALIAN_RECIPES, dict):
+if SNAPSHOT_DATI is not None:
+    ITALIAN_RECIPES = SNAPSHOT_DATI.ricette
+    print("✅ italian_recipes caricate dallo snapshot")
+else:
+    try:
+        with open(os.path.join(BASE_DIR, "data", "italian_recipes.json"), "r", encoding="utf-8") as f:
+            ITALIAN_RECIPES = json.load(f)
+        if not isinstance(ITALIAN_RECIPES, dict):
+            ITALIAN_RECIPES = {}
+        print("✅ italian_recipes.json caricato")
+    except:
         ITALIAN_RECIPES = {}
-    print("✅ italian_recipes.json caricato")
-except:
-    ITALIAN_RECIPES = {}
 
-# RICETTE UTENTE
+# RICETTE UTENTE (snapshot compattato + journal append-only)
 USER_RECIPES_PATH = os.path.join(BASE_DIR, "data", "user_recipes.json")
-try:
-    if os.path.exists(USER_RECIPES_PATH):
-        with open(USER_RECIPES_PATH, "r", encoding="utf-8") as f:
-            USER_RECIPES = json.load(f)
-        if not isinstance(USER_RECIPES, dict):
-            USER_RECIPES = {}
-    else:
-        USER_RECIPES = {}
-    print("✅ user_recipes.json caricato")
-except:
-    USER_RECIPES = {}
+USER_RECIPES_JOURNAL_PATH = os.path.join(BASE_DIR, "data", "user_recipes.jsonl")
+USER_RECIPES = carica_ricette_utente(USER_RECIPES_PATH, USER_RECIPES_JOURNAL_PATH)
+JOURNAL_RICETTE = JournalRicette(USER_RECIPES_PATH, USER_RECIPES_JOURNAL_PATH)
+print(f"✅ user_recipes caricate ({len(USER_RECIPES)} ricette)")
 
-# NUTRIENTS
+# NUTRIENTS (un solo archivio per processo, condiviso con nutrition_ai.py)
 NUTRIENTS_PATH = os.path.join(BASE_DIR, "data", "nutrients.json")
-try:
-    with open(NUTRIENTS_PATH, "r", encoding="utf-8") as f:
-        RAW_NUTRIENTS = json.load(f)
-        NUTRIENTS = RAW_NUTRIENTS if isinstance(RAW_NUTRIENTS, dict) else {}
-    print(f"✅ nutrients.json caricato ({len(NUTRIENTS)} alimenti)")
-except:
-    NUTRIENTS = {}
+ARCHIVIO_NUTRIENTI = archivio_nutrienti.carica(BASE_DIR)
+NUTRIENTS = ARCHIVIO_NUTRIENTI.voci
+
+# versione dei nutrienti in memoria (entra nelle chiavi delle cache)
+VERSIONE_NUTRIENTI = firma_file(NUTRIENTS_PATH)
+
+# Indici n-grammi per il fuzzy match (costruiti una volta sola, o già
+# pronti nello snapshot)
+INDICE_NUTRIENTI = ARCHIVIO_NUTRIENTI.indice
+if SNAPSHOT_DATI is not None:
+    INDICE_NUTRIENTI_CANON = SNAPSHOT_DATI.indici["nutrienti_canon"]
+else:
+    INDICE_NUTRIENTI_CANON = IndiceNgram(k for k in NUTRIENTS if not k.startswith("food_"))
+
+# Indici sulle chiavi delle ricette ("_" → " "), user si aggiorna da solo
+INDICE_ITALIAN_RECIPES = IndiceDizionario(
+    ITALIAN_RECIPES, forma=lambda k: k.replace("_", " "),
+    indice=SNAPSHOT_DATI.indici["italian_recipes"] if SNAPSHOT_DATI is not None else None
+)
+INDICE_USER_RECIPES = IndiceDizionario(USER_RECIPES, forma=lambda k: k.replace("_", " "))
 
 # ===============================
 # ALIAS / NORMALIZZAZIONE NOMI
 # ===============================
-ALIMENTI_ALIAS = {
-    "mele": "mela",
-    "mela_rossa": "mela",
-    "mela_verde": "mela",
-    "banane": "banana",
-    "pere": "pera",
-    "arance": "arancia",
-    "pesche": "pesca",
-    "ciliegie": "ciliegia",
-
-    "pomodori": "pomodoro",
-    "pomodorini": "pomodoro",
-    "ciliegini": "pomodoro",
-    "datterini": "pomodoro",
-
-    "zucchine": "zucchina",
-    "melanzane": "melanzana",
-    "carote": "carota",
-    "cipolle": "cipolla",
-
-    "uova": "uovo",
-
-    "penne": "pasta_secca",
-    "spaghetti": "pasta_secca",
-    "fusilli": "pasta_secca",
-    "rigatoni": "pasta_secca",
-    "farfalle": "pasta_secca",
-}
-
-def strip_accents(s):
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', s)
-        if unicodedata.category(c) != 'Mn'
-    )
-
-def slugify_name(name):
-    if not isinstance(name, str):
-        return ""
-    s = name.strip().lower()
-    s = strip_accents(s)
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
-    return s
+# ALIMENTI_ALIAS, strip_accents e slugify_name vengono da
+# archivio_nutrienti.py, condivisi con nutrition_ai.py
 
 def normalizza_nome_piatto(nome):
     if not isinstance(nome, str):
@@ -135,50 +119,20 @@ def normalizza_nome_piatto(nome):
 # ===============================
 # QUANTITÀ → GRAMMI
 # ===============================
-def quantita_to_grams(alimento_name, quantita):
-    if isinstance(quantita, (int, float)):
-        s = str(quantita)
-    else:
-        s = str(quantita or "").lower().strip()
+def chiave_alimento(nome):
+    """Chiave di NUTRIENTS per il nome (normalizzazione + alias, senza fuzzy)."""
+    slug = slugify_name(normalizza_nome_piatto(nome))
+    return ALIMENTI_ALIAS.get(slug) or slug
 
-    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", s)
-    if not m:
-        return 0.0
-    num = float(m.group(1))
-
-    # unità note
-    if "kg" in s:
-        return num * 1000
-    if "mg" in s:
-        return num / 1000
-    if "ml" in s:
-        return num
-    if "l" in s and "ml" not in s:
-        return num * 1000
-    if "g" in s:
-        return num
-
-    # pezzi
-    is_piece = (
-        "pz" in s or
-        "pezzo" in s or
-        "pezzi" in s or
-        num <= 5
-    )
-
-    if is_piece:
-        slug = slugify_name(normalizza_nome_piatto(alimento_name))
-        alias = ALIMENTI_ALIAS.get(slug)
-        if alias:
-            slug = alias
+# grammatica compilata una volta, pesi dei pezzi precalcolati dai nutrienti
+PARSER_QUANTITA = ParserQuantita(pesi_pezzo(NUTRIENTS), chiave_alimento)
 
-        data = NUTRIENTS.get(slug, {})
-        peso = float(data.get("default_weight_g", 0) or 0)
-        if peso > 0:
-            return peso * num
-        return num * 100
+def quantita_to_grams(alimento_name, quantita):
+    return PARSER_QUANTITA.grammi(alimento_name, quantita)
 
-    return num
+def quantita_to_grams_molti(voci):
+    """[(alimento, quantita)] → [grammi]: per i batch."""
+    return PARSER_QUANTITA.grammi_molti(voci)
 
 # ===============================
 # KCAL PER INGREDIENTE
@@ -186,30 +140,74 @@ def quantita_to_grams(alimento_name, quantita):
 def get_kcal_ingrediente(nome, quantita_g):
     if quantita_g <= 0:
         return 0.0
+    return (quantita_g * kcal100_ingrediente(nome)) / 100.0
 
-    base = normalizza_nome_piatto(nome)
-    slug = slugify_name(base)
 
-    alias = ALIMENTI_ALIAS.get(slug)
-    if alias:
-        slug = alias
+def kcal100_ingrediente(nome):
+    """kcal per 100 g dell'ingrediente, 0.0 se non si trova in NUTRIENTS."""
+    return vettore_nutrienti(nome)[0]
 
-    data = NUTRIENTS.get(slug)
-    if not data:
-        best_key = None
-        best_score = 0
-        for k in NUTRIENTS:
-            score = difflib.SequenceMatcher(None, slug, k).ratio()
-            if score > best_score:
-                best_key = k
-                best_score = score
-        if best_score >= 0.75:
-            data = NUTRIENTS.get(best_key)
-        else:
-            return 0.0
 
-    kcal100 = float(data.get("kcal_per_100g", 0.0))
-    return (quantita_g * kcal100) / 100.0
+def chiave_nutrienti(nome):
+    """Chiave di NUTRIENTS per l'ingrediente (alias + fuzzy), None se non trovata."""
+    slug = chiave_alimento(nome)
+    if NUTRIENTS.get(slug):
+        return slug
+    best_key, _ = INDICE_NUTRIENTI.migliore(slug, 0.75)
+    if best_key and NUTRIENTS.get(best_key):
+        return best_key
+    return None
+
+
+# ===============================
+# VETTORI NUTRIENTI PER RICETTA
+# ===============================
+CAMPI_NUTRIENTI = archivio_nutrienti.CAMPI
+VETTORE_VUOTO = (0.0,) * len(CAMPI_NUTRIENTI)
+
+def vettore_nutrienti(nome):
+    """(kcal, carbo, proteine, grassi, fibre, zuccheri) per 100 g, dalle colonne dell'archivio."""
+    chiave = chiave_nutrienti(nome)
+    if chiave is None:
+        return VETTORE_VUOTO
+    return ARCHIVIO_NUTRIENTI.vettore(chiave)
+
+
+# id(ricetta) → (ricetta, righe), solo per le ricette in ITALIAN_RECIPES e
+# USER_RECIPES: la ricetta resta referenziata, quindi il suo id non può
+# essere riusato da un altro dict. Una ricetta utente sovrascritta esce
+# da qui insieme alla sua voce (metti_ricetta_utente).
+VETTORI_RICETTE = {}
+
+def calcola_vettori_ricetta(ricetta, cache_nomi=None):
+    """Risolve gli ingredienti: [(nome, quantita_g base, vettore per 100 g)]."""
+    righe = []
+    for ing in ricetta.get("ingredienti", []):
+        nome   = ing.get("nome", "")
+        base_q = float(ing.get("quantita_g", 0) or 0)
+        if base_q <= 0:
+            continue
+        if cache_nomi is None:
+            vett = vettore_nutrienti(nome)
+        else:
+            if nome not in cache_nomi:
+                cache_nomi[nome] = vettore_nutrienti(nome)
+            vett = cache_nomi[nome]
+        righe.append((nome, base_q, vett))
+    return tuple(righe)
+
+def prepara_vettori_ricetta(ricetta, cache_nomi=None):
+    """Vettori di una ricetta del catalogo, calcolati una volta e tenuti in VETTORI_RICETTE."""
+    righe = calcola_vettori_ricetta(ricetta, cache_nomi)
+    VETTORI_RICETTE[id(ricetta)] = (ricetta, righe)
+    return righe
+
+def vettori_ricetta(ricetta):
+    voce = VETTORI_RICETTE.get(id(ricetta))
+    if voce is not None and voce[0] is ricetta:
+        return voce[1]
+    # ricetta non (più) nel catalogo: calcolata al volo, non trattenuta
+    return calcola_vettori_ricetta(ricetta)
 
 # ===============================
 # CANONICALIZZAZIONE
@@ -227,16 +225,8 @@ def canonicalizza_alimento(nome):
     if slug in NUTRIENTS:
         return slug
 
-    best_key = None
-    best_score = 0
-    for k in NUTRIENTS:
-        if k.startswith("food_"):
-            continue
-        score = difflib.SequenceMatcher(None, slug, k).ratio()
-        if score > best_score:
-            best_key = k
-            best_score = score
-    if best_score >= 0.82:
+    best_key, _ = INDICE_NUTRIENTI_CANON.migliore(slug, 0.82)
+    if best_key:
         return best_key
 
     return slug
@@ -264,30 +254,34 @@ def trova_ricetta(alimento_raw):
     if slug in NUTRIENTS:
         return None, None
 
-    sorgenti = [("user", USER_RECIPES), ("base", ITALIAN_RECIPES)]
+    # user ha sempre la precedenza su base
+    sorgenti = [
+        ("user", USER_RECIPES, INDICE_USER_RECIPES),
+        ("base", ITALIAN_RECIPES, INDICE_ITALIAN_RECIPES),
+    ]
 
     # 1) match diretto
-    for src_name, DB in sorgenti:
+    for src_name, DB, _ in sorgenti:
         if slug in DB:
             return DB[slug], src_name
 
-    # 2) match parziale
-    for src_name, DB in sorgenti:
-        for k in DB:
-            if alimento in k.replace("_", " "):
-                return DB[k], src_name
+    # 2) match parziale (solo chiavi che contengono tutti gli n-grammi)
+    for src_name, DB, indice in sorgenti:
+        k = indice.primo_contenente(alimento)
+        if k is not None:
+            return DB[k], src_name
 
-    # 3) fuzzy match
+    # 3) fuzzy match (solo chiavi con n-grammi in comune);
+    # a parità di punteggio vince user, come nella scansione in ordine
     best = None
     best_score = 0
     best_src = None
-    for src_name, DB in sorgenti:
-        for k in DB:
-            score = difflib.SequenceMatcher(None, alimento, k.replace("_", " ")).ratio()
-            if score > best_score:
-                best = DB[k]
-                best_score = score
-                best_src = src_name
+    for src_name, DB, indice in sorgenti:
+        k, score = indice.migliore(alimento, 0.75)
+        if k is not None and score > best_score:
+            best = DB[k]
+            best_score = score
+            best_src = src_name
 
     if best and best_score >= 0.75:
         return best, best_src
@@ -322,9 +316,10 @@ def costruisci_ricetta_semplice(alimento_raw, quantita):
     }
 
 
-def stima_fattore_scala(alimento_raw, quantita, ricetta):
+def stima_fattore_scala(alimento_raw, quantita, ricetta, richiesti=None):
     base_peso = float(ricetta.get("peso_totale_piatto_g", 300))
-    richiesti = quantita_to_grams(alimento_raw, quantita)
+    if richiesti is None:
+        richiesti = quantita_to_grams(alimento_raw, quantita)
 
     if richiesti <= 0 or base_peso <= 0:
         return 1.0
@@ -332,17 +327,125 @@ def stima_fattore_scala(alimento_raw, quantita, ricetta):
     return richiesti / base_peso
 
 
+def metti_ricetta_utente(key, ricetta):
+    """USER_RECIPES[key] = ricetta, con i vettori della ricetta sostituita tolti dalla cache."""
+    vecchia = USER_RECIPES.get(key)
+    if vecchia is ricetta:
+        return
+    if vecchia is not None:
+        VETTORI_RICETTE.pop(id(vecchia), None)
+    USER_RECIPES[key] = ricetta
+    prepara_vettori_ricetta(ricetta)
+
+
 def salva_ricetta_semplice_user(alimento_raw, ricetta):
     key = slugify_name(alimento_raw)
     if not key or not ricetta:
         return
-    USER_RECIPES[key] = ricetta
-    try:
-        with open(USER_RECIPES_PATH, "w", encoding="utf-8") as f:
-            json.dump(USER_RECIPES, f, ensure_ascii=False, indent=2)
-        print("💾 user_recipes.json aggiornato")
-    except Exception as e:
-        print("❌ Errore salvataggio user_recipes.json:", e)
+    metti_ricetta_utente(key, ricetta)
+    # append O(1) sul journal, fuori dal percorso della richiesta
+    JOURNAL_RICETTE.registra(key, ricetta)
+
+
+def salva_ricette_semplici_user(nuove):
+    """Come salva_ricetta_semplice_user per più ricette, con un solo append."""
+    voci = []
+    for alimento_raw, ricetta in nuove:
+        key = slugify_name(alimento_raw)
+        if key and ricetta:
+            metti_ricetta_utente(key, ricetta)
+            voci.append((key, ricetta))
+    JOURNAL_RICETTE.registra_molte(voci)
+
+
+# Vettori nutrienti di tutte le ricette note, calcolati all'avvio
+# (quelli delle ricette base arrivano già pronti dallo snapshot)
+_cache_nomi = {}
+_da_calcolare = [USER_RECIPES]
+if SNAPSHOT_DATI is not None:
+    for _ricetta, _righe in zip(ITALIAN_RECIPES.values(), SNAPSHOT_DATI.vettori):
+        VETTORI_RICETTE[id(_ricetta)] = (_ricetta, _righe)
+else:
+    _da_calcolare.insert(0, ITALIAN_RECIPES)
+for _DB in _da_calcolare:
+    for _ricetta in _DB.values():
+        if isinstance(_ricetta, dict):
+            prepara_vettori_ricetta(_ricetta, _cache_nomi)
+print(f"✅ vettori nutrienti pronti ({len(VETTORI_RICETTE)} ricette)")
+del _cache_nomi, _da_calcolare
+
+
+def compila_snapshot_dati(path=None):
+    """Scrive lo snapshot binario dai dati in memoria (vedi compila_dati.py)."""
+    path = path or snapshot_dati.percorso_snapshot(BASE_DIR)
+    ricette = {k: r for k, r in ITALIAN_RECIPES.items() if isinstance(r, dict)}
+    if len(ricette) != len(ITALIAN_RECIPES):
+        raise ValueError("italian_recipes contiene voci che non sono ricette")
+    snapshot_dati.compila(
+        path,
+        nutrienti=NUTRIENTS,
+        ricette=ricette,
+        indici={
+            "nutrienti": INDICE_NUTRIENTI,
+            "nutrienti_canon": INDICE_NUTRIENTI_CANON,
+            "italian_recipes": INDICE_ITALIAN_RECIPES.indice,
+        },
+        vettori=[vettori_ricetta(r) for r in ricette.values()],
+        campi=CAMPI_NUTRIENTI,
+        base_dir=BASE_DIR,
+    )
+    return path
+
+
+# ===============================
+# PASTO: RICETTA + KCAL
+# ===============================
+def risolvi_ricetta_pasto(alimento_raw, quantita):
+    """(ricetta, sorgente, nuova): se nuova=True la ricetta va ancora salvata."""
+    ricetta, sorgente = trova_ricetta(alimento_raw)
+    if ricetta is None:
+        ricetta = costruisci_ricetta_semplice(alimento_raw, quantita)
+        if ricetta:
+            return ricetta, "user", True
+    return ricetta, sorgente, False
+
+
+def calcola_pasto(alimento_raw, quantita, porzioni, ricetta, sorgente, nuova, richiesti=None):
+    """Scala i vettori nutrienti precalcolati della ricetta sulla quantità."""
+    fattore = stima_fattore_scala(alimento_raw, quantita, ricetta, richiesti)
+
+    kcal_tot = 0.0
+    macro_tot = [0.0] * (len(CAMPI_NUTRIENTI) - 1)
+    ingredienti_finali = []
+    for nome, base_q, vett in vettori_ricetta(ricetta):
+        q_finale = base_q * fattore * porzioni
+        if q_finale <= 0:
+            continue
+
+        kcal_ing = (q_finale * vett[0]) / 100.0
+        kcal_tot += kcal_ing
+        for j in range(len(macro_tot)):
+            macro_tot[j] += (q_finale * vett[j + 1]) / 100.0
+
+        ingredienti_finali.append({
+            "nome": nome,
+            "quantita_g": round(q_finale, 1),
+            "kcal": round(kcal_ing, 1)
+        })
+
+    return {
+        "titolo": ricetta.get("titolo", alimento_raw),
+        "alimento_originale": alimento_raw,
+        "porzioni": porzioni,
+        "fattore_scala": round(fattore, 3),
+        "sorgente": sorgente or "sconosciuta",
+        "new_recipe": nuova,
+        "ingredienti": ingredienti_finali,
+        "kcal_totali": round(kcal_tot, 1),
+        "macro": {
+            c: round(v, 1) for c, v in zip(CAMPI_NUTRIENTI[1:], macro_tot)
+        }
+    }
 
 
 # ===============================
@@ -364,46 +467,17 @@ EQUIVALENZE = {
 # ===============================
 # COPERTURA INGREDIENTI
 # ===============================
-def copertura_ingredienti(ricetta_ingr, dispensa_norm):
-    disp_canon = [canonicalizza_alimento(d) for d in dispensa_norm]
-
-    def is_match(ing, disp, disp_canon_item):
-        ing = ing.lower().strip()
-        disp = disp.lower().strip()
-
-        if ing == disp:
-            return True
-
-        # Equivalenze dirette e reverse
-        if ing in EQUIVALENZE and disp in EQUIVALENZE[ing]:
-            return True
-        if disp in EQUIVALENZE and ing in EQUIVALENZE[disp]:
-            return True
-
-        # Canonicalizzazione
-        ing_canon = canonicalizza_alimento(ing)
-        if ing_canon == disp_canon_item:
-            return True
+def crea_vocabolario(ingredienti):
+    """Vocabolario a id interi con equivalenze e canonici precalcolati."""
+    return VocabolarioIngredienti(ingredienti, canonicalizza_alimento, EQUIVALENZE)
 
-        # Fuzzy fallback
-        if difflib.SequenceMatcher(None, ing, disp).ratio() >= 0.75:
-            return True
-
-        return False
 
+def copertura_ingredienti(ricetta_ingr, dispensa_norm):
     if not ricetta_ingr:
         return 0
-
-    tot = len(ricetta_ingr)
-    match = 0
-
-    for ingr in ricetta_ingr:
-        for d_raw, d_canon in zip(dispensa_norm, disp_canon):
-            if is_match(ingr, d_raw, d_canon):
-                match += 1
-                break
-
-    return int((match / tot) * 100)
+    vocab = crea_vocabolario(ricetta_ingr)
+    coperti = vocab.risolvi_dispensa(dispensa_norm)
+    return copertura_ids(vocab.ids_di(ricetta_ingr), coperti)
 
 
 # ===============================
@@ -440,12 +514,62 @@ def normalizza(x):
 # ===============================
 RECIPES_CSV_PATH = os.path.join(BASE_DIR, "recipes.csv")
 
+# porzione di riferimento per le kcal stimate delle ricette del CSV
+PORZIONE_PIANO_G = 300.0
+
+# Catalogo letto una volta sola, ricaricato solo se il CSV cambia
+def prepara_catalogo(snap):
+    """Interna gli ingredienti del catalogo in id interi e costruisce le posting list."""
+    snap.vocabolario = crea_vocabolario(
+        i for r in snap.ricette for i in r["ingredienti"]
+    )
+    for idx, r in enumerate(snap.ricette):
+        r["indice"] = idx
+        r["ingredienti_id"] = snap.vocabolario.ids_di(r["ingredienti"])
+    # ingrediente → ricette: una richiesta valuta solo i candidati
+    snap.posting = motore_copertura.PostingIngredienti(
+        [r["ingredienti_id"] for r in snap.ricette], len(snap.vocabolario)
+    )
+    for r in snap.ricette:
+        r["categoria"] = assegna_categoria(r["titolo"], r["ingredienti"])
+    # kcal stimate per /ai/piano: il CSV non ha grammature, quindi una
+    # porzione da PORZIONE_PIANO_G divisa in parti uguali tra gli
+    # ingredienti, con le forme canoniche già risolte dal vocabolario.
+    # Se un ingrediente manca in NUTRIENTS la stima è solo un minimo:
+    # kcal_note False e il piano non la confronta con l'obiettivo
+    kcal_termini = [None] * len(snap.vocabolario)
+    for canon, ids in snap.vocabolario.classi_canon.items():
+        if NUTRIENTS.get(canon):
+            kcal = ARCHIVIO_NUTRIENTI.vettore(canon)[0]
+            for i in ids:
+                kcal_termini[i] = kcal
+    for r in snap.ricette:
+        ids = r["ingredienti_id"]
+        termini = [kcal_termini[i] for i in ids]
+        kcal = sum(k or 0.0 for k in termini) * PORZIONE_PIANO_G / len(ids) / 100.0 if ids else 0.0
+        r["kcal_stimate"] = round(kcal, 1)
+        r["kcal_note"] = bool(ids) and None not in termini
+    # testo in minuscolo per i cibi non graditi, calcolato una volta sola
+    snap.filtro_cibi = FiltroCibi(
+        (r["titolo"] + " " + r["descrizione"]).lower() for r in snap.ricette
+    )
+    # classifica quando nessuna ricetta ha copertura > 0: con coperture
+    # tutte a 0 il sort stabile lascia l'ordine del catalogo
+    snap.classifica_default = tuple(range(len(snap.ricette)))
+
+
+CATALOGO_RICETTE = CatalogoRicette(RECIPES_CSV_PATH, prepara=prepara_catalogo)
+print(f"✅ recipes.csv caricato ({len(CATALOGO_RICETTE.snapshot())} ricette)")
+
 # ===============================
 # FLASK BASE + CORS
 # ===============================
 app = Flask(__name__)
 CORS(app, resources={r"/ai/*": {"origins": "*"}}, supports_credentials=False)
 
+# Latenze per route/fase esposte su /metrics
+registra_metriche(app)
+
 # Registra le rotte Chat AI solo se disponibili
 if 'register_chat_routes' in globals() and register_chat_routes:
     register_chat_routes(app)
@@ -489,16 +613,141 @@ def health():
         "status": "AI online ✅",
         "message": "Flask funziona correttamente.",
         "routes": [
-            "/ai/meal", "/ai/nutrizione", "/ai/ricette",
-            "/ai/procedimento", "/ai/coach", "/ai/dispensa",
-            "/ai/ricetta_singola"
+            "/ai/meal", "/ai/meal/batch", "/ai/nutrizione", "/ai/ricette",
+            "/ai/procedimento", "/ai/coach", "/ai/dispensa", "/ai/dispensa/batch",
+            "/ai/ricetta_singola", "/ai/piano", "/metrics"
         ],
         "nutrients_items": len(NUTRIENTS)
     })
 
+# ===============================
+# CACHE RISPOSTE RICETTE
+# ===============================
+CACHE_RICETTE = CacheRisposte("ricette", capienza=CACHE_CAPIENZA, ttl=CACHE_TTL)
+
+def chiave_cache_ricette(endpoint, catalogo, dispensa_norm, cibi_no, **altri):
+    """
+    Stessa chiave per richieste equivalenti: dispensa e cibi non graditi
+    ordinati e senza doppioni (l'ordine non cambia il risultato), più la
+    versione del catalogo e dei nutrienti per l'invalidazione automatica.
+    """
+    return chiave_richiesta(
+        endpoint=endpoint,
+        catalogo=catalogo.firma,
+        nutrienti=VERSIONE_NUTRIENTI,
+        dispensa=sorted(set(dispensa_norm)),
+        cibi_no=sorted(set(cibi_no)),
+        **altri
+    )
+
+def risposta_con_cache(chiave, calcola):
+    """Payload dalla cache o calcolato, con ETag e 304 se il client lo ha già."""
+    voce = CACHE_RICETTE.get(chiave)
+    if voce is None:
+        payload = calcola()
+        etag = CACHE_RICETTE.put(chiave, payload)
+    else:
+        etag, payload = voce
+
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        resp = jsonify(payload)
+    resp.set_etag(etag)
+    return resp
+
+def filtro_cibi_non_graditi(catalogo, cibi_no):
+    """
+    Funzione indice → True per le ricette da escludere, None se non si
+    esclude niente (nessun cibo non gradito, o li conterrebbero tutte).
+    """
+    if not cibi_no:
+        return None
+    with fase("dislike_filter"):
+        esclusi = catalogo.filtro_cibi.esclusi(cibi_no)
+    return esclusi.__contains__ if esclusi is not None else None
+
+def voce_ricetta(r, copertura, **extra):
+    voce = {
+        "titolo": r["titolo"],
+        "ingredienti": r["ingredienti"],
+        "tempo": r["tempo"],
+        "descrizione": r["descrizione"],
+        "copertura": copertura,
+        "categoria": r["categoria"]
+    }
+    voce.update(extra)
+    return voce
+
+def pesi_scadenze(catalogo, scadenze):
+    """Id ingrediente → peso della voce di dispensa che scade prima tra quelle che lo coprono."""
+    pesi = {}
+    for voce, peso in scadenze.pesi().items():
+        for i in catalogo.vocabolario.risolvi_voce(voce):
+            if peso > pesi.get(i, 0.0):
+                pesi[i] = peso
+    return pesi
+
+def migliori_ricette(catalogo, dispensa_norm, cibi_no, k, scadenze=None, **extra):
+    """
+    (voci, fallback): le k ricette con copertura più alta tra quelle che
+    hanno almeno un ingrediente in dispensa. Se nessuna ha copertura > 0
+    le prime k della classifica di default (fallback=True).
+
+    Con `scadenze` (DispensaScadenze) la classifica è per copertura
+    pesata: gli ingredienti che scadono presto contano di più.
+    """
+    ricette = catalogo.ricette
+    escludi = filtro_cibi_non_graditi(catalogo, cibi_no)
+
+    # copertura solo dei candidati e top-k con heap: niente più sort completo
+    with fase("coverage_scoring"):
+        if scadenze is not None:
+            pesate = catalogo.posting.migliori_pesati(pesi_scadenze(catalogo, scadenze), k, escludi)
+            if pesate:
+                return [
+                    voce_ricetta(ricette[i], cop, punteggio_scadenza=p, **extra)
+                    for i, cop, p in pesate
+                ], False
+            scelte = []
+        else:
+            # ogni voce della dispensa viene risolta una volta sola
+            coperti = catalogo.vocabolario.risolvi_dispensa(dispensa_norm)
+            scelte = catalogo.posting.migliori(coperti, k, escludi)
+
+    if scelte:
+        return [voce_ricetta(ricette[i], cop, **extra) for i, cop in scelte], False
+
+    # nessuna ricetta (non esclusa) con copertura > 0: tutte valgono 0
+    default = (i for i in catalogo.classifica_default if escludi is None or not escludi(i))
+    return [voce_ricetta(ricette[i], 0, **extra) for i in itertools.islice(default, k)], True
+
 # ===============================
 # /ai/ricette → 5 pasti giornalieri
 # ===============================
+def calcola_ricette(catalogo, dispensa_norm, cibi_no, max_ricette, scadenze=None):
+    # Se non ci sono ricette nel CSV
+    if not catalogo.ricette:
+        return {"ricette": []} if scadenze is None else {"ricette": [], "alert": scadenze.alert()}
+
+    scored, fallback = migliori_ricette(catalogo, dispensa_norm, cibi_no, max_ricette, scadenze=scadenze)
+
+    # Fallback se tutte copertura 0 → prendo comunque le prime N
+    if fallback:
+        print("⚠️ Fallback: nessuna ricetta con ingredienti in dispensa, uso migliori generiche")
+
+    # Assegno i 5 pasti: colazione, spuntino, pranzo, spuntino, cena
+    for i, r in enumerate(scored):
+        if i < len(PASTI_GIORNO):
+            r["pasto"] = PASTI_GIORNO[i]
+        else:
+            r["pasto"] = "Extra"
+
+    if scadenze is not None:
+        # gli stessi avvisi di /ai/dispensa, dal primo alimento che scade
+        return {"ricette": scored, "alert": scadenze.alert()}
+    return {"ricette": scored}
+
 @app.route("/ai/ricette", methods=["POST"])
 def ai_ricette():
     if not verifica_chiave():
@@ -512,78 +761,110 @@ def ai_ricette():
     max_ricette_req = int(data.get("max_ricette", 5))
     max_ricette     = max(1, min(5, max_ricette_req))
 
+    # Dispensa strutturata ({"nome", "scadenza"}): date lette una volta,
+    # classifica pesata per scadenza e avvisi nella stessa risposta
+    scadenze = None
+    altri = {}
+    if any(isinstance(x, dict) for x in dispensa):
+        scadenze = DispensaScadenze(dispensa)
+        dispensa = scadenze.nomi()
+        altri["scadenze"] = scadenze.firma()
+
     dispensa_norm = [normalizza(x) for x in dispensa]
+    cibi_no = [c.strip() for c in cibi_no_raw.split(",") if c.strip()]
 
-    # Carico recipes.csv
-    ricette = []
-    if os.path.exists(RECIPES_CSV_PATH):
-        with open(RECIPES_CSV_PATH, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                titolo = (row.get("titolo") or "").strip()
-                ingr   = (row.get("ingredienti") or "").strip()
-                tempo  = (row.get("tempo") or "").strip()
-                descr  = (row.get("descrizione") or "").strip()
-                if titolo and ingr:
-                    ingredienti = [i.strip().lower() for i in ingr.split(",") if i.strip()]
-                    ricette.append({
-                        "titolo": titolo,
-                        "ingredienti": ingredienti,
-                        "tempo": tempo,
-                        "descrizione": descr
-                    })
+    # Ricette dal catalogo in memoria
+    with fase("csv_load"):
+        catalogo = CATALOGO_RICETTE.snapshot()
 
-    # Se non ci sono ricette nel CSV
-    if not ricette:
-        return jsonify({"ricette": []})
+    chiave = chiave_cache_ricette(
+        "ricette", catalogo, dispensa_norm, cibi_no, max_ricette=max_ricette, **altri
+    )
+    return risposta_con_cache(
+        chiave, lambda: calcola_ricette(catalogo, dispensa_norm, cibi_no, max_ricette, scadenze)
+    )
 
-    # Filtro cibi non graditi
-    cibi_no = [c.strip() for c in cibi_no_raw.split(",") if c.strip()]
-    ricette_filtrate = []
-    for r in ricette:
-        testo = (r["titolo"] + " " + r["descrizione"]).lower()
-        if any(no in testo for no in cibi_no):
-            continue
-        ricette_filtrate.append(r)
-
-    if not ricette_filtrate:
-        ricette_filtrate = ricette
-
-    # Calcolo copertura e categoria
-    scored = []
-    for r in ricette_filtrate:
-        cop = copertura_ingredienti(r["ingredienti"], dispensa_norm)
-        scored.append({
-            "titolo": r["titolo"],
-            "ingredienti": r["ingredienti"],
-            "tempo": r["tempo"],
-            "descrizione": r["descrizione"],
-            "copertura": cop,
-            "categoria": assegna_categoria(r["titolo"], r["ingredienti"])
-        })
+# ===============================
+# /ai/ricetta_singola → rigenera un solo pasto
+# ===============================
+# Ogni richiesta "rigenera" riceve un cursore alla ricetta successiva della
+# stessa classifica: la classifica resta qui per CURSORI_TTL secondi e le
+# richieste col cursore non ricalcolano niente. Il cursore contiene la
+# chiave della richiesta (quindi anche la versione del catalogo) e la
+# posizione: se è di un'altra richiesta si riparte dalla prima ricetta, se
+# la classifica è scaduta la si ricalcola e si continua dalla posizione.
+LUNGHEZZA_CLASSIFICA = int(os.getenv("RICETTA_SINGOLA_CLASSIFICA", "50"))
+CLASSIFICHE_SINGOLE = CacheLRU(
+    "classifiche",
+    capienza=int(os.getenv("CURSORI_CAPIENZA", "1024")),
+    ttl=float(os.getenv("CURSORI_TTL", "600")),
+)
+LUNGHEZZA_TOKEN_CURSORE = 32
 
-    # Ordino per copertura
-    scored.sort(key=lambda x: x["copertura"], reverse=True)
+def crea_cursore(chiave, posizione):
+    return f"{chiave[:LUNGHEZZA_TOKEN_CURSORE]}.{posizione}"
 
-    # Fallback se tutte copertura 0 → prendo comunque le prime N
-    if all(r["copertura"] == 0 for r in scored):
-        print("⚠️ Fallback: nessuna ricetta con ingredienti in dispensa, uso migliori generiche")
-        scored = scored[:max_ricette]
-    else:
-        scored = [r for r in scored if r["copertura"] > 0][:max_ricette] or scored[:max_ricette]
+CURSORE_VALIDO = re.compile(rf"[0-9a-f]{{{LUNGHEZZA_TOKEN_CURSORE}}}\.[0-9]{{1,4}}")
 
-    # Assegno i 5 pasti: colazione, spuntino, pranzo, spuntino, cena
-    for i, r in enumerate(scored):
-        if i < len(PASTI_GIORNO):
-            r["pasto"] = PASTI_GIORNO[i]
-        else:
-            r["pasto"] = "Extra"
+def posizione_cursore(cursore, chiave):
+    """
+    Posizione nel cursore; None se il cursore non è nostro (malformato o
+    oltre la classifica). Un cursore di un'altra richiesta, o di prima di
+    un ricaricamento del catalogo (cambia la firma, quindi la chiave),
+    riparte dalla prima ricetta.
+    """
+    if not isinstance(cursore, str) or not CURSORE_VALIDO.fullmatch(cursore):
+        return None
+    token, _, posizione = cursore.partition(".")
+    posizione = int(posizione)
+    if posizione >= LUNGHEZZA_CLASSIFICA:
+        return None
+    if token != chiave[:LUNGHEZZA_TOKEN_CURSORE]:
+        return 0
+    return posizione
+
+def classifica_ricetta_singola(catalogo, dispensa_norm, cibi_no, pasto, chiave):
+    """
+    Le prime LUNGHEZZA_CLASSIFICA ricette per il pasto: quelle con
+    ingredienti in dispensa per copertura, poi le altre nell'ordine della
+    classifica di default.
+    """
+    voci = CLASSIFICHE_SINGOLE.get(chiave)
+    if voci is not None:
+        return voci
+
+    ricette = catalogo.ricette
+    escludi = filtro_cibi_non_graditi(catalogo, cibi_no)
+    with fase("coverage_scoring"):
+        coperti = catalogo.vocabolario.risolvi_dispensa(dispensa_norm)
+        scelte = catalogo.posting.migliori(coperti, LUNGHEZZA_CLASSIFICA, escludi)
+
+    prese = {i for i, _ in scelte}
+    resto = (
+        i for i in catalogo.classifica_default
+        if i not in prese and (escludi is None or not escludi(i))
+    )
+    scelte += [(i, 0) for i in itertools.islice(resto, LUNGHEZZA_CLASSIFICA - len(scelte))]
 
-    return jsonify({"ricette": scored})
+    voci = [voce_ricetta(ricette[i], cop, pasto=pasto) for i, cop in scelte]
+    CLASSIFICHE_SINGOLE.put(chiave, voci)
+    return voci
+
+def calcola_ricetta_singola(catalogo, dispensa_norm, cibi_no, pasto, chiave, posizione=0):
+    if not catalogo.ricette:
+        return {"ricetta": None}
+
+    voci = classifica_ricetta_singola(catalogo, dispensa_norm, cibi_no, pasto, chiave)
+    if not voci:
+        return {"ricetta": None}
+
+    # finita la classifica si ricomincia dalla prima
+    posizione %= len(voci)
+    return {
+        "ricetta": voci[posizione],
+        "cursore": crea_cursore(chiave, (posizione + 1) % len(voci)),
+    }
 
-# ===============================
-# /ai/ricetta_singola → rigenera un solo pasto
-# ===============================
 @app.route("/ai/ricetta_singola", methods=["POST"])
 def ai_ricetta_singola():
     if not verifica_chiave():
@@ -599,59 +880,100 @@ def ai_ricetta_singola():
         return jsonify({"error": "Missing 'pasto'"}), 400
 
     dispensa_norm = [normalizza(x) for x in dispensa]
-
-    ricette = []
-    if os.path.exists(RECIPES_CSV_PATH):
-        with open(RECIPES_CSV_PATH, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                titolo = (row.get("titolo") or "").strip()
-                ingr   = (row.get("ingredienti") or "").strip()
-                tempo  = (row.get("tempo") or "").strip()
-                descr  = (row.get("descrizione") or "").strip()
-                if titolo and ingr:
-                    ingredienti = [i.strip().lower() for i in ingr.split(",") if i.strip()]
-                    ricette.append({
-                        "titolo": titolo,
-                        "ingredienti": ingredienti,
-                        "tempo": tempo,
-                        "descrizione": descr
-                    })
-
-    if not ricette:
-        return jsonify({"ricetta": None})
-
-    # filtro cibi non graditi
     cibi_no = [c.strip() for c in cibi_no_raw.split(",") if c.strip()]
-    ricette_filtrate = []
-    for r in ricette:
-        testo = (r["titolo"] + " " + r["descrizione"]).lower()
-        if any(no in testo for no in cibi_no):
-            continue
-        ricette_filtrate.append(r)
-
-    if not ricette_filtrate:
-        ricette_filtrate = ricette
-
-    scored = []
-    for r in ricette_filtrate:
-        cop = copertura_ingredienti(r["ingredienti"], dispensa_norm)
-        scored.append({
-            "titolo": r["titolo"],
-            "ingredienti": r["ingredienti"],
-            "tempo": r["tempo"],
-            "descrizione": r["descrizione"],
-            "copertura": cop,
-            "categoria": assegna_categoria(r["titolo"], r["ingredienti"]),
-            "pasto": pasto
+
+    with fase("csv_load"):
+        catalogo = CATALOGO_RICETTE.snapshot()
+
+    chiave = chiave_cache_ricette(
+        "ricetta_singola", catalogo, dispensa_norm, cibi_no, pasto=pasto
+    )
+    cursore = data.get("cursore")
+    if cursore:
+        # "rigenera": la prossima della classifica, senza cache risposte
+        posizione = posizione_cursore(cursore, chiave)
+        if posizione is None:
+            return jsonify({"error": "CURSORE_NON_VALIDO"}), 400
+        return jsonify(calcola_ricetta_singola(
+            catalogo, dispensa_norm, cibi_no, pasto, chiave, posizione
+        ))
+
+    return risposta_con_cache(
+        chiave, lambda: calcola_ricetta_singola(catalogo, dispensa_norm, cibi_no, pasto, chiave)
+    )
+
+# ===============================
+# /ai/piano → settimana intera in una chiamata
+# ===============================
+MAX_GIORNI_PIANO = int(os.getenv("MAX_GIORNI_PIANO", "14"))
+
+def calcola_piano(catalogo, dispensa_norm, cibi_no, giorni, no_ripeti_giorni, kcal_giorno, seed):
+    if not catalogo.ricette:
+        return {"piano": []}
+
+    escludi = filtro_cibi_non_graditi(catalogo, cibi_no)
+
+    # il catalogo viene valutato una volta sola per tutta la settimana
+    with fase("coverage_scoring"):
+        coperti = catalogo.vocabolario.risolvi_dispensa(dispensa_norm)
+        coperture = dict(catalogo.posting.migliori(coperti, len(catalogo.ricette)))
+
+    with fase("plan_search"):
+        piano = PianoPasti(catalogo.ricette, coperture, seed=seed, escludi=escludi).settimana(
+            PASTI_GIORNO, giorni=giorni, no_ripeti_giorni=no_ripeti_giorni, kcal_giorno=kcal_giorno
+        )
+
+    giornate = []
+    for g, scelte in enumerate(piano, start=1):
+        pasti = [
+            voce_ricetta(
+                catalogo.ricette[i], coperture.get(i, 0), pasto=pasto,
+                kcal_stimate=catalogo.ricette[i]["kcal_stimate"],
+                kcal_note=catalogo.ricette[i]["kcal_note"]
+            )
+            for pasto, i in zip(PASTI_GIORNO, scelte)
+        ]
+        giornate.append({
+            "giorno": g,
+            "pasti": pasti,
+            # somma dei soli pasti con kcal note: parziale se ne manca qualcuno
+            "kcal_stimate": round(sum(p["kcal_stimate"] for p in pasti if p["kcal_note"]), 1),
+            "kcal_parziali": not all(p["kcal_note"] for p in pasti),
         })
+    return {"piano": giornate, "seed": seed}
+
+@app.route("/ai/piano", methods=["POST"])
+def ai_piano():
+    if not verifica_chiave():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(force=True) or {}
+    cibi_no_raw = (data.get("cibi_non_graditi") or "").lower()
+    dispensa    = data.get("dispensa", [])
+    try:
+        giorni      = max(1, min(MAX_GIORNI_PIANO, int(data.get("giorni", 7))))
+        no_ripeti   = max(1, int(data.get("no_ripetizioni_giorni", 3)))
+        seed        = int(data.get("seed", 0))
+        kcal_giorno = float(data.get("kcal_giornaliere") or 0) or None
+    except (TypeError, ValueError):
+        return jsonify({"error": "PARAMETRI_NON_VALIDI"}), 400
+    # "nan" e "inf" passano da float(): senza questo il piano e la chiave di cache impazziscono
+    if kcal_giorno is not None and (not math.isfinite(kcal_giorno) or kcal_giorno < 0):
+        return jsonify({"error": "PARAMETRI_NON_VALIDI"}), 400
 
-    scored.sort(key=lambda x: x["copertura"], reverse=True)
-    if not scored:
-        return jsonify({"ricetta": None})
+    dispensa_norm = [normalizza(x) for x in dispensa]
+    cibi_no = [c.strip() for c in cibi_no_raw.split(",") if c.strip()]
 
-    scelta = scored[0]
-    return jsonify({"ricetta": scelta})
+    with fase("csv_load"):
+        catalogo = CATALOGO_RICETTE.snapshot()
+
+    chiave = chiave_cache_ricette(
+        "piano", catalogo, dispensa_norm, cibi_no,
+        giorni=giorni, no_ripeti=no_ripeti, kcal_giorno=kcal_giorno, seed=seed
+    )
+    return risposta_con_cache(
+        chiave, lambda: calcola_piano(catalogo, dispensa_norm, cibi_no, giorni, no_ripeti, kcal_giorno, seed)
+    )
 
 # ===============================
 # /ai/meal → tasto "Ho mangiato qualcosa"
@@ -668,50 +990,99 @@ def ai_meal():
     if not alimento_raw:
         return jsonify({"error": "ALIMENTO_VUOTO"}), 400
 
-    ricetta, sorgente = trova_ricetta(alimento_raw)
-    nuova = False
-
-    if ricetta is None:
-        ricetta = costruisci_ricetta_semplice(alimento_raw, quantita)
-        if ricetta:
-            salva_ricetta_semplice_user(alimento_raw, ricetta)
-            sorgente = "user"
-            nuova = True
+    with fase("recipe_lookup"):
+        ricetta, sorgente, nuova = risolvi_ricetta_pasto(alimento_raw, quantita)
+    if nuova:
+        salva_ricetta_semplice_user(alimento_raw, ricetta)
 
     if ricetta is None:
         return jsonify({"error": "RICETTA_NON_TROVATA"}), 404
 
-    fattore = stima_fattore_scala(alimento_raw, quantita, ricetta)
+    with fase("kcal_resolution"):
+        pasto = calcola_pasto(alimento_raw, quantita, porzioni, ricetta, sorgente, nuova)
+    return jsonify(pasto)
 
+# ===============================
+# /ai/meal/batch → una giornata intera in una chiamata
+# ===============================
+MAX_ALIMENTI_BATCH = int(os.getenv("MAX_ALIMENTI_BATCH", "200"))
+
+@app.route("/ai/meal/batch", methods=["POST"])
+@require_api_key
+def ai_meal_batch():
+    data = request.get_json(force=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "RICHIESTA_NON_VALIDA"}), 400
+    alimenti = data.get("alimenti", [])
+
+    if not isinstance(alimenti, list):
+        return jsonify({"error": "ALIMENTI_NON_VALIDI"}), 400
+    if len(alimenti) > MAX_ALIMENTI_BATCH:
+        return jsonify({"error": "TROPPI_ALIMENTI", "max": MAX_ALIMENTI_BATCH}), 400
+
+    # cache per richiesta della sola ricerca nel catalogo/user (trova_ricetta):
+    # la ricetta semplice dipende dalla quantità e si ricostruisce per alimento
+    ricette_trovate = {}
+    nuove = []
+
+    voci = []
+    for item in alimenti:
+        item = item if isinstance(item, dict) else {}
+        voci.append((item, (item.get("alimento", "") or "").strip(), item.get("quantita", "0")))
+    # quantità → grammi in un colpo solo (testi e pesi ripetuti risolti una volta)
+    with fase("quantity_parsing"):
+        grammi = quantita_to_grams_molti([(a, q) for _, a, q in voci])
+
+    risultati = []
     kcal_tot = 0.0
-    ingredienti_finali = []
-    for ing in ricetta.get("ingredienti", []):
-        nome   = ing.get("nome", "")
-        base_q = float(ing.get("quantita_g", 0) or 0)
-        if base_q <= 0:
+    for (item, alimento_raw, quantita), richiesti in zip(voci, grammi):
+        try:
+            porzioni = float(item.get("porzioni", 1) or 1)
+        except (TypeError, ValueError):
+            risultati.append({"alimento_originale": alimento_raw, "error": "PORZIONI_NON_VALIDE"})
             continue
-        q_finale = base_q * fattore * porzioni
-        if q_finale <= 0:
+
+        if not alimento_raw:
+            risultati.append({"alimento_originale": alimento_raw, "error": "ALIMENTO_VUOTO"})
             continue
 
-        kcal_ing = get_kcal_ingrediente(nome, q_finale)
-        kcal_tot += kcal_ing
+        # stessi passi di risolvi_ricetta_pasto: ogni voce = una chiamata a /ai/meal
+        with fase("recipe_lookup"):
+            if alimento_raw not in ricette_trovate:
+                ricette_trovate[alimento_raw] = trova_ricetta(alimento_raw)
+            ricetta, sorgente = ricette_trovate[alimento_raw]
+            nuova = False
+            if ricetta is None:
+                ricetta = costruisci_ricetta_semplice(alimento_raw, quantita)
+                if ricetta:
+                    sorgente, nuova = "user", True
+        if nuova:
+            # subito in memoria (la vedono anche gli alimenti successivi), su
+            # disco alla fine; le ricerche già fatte possono cambiare esito
+            metti_ricetta_utente(slugify_name(alimento_raw), ricetta)
+            nuove.append((alimento_raw, ricetta))
+            ricette_trovate.clear()
+
+        if ricetta is None:
+            risultati.append({"alimento_originale": alimento_raw, "error": "RICETTA_NON_TROVATA"})
+            continue
 
-        ingredienti_finali.append({
-            "nome": nome,
-            "quantita_g": round(q_finale, 1),
-            "kcal": round(kcal_ing, 1)
-        })
+        with fase("kcal_resolution"):
+            pasto = calcola_pasto(alimento_raw, quantita, porzioni, ricetta, sorgente, nuova, richiesti)
+        kcal_tot += pasto["kcal_totali"]
+        risultati.append(pasto)
+
+    if nuove:
+        salva_ricette_semplici_user(nuove)
 
     return jsonify({
-        "titolo": ricetta.get("titolo", alimento_raw),
-        "alimento_originale": alimento_raw,
-        "porzioni": porzioni,
-        "fattore_scala": round(fattore, 3),
-        "sorgente": sorgente or "sconosciuta",
-        "new_recipe": nuova,
-        "ingredienti": ingredienti_finali,
-        "kcal_totali": round(kcal_tot, 1)
+        "risultati": risultati,
+        "totali": {
+            "alimenti": len(risultati),
+            "trovati": sum(1 for r in risultati if "error" not in r),
+            "nuove_ricette": len(nuove),
+            "kcal_totali": round(kcal_tot, 1)
+        }
     })
 
 # ===============================
@@ -739,6 +1110,26 @@ def ai_dispensa():
     risultati = suggerisci_usi(dispensa)
     return jsonify({"alert": risultati})
 
+# ===============================
+# /ai/dispensa/batch → avvisi per più utenti (JSON lines)
+# ===============================
+@app.route("/ai/dispensa/batch", methods=["POST"])
+@require_api_key
+def ai_dispensa_batch():
+    """
+    Una riga {"user_id", "dispensa"} per utente → una riga {"user_id",
+    "alert"} per utente, in streaming. Per i job con molti utenti c'è
+    notifiche_dispensa.py, che distribuisce le righe su più processi.
+    """
+    righe = request.get_data(as_text=True).splitlines()
+
+    def genera():
+        # "oggi" e la cache delle date valgono per tutte le righe
+        for r in alert_utenti(righe):
+            yield json.dumps(r, ensure_ascii=False) + "\n"
+
+    return app.response_class(genera(), mimetype="application/x-ndjson")
+
 # ===============================
 # /ai/procedimento → testo ricetta
 # ===============================
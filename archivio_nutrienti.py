@@ -0,0 +1,220 @@
+# ================================================================
+#  GoFoody AI - archivio_nutrienti.py (nutrients.json, uno per processo)
+# ================================================================
+#
+#  app.py e nutrition_ai.py leggono gli stessi nutrienti da qui: un solo
+#  caricamento (dallo snapshot binario se aggiornato, altrimenti dal
+#  JSON), un solo dict in memoria.
+
+import json
+import os
+import re
+import threading
+import unicodedata
+
+from indice_ngram import IndiceNgram
+import snapshot_dati
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NUTRIENTS_PATH = os.path.join(BASE_DIR, "data", "nutrients.json")
+
+# valori per 100 g, nell'ordine dei vettori nutrienti delle ricette
+CAMPI = ("kcal_per_100g", "carbs_g", "protein_g", "fat_g", "fiber_g", "sugar_g")
+
+
+# ---------------------------------------------------
+# ALIAS / SLUG
+# ---------------------------------------------------
+
+ALIAS = {
+    "mele": "mela",
+    "mela_rossa": "mela",
+    "mela_verde": "mela",
+    "banane": "banana",
+    "pere": "pera",
+    "arance": "arancia",
+    "pesche": "pesca",
+    "ciliegie": "ciliegia",
+
+    "pomodori": "pomodoro",
+    "pomodorini": "pomodoro",
+    "ciliegino": "pomodoro",
+    "ciliegini": "pomodoro",
+    "datterini": "pomodoro",
+
+    "zucchine": "zucchina",
+    "melanzane": "melanzana",
+    "carote": "carota",
+    "cipolle": "cipolla",
+
+    "uova": "uovo",
+
+    "penne": "pasta_secca",
+    "spaghetti": "pasta_secca",
+    "fusilli": "pasta_secca",
+    "rigatoni": "pasta_secca",
+    "farfalle": "pasta_secca",
+}
+
+
+def strip_accents(s):
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', s)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def slugify_name(name):
+    if not isinstance(name, str):
+        return ""
+    s = name.strip().lower()
+    s = strip_accents(s)
+    s = re.sub(r"[^a-z0-9]+", "_", s)
+    s = re.sub(r"_+", "_", s).strip("_")
+    return s
+
+
+def _numero(valore):
+    try:
+        return float(valore or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ---------------------------------------------------
+# ARCHIVIO
+# ---------------------------------------------------
+
+class ArchivioNutrienti:
+    """
+    Nutrienti per chiave (slug canonico), con:
+      - ricerca O(1) per chiave, alias o label
+      - colonne per nutriente (array NumPy se disponibile) nell'ordine
+        delle chiavi, per i calcoli su più alimenti insieme
+      - indice n-grammi sulle chiavi per le ricerche parziali e fuzzy
+
+    `voci` è il dict di nutrients.json così com'è, condiviso e non copiato.
+    """
+
+    def __init__(self, voci, alias=ALIAS, indice=None):
+        self.voci = voci
+        self.alias = alias
+        self.chiavi = list(voci)
+        self.posizione = {k: i for i, k in enumerate(self.chiavi)}
+
+        self.per_label = {}
+        for k, voce in voci.items():
+            label = voce.get("label") if isinstance(voce, dict) else None
+            if isinstance(label, str):
+                self.per_label.setdefault(label.strip().lower(), k)
+
+        righe = [voce if isinstance(voce, dict) else {} for voce in voci.values()]
+        self.colonne = {
+            c: [_numero(r.get(c)) for r in righe] for c in CAMPI
+        }
+        if np is not None:
+            self.colonne = {c: np.asarray(v, dtype=np.float64) for c, v in self.colonne.items()}
+
+        self.indice = indice if indice is not None else IndiceNgram(self.chiavi)
+
+    def __len__(self):
+        return len(self.voci)
+
+    def __contains__(self, chiave):
+        return chiave in self.voci
+
+    def get(self, chiave, default=None):
+        return self.voci.get(chiave, default)
+
+    def chiave(self, nome):
+        """Slug del nome con gli alias applicati (non dice se esiste)."""
+        slug = slugify_name(nome)
+        return self.alias.get(slug) or slug
+
+    def trova(self, nome):
+        """Chiave per slug, alias o label, senza fuzzy; None se manca."""
+        chiave = self.chiave(nome)
+        if chiave in self.voci:
+            return chiave
+        if isinstance(nome, str):
+            return self.per_label.get(nome.strip().lower())
+        return None
+
+    def trova_parziale(self, nome):
+        """
+        Come trova(), poi la prima chiave (in ordine di file) che contiene
+        il nome o ne è contenuta parola per parola.
+        """
+        chiave = self.trova(nome)
+        if chiave is not None:
+            return chiave
+        slug = self.chiave(nome)
+        if not slug:
+            return None
+
+        candidati = []
+        i = self.indice.primo_contenente(slug)
+        if i is not None:
+            candidati.append(i)
+        parole = slug.split("_")
+        for a in range(len(parole)):
+            for b in range(a + 1, len(parole) + 1):
+                pos = self.posizione.get("_".join(parole[a:b]))
+                if pos is not None:
+                    candidati.append(pos)
+        return self.chiavi[min(candidati)] if candidati else None
+
+    def vettore(self, chiave):
+        """Valori di CAMPI per 100 g."""
+        i = self.posizione[chiave]
+        return tuple(float(self.colonne[c][i]) for c in CAMPI)
+
+    def macro(self, chiave):
+        """CAMPI → valore per 100 g."""
+        return dict(zip(CAMPI, self.vettore(chiave)))
+
+
+# ---------------------------------------------------
+# CARICAMENTO (UNA VOLTA PER PROCESSO)
+# ---------------------------------------------------
+
+_caricati = {}
+_lock = threading.Lock()
+
+
+def _leggi_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            voci = json.load(f)
+        voci = voci if isinstance(voci, dict) else {}
+        print(f"✅ nutrients.json caricato ({len(voci)} alimenti)")
+        return voci
+    except Exception as e:
+        print("❌ Errore caricamento nutrients.json:", e)
+        return {}
+
+
+def carica(base_dir=BASE_DIR):
+    """ArchivioNutrienti condiviso da tutti i moduli del processo."""
+    with _lock:
+        archivio = _caricati.get(base_dir)
+        if archivio is not None:
+            return archivio
+
+        snapshot = snapshot_dati.apri(base_dir)
+        if snapshot is not None:
+            voci = snapshot.nutrienti
+            indice = snapshot.indici["nutrienti"]
+            print(f"✅ nutrienti caricati dallo snapshot ({len(voci)} alimenti)")
+        else:
+            voci = _leggi_json(os.path.join(base_dir, "data", "nutrients.json"))
+            indice = None
+
+        archivio = ArchivioNutrienti(voci, indice=indice)
+        _caricati[base_dir] = archivio
+        return archivio
@@ -0,0 +1,34 @@
+# ================================================================
+#  GoFoody AI - asgi.py (modalità ASGI: la chat non blocca i worker)
+# ================================================================
+#
+#  gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+#  (oppure: uvicorn asgi:app --workers 4)
+#
+#  Tutte le route Flask girano invariate attraverso a2wsgi, in un pool
+#  limitato di thread (GOFOODY_ASGI_THREAD); le risposte in streaming
+#  (/ai/dispensa/batch) restano in streaming. Per /ai/chat l'attesa sul
+#  database (ricarica degli intenti, con CHAT_DB_TIMEOUT_SEC) avviene
+#  prima, sull'event loop: una query lenta occupa una coroutine, non il
+#  worker, e /ai/meal continua a rispondere. Gli intenti passano alla
+#  route in chat.INTENTI_RICHIESTA: a2wsgi esegue l'app WSGI in una copia
+#  del contesto della richiesta.
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app as flask_app
+import chat
+
+THREAD_WSGI = int(os.getenv("GOFOODY_ASGI_THREAD", "8"))
+
+app_wsgi = WSGIMiddleware(flask_app, workers=THREAD_WSGI)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == "/ai/chat" and scope["method"] == "POST":
+        # unica attesa sul DB: non bloccante e con timeout; ogni richiesta
+        # ASGI ha il suo task, quindi il valore non passa ad altre richieste
+        chat.INTENTI_RICHIESTA.set(await chat.intenti_chat_async())
+    await app_wsgi(scope, receive, send)
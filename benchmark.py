@@ -0,0 +1,328 @@
+# ================================================================
+#  GoFoody AI - benchmark.py (hot path su cataloghi sintetici)
+# ================================================================
+#
+#  python benchmark.py                          → scala "small"
+#  python benchmark.py --scale small,medium     → più scale
+#  python benchmark.py --salva bench.json       → salva la baseline
+#  python benchmark.py --confronta bench.json   → differenze con una baseline
+#
+#  Scale (ricette / alimenti in nutrients):
+#    small  = 1k / 300    medium = 10k / 5k    large = 100k / 50k
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SCALE = {
+    "small":  (1_000, 300),
+    "medium": (10_000, 5_000),
+    "large":  (100_000, 50_000),
+}
+
+BASI = [
+    "pomodoro", "pasta", "riso", "pollo", "manzo", "maiale", "tacchino", "salmone",
+    "tonno", "orata", "zucchina", "melanzana", "carota", "cipolla", "aglio", "patata",
+    "peperone", "spinaci", "lattuga", "ceci", "lenticchie", "fagioli", "piselli",
+    "mela", "banana", "pera", "arancia", "limone", "yogurt", "latte", "ricotta",
+    "mozzarella", "parmigiano", "uovo", "pane", "farina", "olio", "basilico",
+    "rosmarino", "quinoa", "avena", "mandorle", "nocciole", "miele", "cacao",
+]
+VARIANTI = [
+    "", "fresco", "secco", "bio", "integrale", "rosso", "verde", "bianco",
+    "light", "grigliato", "al vapore", "in scatola", "surgelato", "di stagione",
+]
+CATEGORIE = ["primo", "secondo_carne", "secondo_pesce", "contorno", "piatto_unico", "dolce"]
+
+
+# ---------------------------------------------------
+# GENERAZIONE DATI (stessa forma di data/*.json)
+# ---------------------------------------------------
+
+def genera_nutrienti(n, rng):
+    nutrienti = {}
+    i = 0
+    while len(nutrienti) < n:
+        base = BASI[i % len(BASI)]
+        variante = VARIANTI[(i // len(BASI)) % len(VARIANTI)]
+        giro = i // (len(BASI) * len(VARIANTI))
+        label = " ".join(p for p in (base, variante, str(giro) if giro else "") if p)
+        key = label.replace(" ", "_")
+        nutrienti[key] = {
+            "label": label,
+            "kcal_per_100g": rng.randint(10, 600),
+            "carbs_g": round(rng.uniform(0, 80), 1),
+            "protein_g": round(rng.uniform(0, 30), 1),
+            "fat_g": round(rng.uniform(0, 40), 1),
+            "fiber_g": round(rng.uniform(0, 10), 1),
+            "sugar_g": round(rng.uniform(0, 30), 1),
+        }
+        i += 1
+    return nutrienti
+
+
+def genera_ricette(n, nutrienti, rng):
+    etichette = [v["label"] for v in nutrienti.values()]
+    ricette = {}
+    for i in range(n):
+        cat = CATEGORIE[i % len(CATEGORIE)]
+        num = i // len(CATEGORIE) + 1
+        ingr = [
+            {"nome": rng.choice(etichette).capitalize(), "quantita_g": round(rng.uniform(5, 200), 1)}
+            for _ in range(rng.randint(3, 8))
+        ]
+        ricette[f"{cat}_ricetta_{num}"] = {
+            "titolo": f"{cat.replace('_', ' ').capitalize()} Ricetta {num}",
+            "categoria": cat,
+            "porzioni_standard": 1,
+            "peso_totale_piatto_g": round(sum(x["quantita_g"] for x in ingr), 1),
+            "ingredienti": ingr,
+        }
+    return ricette
+
+
+def scrivi_csv(path, ricette):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["titolo", "ingredienti", "tempo", "descrizione"])
+        for r in ricette.values():
+            w.writerow([
+                r["titolo"],
+                ",".join(x["nome"].lower() for x in r["ingredienti"]),
+                str(int(r["peso_totale_piatto_g"]) % 60 + 5),
+                f"Ricetta {r['categoria'].replace('_', ' ')} generata per il benchmark",
+            ])
+
+
+# ---------------------------------------------------
+# INSTALLAZIONE DATI NEL MODULO app
+# ---------------------------------------------------
+
+def installa_dati(A, ricette, nutrienti, cartella):
+    """Sostituisce dati e strutture derivate di app.py con quelli sintetici."""
+    A.ARCHIVIO_NUTRIENTI = A.ArchivioNutrienti(nutrienti)
+    A.NUTRIENTS = A.ARCHIVIO_NUTRIENTI.voci
+    A.INDICE_NUTRIENTI = A.ARCHIVIO_NUTRIENTI.indice
+    A.INDICE_NUTRIENTI_CANON = A.IndiceNgram(k for k in nutrienti if not k.startswith("food_"))
+    # pesi dei pezzi dai nutrienti sintetici, cache delle quantità vuota
+    A.PARSER_QUANTITA = A.ParserQuantita(A.pesi_pezzo(nutrienti), A.chiave_alimento)
+
+    A.ITALIAN_RECIPES = ricette
+    A.INDICE_ITALIAN_RECIPES = A.IndiceDizionario(ricette, forma=lambda k: k.replace("_", " "))
+    A.USER_RECIPES = {}
+    A.INDICE_USER_RECIPES = A.IndiceDizionario(A.USER_RECIPES, forma=lambda k: k.replace("_", " "))
+    A.JOURNAL_RICETTE = A.JournalRicette(
+        os.path.join(cartella, "user_recipes.json"), os.path.join(cartella, "user_recipes.jsonl")
+    )
+
+    A.VETTORI_RICETTE.clear()
+    cache_nomi = {}
+    for r in ricette.values():
+        A.prepara_vettori_ricetta(r, cache_nomi)
+
+    csv_path = os.path.join(cartella, "recipes.csv")
+    scrivi_csv(csv_path, ricette)
+    A.RECIPES_CSV_PATH = csv_path
+    A.CATALOGO_RICETTE = A.CatalogoRicette(csv_path, prepara=A.prepara_catalogo)
+
+
+# ---------------------------------------------------
+# MISURA
+# ---------------------------------------------------
+
+def percentile(valori, p):
+    if not valori:
+        return 0.0
+    ordinati = sorted(valori)
+    k = min(len(ordinati) - 1, int(round(p / 100.0 * (len(ordinati) - 1))))
+    return ordinati[k]
+
+
+def misura(fn, argomenti, durata_max=3.0, min_iter=20):
+    """Esegue fn(*args) per ogni voce di `argomenti` (a rotazione) e misura ogni chiamata."""
+    tempi = []
+    inizio = time.perf_counter()
+    i = 0
+    while i < min_iter or (time.perf_counter() - inizio < durata_max and i < len(argomenti) * 5):
+        args = argomenti[i % len(argomenti)]
+        t0 = time.perf_counter()
+        fn(*args)
+        tempi.append(time.perf_counter() - t0)
+        i += 1
+    totale = sum(tempi)
+    return {
+        "n": len(tempi),
+        "ops_s": round(len(tempi) / totale, 1) if totale > 0 else 0.0,
+        "p50_ms": round(percentile(tempi, 50) * 1000, 4),
+        "p99_ms": round(percentile(tempi, 99) * 1000, 4),
+    }
+
+
+def esegui_scala(A, nome, n_ricette, n_nutrienti, seed, durata_max):
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    nutrienti = genera_nutrienti(n_nutrienti, rng)
+    ricette = genera_ricette(n_ricette, nutrienti, rng)
+
+    with tempfile.TemporaryDirectory() as cartella:
+        installa_dati(A, ricette, nutrienti, cartella)
+        preparazione = time.perf_counter() - t0
+        print(f"\n▶ {nome}: {n_ricette} ricette, {n_nutrienti} alimenti (setup {preparazione:.1f}s)")
+
+        etichette = [v["label"] for v in nutrienti.values()]
+        chiavi = list(ricette)
+        catalogo = A.CATALOGO_RICETTE.snapshot().ricette
+
+        # nomi: esatti, plurali/varianti, refusi, sconosciuti
+        nomi = []
+        for _ in range(200):
+            e = rng.choice(etichette)
+            scelta = rng.random()
+            if scelta < 0.4:
+                nomi.append(e)
+            elif scelta < 0.7:
+                pos = rng.randrange(len(e))
+                nomi.append(e[:pos] + e[pos + 1:])
+            elif scelta < 0.9:
+                nomi.append(e + "i")
+            else:
+                nomi.append("xq" + e[::-1])
+
+        # piatti: chiave esatta, parziale, fuzzy, mancante
+        piatti = []
+        for _ in range(200):
+            k = rng.choice(chiavi).replace("_", " ")
+            scelta = rng.random()
+            if scelta < 0.3:
+                piatti.append(k)
+            elif scelta < 0.6:
+                piatti.append(" ".join(k.split()[:2]))
+            elif scelta < 0.8:
+                piatti.append(k[:-1] + "x")
+            else:
+                piatti.append("zqwv " + k[::-1])
+
+        dispense = [
+            [rng.choice(etichette) for _ in range(rng.randint(2, 10))]
+            for _ in range(50)
+        ]
+        quantita = ["100 g", "1 kg", "2", "1/2", "3 pz", "250ml", "1 l", "7", "2 cucchiai", "0.5"]
+
+        client = A.app.test_client()
+        H = {"Authorization": "Bearer " + A.API_KEY}
+
+        casi = {
+            "copertura_ingredienti": (
+                A.copertura_ingredienti,
+                [(list(rng.choice(catalogo)["ingredienti"]), rng.choice(dispense)) for _ in range(200)],
+            ),
+            "trova_ricetta": (A.trova_ricetta, [(p,) for p in piatti]),
+            "get_kcal_ingrediente": (A.get_kcal_ingrediente, [(n, 150.0) for n in nomi]),
+            "canonicalizza_alimento": (A.canonicalizza_alimento, [(n,) for n in nomi]),
+            "quantita_to_grams": (
+                A.quantita_to_grams, [(rng.choice(nomi), rng.choice(quantita)) for _ in range(200)]
+            ),
+            "POST /ai/ricette": (
+                # cache svuotata a ogni chiamata: misura il calcolo completo
+                lambda d: (A.CACHE_RICETTE.svuota(),
+                           client.post("/ai/ricette", json={"dispensa": d, "max_ricette": 5}, headers=H)),
+                [(d,) for d in dispense],
+            ),
+            "POST /ai/ricette (cache)": (
+                lambda d: client.post("/ai/ricette", json={"dispensa": d, "max_ricette": 5}, headers=H),
+                [(d,) for d in dispense],
+            ),
+            # settimana come la costruisce oggi l'app PHP: /ai/ricette più
+            # /ai/ricetta_singola per ognuno dei 7 × 5 slot. Lo stesso pasto
+            # torna 7 volte con la stessa chiave: cache svuotate prima di
+            # ogni chiamata, altrimenti 30 slot su 35 sarebbero hit
+            "settimana: 36 chiamate": (
+                lambda d: (A.CACHE_RICETTE.svuota(),
+                           client.post("/ai/ricette", json={"dispensa": d, "max_ricette": 5}, headers=H),
+                           [(A.CACHE_RICETTE.svuota(), A.CLASSIFICHE_SINGOLE.svuota(),
+                             client.post("/ai/ricetta_singola", json={"dispensa": d, "pasto": p}, headers=H))
+                            for _ in range(7) for p in A.PASTI_GIORNO]),
+                [(d,) for d in dispense],
+            ),
+            "settimana: POST /ai/piano": (
+                lambda d: (A.CACHE_RICETTE.svuota(),
+                           client.post("/ai/piano", json={"dispensa": d, "kcal_giornaliere": 2000}, headers=H)),
+                [(d,) for d in dispense],
+            ),
+            "POST /ai/meal": (
+                lambda a, q: client.post("/ai/meal", json={"alimento": a, "quantita": q}, headers=H),
+                [(rng.choice(piatti + nomi), rng.choice(quantita)) for _ in range(100)],
+            ),
+        }
+
+        risultati = {}
+        for op, (fn, argomenti) in casi.items():
+            risultati[op] = misura(fn, argomenti, durata_max=durata_max)
+            r = risultati[op]
+            print(f"  {op:<26} {r['ops_s']:>12,.1f} ops/s   p50 {r['p50_ms']:>9.3f} ms   p99 {r['p99_ms']:>9.3f} ms")
+
+        A.JOURNAL_RICETTE.flush()
+    return risultati
+
+
+def confronta(attuali, baseline):
+    print("\n▶ confronto con la baseline (ops/s, + = più veloce)")
+    for scala, ops in attuali.items():
+        base = baseline.get("risultati", {}).get(scala)
+        if not base:
+            continue
+        for op, r in ops.items():
+            b = base.get(op)
+            if not b or not b.get("ops_s"):
+                continue
+            delta = (r["ops_s"] - b["ops_s"]) / b["ops_s"] * 100
+            print(f"  {scala:<7} {op:<26} {delta:>+8.1f}%   p99 {b['p99_ms']:.3f} → {r['p99_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot path GoFoody AI")
+    parser.add_argument("--scale", default="small", help="small,medium,large (separate da virgola)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--durata", type=float, default=3.0, help="secondi massimi per operazione")
+    parser.add_argument("--salva", help="file JSON in cui salvare i risultati")
+    parser.add_argument("--confronta", help="baseline JSON da confrontare")
+    args = parser.parse_args()
+
+    scale = [s.strip() for s in args.scale.split(",") if s.strip()]
+    for s in scale:
+        if s not in SCALE:
+            parser.error(f"scala sconosciuta: {s}")
+
+    import app as A
+
+    risultati = {}
+    for s in scale:
+        n_ricette, n_nutrienti = SCALE[s]
+        risultati[s] = esegui_scala(A, s, n_ricette, n_nutrienti, args.seed, args.durata)
+
+    if args.confronta:
+        with open(args.confronta, "r", encoding="utf-8") as f:
+            confronta(risultati, json.load(f))
+
+    if args.salva:
+        with open(args.salva, "w", encoding="utf-8") as f:
+            json.dump({
+                "creato": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "seed": args.seed,
+                "risultati": risultati,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 risultati salvati in {args.salva}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# ================================================================
+#  GoFoody AI - benchmark_concorrenza.py (chat con DB lento + /ai/meal)
+# ================================================================
+#
+#  python benchmark_concorrenza.py
+#  python benchmark_concorrenza.py --latenza 0.5 --rps 40 --quota-chat 0.2
+#
+#  Un finto database (connettore DB-API in memoria) risponde alla SELECT
+#  degli intenti dopo `--latenza` secondi; la cache intenti ha TTL 0,
+#  quindi ogni /ai/chat tocca il DB (il caso peggiore, una scadenza TTL
+#  per richiesta). Le richieste arrivano a ritmo costante (`--rps`) e la
+#  latenza è misurata dall'arrivo previsto alla risposta, code comprese:
+#
+#    sync  = N worker sincroni (come gunicorn sync): una richiesta alla volta
+#    asgi  = un solo worker asgi.py: event loop + pool di thread Flask
+
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import percentile
+
+
+# ---------------------------------------------------
+# FINTO DATABASE CON LATENZA
+# ---------------------------------------------------
+
+INTENTI_FINTI = [
+    {
+        "id": 1, "attivo": 1, "descrizione": "Saluto",
+        "esempi_domande": "ciao\nbuongiorno\nsalve come stai",
+        "esempi_risposte": "Ciao! Cosa cuciniamo oggi?",
+    },
+    {
+        "id": 2, "attivo": 1, "descrizione": "Calorie",
+        "esempi_domande": "quante calorie ha la pasta\ncalorie della pizza",
+        "esempi_risposte": "Dimmi il piatto e la quantità: calcolo io le kcal.",
+    },
+]
+
+
+class FintoCursore:
+    def __init__(self, latenza):
+        self.latenza = latenza
+        self.description = None
+        self._righe = []
+
+    def execute(self, sql):
+        time.sleep(self.latenza)
+        colonne = list(INTENTI_FINTI[0])
+        self.description = [(c,) for c in colonne]
+        self._righe = [tuple(r[c] for c in colonne) for r in INTENTI_FINTI]
+
+    def fetchall(self):
+        return self._righe
+
+    def close(self):
+        pass
+
+
+class FintaConnessione:
+    def __init__(self, latenza):
+        self.latenza = latenza
+
+    def cursor(self):
+        return FintoCursore(self.latenza)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+
+def installa_db_finto(chat, latenza, timeout):
+    from chat_db import PoolConnessioni, EsecutoreDB
+
+    chat.MYSQL_DRIVER = True
+    chat.DB_POOL = PoolConnessioni(lambda: FintaConnessione(latenza), dimensione=4, breaker=chat.BREAKER_DB)
+    chat.BREAKER_DB.successo()
+    chat.CACHE_INTENTI.ttl = 0
+    chat.CACHE_INTENTI.invalida()
+    chat.ESECUTORE_DB = EsecutoreDB(max_thread=4, timeout=timeout)
+
+
+# ---------------------------------------------------
+# CARICO
+# ---------------------------------------------------
+
+def piano_richieste(rps, durata, quota_chat, piatti):
+    """[(istante di arrivo, path, corpo json)] a ritmo costante."""
+    piano = []
+    n = int(rps * durata)
+    ogni_chat = max(1, round(1 / quota_chat)) if quota_chat > 0 else 0
+    for i in range(n):
+        if ogni_chat and i % ogni_chat == 0:
+            piano.append((i / rps, "/ai/chat", {"prompt": "quante calorie ha la pasta"}))
+        else:
+            piano.append((i / rps, "/ai/meal", {"alimento": piatti[i % len(piatti)], "quantita": "200 g"}))
+    return piano
+
+
+def scope_http(path, corpo, api_key):
+    return {
+        "type": "http", "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "root_path": "", "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+            (b"authorization", ("Bearer " + api_key).encode()),
+        ],
+        "server": ("127.0.0.1", 8000), "client": ("127.0.0.1", 50000),
+    }
+
+
+def esegui_sync(asgi, piano, api_key, workers):
+    """`workers` thread, ognuno serve una richiesta alla volta da una coda comune."""
+    coda = queue.Queue()
+    tempi = []
+    lock = threading.Lock()
+
+    def worker():
+        client = asgi.flask_app.test_client()
+        while True:
+            voce = coda.get()
+            if voce is None:
+                return
+            arrivo, path, dati = voce
+            risposta = client.post(path, json=dati, headers={"Authorization": "Bearer " + api_key})
+            with lock:
+                tempi.append((path, risposta.status, time.perf_counter() - arrivo))
+
+    thread = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in thread:
+        t.start()
+
+    inizio = time.perf_counter()
+    for t_rel, path, dati in piano:
+        attesa = inizio + t_rel - time.perf_counter()
+        if attesa > 0:
+            time.sleep(attesa)
+        coda.put((inizio + t_rel, path, dati))
+    for _ in thread:
+        coda.put(None)
+    for t in thread:
+        t.join()
+    return tempi
+
+
+def esegui_asgi(asgi, piano, api_key):
+    tempi = []
+
+    async def una(arrivo, path, dati):
+        corpo = json.dumps(dati).encode()
+        inviato = False
+        risposta = {}
+
+        async def receive():
+            nonlocal inviato
+            if inviato:
+                await asyncio.sleep(3600)
+            inviato = True
+            return {"type": "http.request", "body": corpo, "more_body": False}
+
+        async def send(messaggio):
+            if messaggio["type"] == "http.response.start":
+                risposta["status"] = str(messaggio["status"])
+
+        await asgi.app(scope_http(path, corpo, api_key), receive, send)
+        tempi.append((path, risposta.get("status", "?"), time.perf_counter() - arrivo))
+
+    async def principale():
+        inizio = time.perf_counter()
+        compiti = []
+        for t_rel, path, dati in piano:
+            attesa = inizio + t_rel - time.perf_counter()
+            if attesa > 0:
+                await asyncio.sleep(attesa)
+            compiti.append(asyncio.create_task(una(inizio + t_rel, path, dati)))
+        await asyncio.gather(*compiti)
+
+    asyncio.run(principale())
+    return tempi
+
+
+def riassunto(tempi):
+    per_route = {}
+    for path, status, dt in tempi:
+        r = per_route.setdefault(path, {"tempi": [], "errori": 0})
+        r["tempi"].append(dt)
+        if not str(status).startswith("2"):
+            r["errori"] += 1
+    return {
+        path: {
+            "n": len(r["tempi"]),
+            "errori": r["errori"],
+            "p50_ms": round(percentile(r["tempi"], 50) * 1000, 1),
+            "p99_ms": round(percentile(r["tempi"], 99) * 1000, 1),
+            "max_ms": round(max(r["tempi"]) * 1000, 1),
+        }
+        for path, r in sorted(per_route.items())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat con DB lento vs /ai/meal: sync e ASGI")
+    parser.add_argument("--latenza", type=float, default=0.3, help="secondi per la SELECT intenti")
+    parser.add_argument("--timeout", type=float, default=1.0, help="CHAT_DB_TIMEOUT_SEC")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--durata", type=float, default=5.0)
+    parser.add_argument("--quota-chat", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=1, help="worker sync a confronto")
+    args = parser.parse_args()
+
+    import app as A
+    import asgi
+    import chat
+
+    installa_db_finto(chat, args.latenza, args.timeout)
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "italian_recipes.json"), encoding="utf-8") as f:
+        piatti = [r["titolo"] for r in json.load(f).values()][:50]
+    piano = piano_richieste(args.rps, args.durata, args.quota_chat, piatti)
+    api_key = A.API_KEY
+
+    print(f"\n▶ {len(piano)} richieste a {args.rps:g}/s, {args.quota_chat:.0%} chat, "
+          f"latenza DB {args.latenza * 1000:.0f} ms, timeout {args.timeout * 1000:.0f} ms")
+    for nome, esegui in (
+        (f"sync x{args.workers}", lambda: esegui_sync(asgi, piano, api_key, args.workers)),
+        ("asgi x1", lambda: esegui_asgi(asgi, piano, api_key)),
+    ):
+        for path, r in riassunto(esegui()).items():
+            print(f"  {nome:<8} {path:<10} n={r['n']:<4} err={r['errori']:<3} "
+                  f"p50 {r['p50_ms']:>8.1f} ms   p99 {r['p99_ms']:>8.1f} ms   max {r['max_ms']:>8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
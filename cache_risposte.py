@@ -0,0 +1,88 @@
+# ================================================================
+#  GoFoody AI - cache_risposte.py (LRU + TTL per /ai/ricette)
+# ================================================================
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metriche import incrementa, descrivi
+
+descrivi("gofoody_cache_risposte_total", "Eventi della cache risposte (hit, miss, eviction, scadute)")
+
+
+def chiave_richiesta(**campi):
+    """Hash canonico dei campi (già normalizzati e ordinati)."""
+    testo = json.dumps(campi, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(testo.encode("utf-8")).hexdigest()
+
+
+def etag_payload(payload):
+    testo = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(testo.encode("utf-8")).hexdigest()
+
+
+class CacheLRU:
+    """Cache LRU con scadenza: chiave → valore, eventi contati per nome."""
+
+    def __init__(self, nome, capienza=1024, ttl=300.0, orologio=time.monotonic):
+        self.nome = nome
+        self.capienza = capienza
+        self.ttl = ttl
+        self.orologio = orologio
+        self._voci = OrderedDict()
+        self._lock = threading.Lock()
+        self.statistiche = {"hit": 0, "miss": 0, "eviction": 0, "scadute": 0}
+
+    def _conta(self, evento):
+        self.statistiche[evento] += 1
+        incrementa("gofoody_cache_risposte_total", cache=self.nome, evento=evento)
+
+    def get(self, chiave):
+        adesso = self.orologio()
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is not None and voce[0] <= adesso:
+                del self._voci[chiave]
+                self._conta("scadute")
+                voce = None
+            if voce is None:
+                self._conta("miss")
+                return None
+            self._voci.move_to_end(chiave)
+            self._conta("hit")
+            return voce[1]
+
+    def put(self, chiave, valore):
+        with self._lock:
+            self._voci[chiave] = (self.orologio() + self.ttl, valore)
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.capienza:
+                self._voci.popitem(last=False)
+                self._conta("eviction")
+
+    def svuota(self):
+        with self._lock:
+            self._voci.clear()
+
+    def __len__(self):
+        return len(self._voci)
+
+
+class CacheRisposte(CacheLRU):
+    """
+    Cache LRU con scadenza: chiave → (etag, payload). I payload sono
+    condivisi tra le richieste e non vanno modificati dopo put().
+    """
+
+    def put(self, chiave, payload):
+        etag = etag_payload(payload)
+        super().put(chiave, (etag, payload))
+        return etag
+
+
+CAPIENZA = int(os.getenv("CACHE_RISPOSTE_CAPIENZA", "2048"))
+TTL = float(os.getenv("CACHE_RISPOSTE_TTL", "300"))
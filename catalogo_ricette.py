@@ -0,0 +1,105 @@
+# ================================================================
+#  GoFoody AI - catalogo_ricette.py (recipes.csv in memoria)
+# ================================================================
+
+import csv
+import os
+import threading
+
+
+# ---------------------------------------------------
+# PARSING CSV
+# ---------------------------------------------------
+
+def leggi_ricette_csv(path):
+    """Legge recipes.csv e restituisce una tupla di ricette già normalizzate."""
+    ricette = []
+    if not os.path.exists(path):
+        return tuple(ricette)
+
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            titolo = (row.get("titolo") or "").strip()
+            ingr   = (row.get("ingredienti") or "").strip()
+            tempo  = (row.get("tempo") or "").strip()
+            descr  = (row.get("descrizione") or "").strip()
+            if titolo and ingr:
+                ingredienti = tuple(i.strip().lower() for i in ingr.split(",") if i.strip())
+                ricette.append({
+                    "titolo": titolo,
+                    "ingredienti": ingredienti,
+                    "tempo": tempo,
+                    "descrizione": descr
+                })
+    return tuple(ricette)
+
+
+def firma_file(path):
+    """(mtime_ns, size) del file, None se non esiste."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# ---------------------------------------------------
+# SNAPSHOT IMMUTABILE
+# ---------------------------------------------------
+
+class SnapshotCatalogo:
+    """
+    Ricette caricate da una versione precisa del CSV. Non va modificato
+    dopo la pubblicazione: le strutture derivate si aggiungono in `prepara`.
+    """
+
+    def __init__(self, ricette, firma):
+        self.ricette = ricette
+        self.firma = firma
+
+    def __len__(self):
+        return len(self.ricette)
+
+
+# ---------------------------------------------------
+# CATALOGO CON RICARICA SU MTIME/SIZE
+# ---------------------------------------------------
+
+class CatalogoRicette:
+    """
+    Catalogo di processo: il CSV viene letto all'avvio e riletto solo
+    quando cambiano mtime o dimensione. Ogni richiesta lavora sullo
+    snapshot che ha ottenuto, anche se nel frattempo arriva una ricarica.
+    """
+
+    def __init__(self, path, prepara=None):
+        self.path = path
+        self.prepara = prepara
+        self._lock = threading.Lock()
+        self._snapshot = self._carica(firma_file(path))
+
+    def _carica(self, firma):
+        try:
+            ricette = leggi_ricette_csv(self.path)
+        except Exception as e:
+            print("❌ Errore caricamento recipes.csv:", e)
+            ricette = ()
+        snap = SnapshotCatalogo(ricette, firma)
+        # strutture derivate (vocabolario, indici...) prima di pubblicarlo
+        if self.prepara:
+            self.prepara(snap)
+        return snap
+
+    def snapshot(self):
+        snap = self._snapshot
+        firma = firma_file(self.path)
+        if firma == snap.firma:
+            return snap
+
+        with self._lock:
+            # un altro thread potrebbe aver già ricaricato
+            if self._snapshot.firma != firma:
+                self._snapshot = self._carica(firma)
+                print(f"🔄 recipes.csv ricaricato ({len(self._snapshot)} ricette)")
+            return self._snapshot
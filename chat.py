@@ -3,39 +3,28 @@
 # ================================================================
 
 from flask import request, jsonify
+import asyncio
+import contextvars
+import os
 import random
-import difflib
+
+from chat_db import PoolConnessioni, CacheIntenti, CircuitBreaker, EsecutoreDB, righe_dict
+from metriche import fase
+from indice_intenti import IndiceIntenti
 
 # ---------------------------------------------------
-# TENTATIVO IMPORT + TEST CONNESSIONE MYSQL
+# IMPORT DRIVER MYSQL (nessuna connessione all'avvio)
 # ---------------------------------------------------
 
-MYSQL_AVAILABLE = False
+MYSQL_DRIVER = False
 mysql = None
 
 try:
     import mysql.connector
     mysql = mysql.connector
-    # tentativo di connessione reale a Aruba
-    try:
-        test_conn = mysql.connect(
-            host="31.11.39.251",
-            user="Sql1897455",
-            password="Peppino_88",
-            database="Sql1897455_2",
-            port=3306,
-            connection_timeout=2
-        )
-        test_conn.close()
-        MYSQL_AVAILABLE = True
-        print("✅ MySQL Aruba raggiungibile: modalità avanzata attiva")
-    except:
-        print("⚠️ MySQL non raggiungibile: attivo fallback locale")
-        MYSQL_AVAILABLE = False
-
+    MYSQL_DRIVER = True
 except ImportError:
     print("⚠️ mysql.connector non disponibile: fallback attivo")
-    MYSQL_AVAILABLE = False
 
 
 # ---------------------------------------------------
@@ -50,13 +39,76 @@ DB_CONFIG = {
     "port": 3306
 }
 
-def get_db():
-    if not MYSQL_AVAILABLE:
-        return None
+# Circuit breaker: parte aperto (stato sconosciuto) e si chiude quando la
+# sonda riesce a connettersi; a circuito aperto la chat risponde subito
+# con il fallback locale. La prima richiesta di ogni worker (e la prima
+# dopo ogni timeout_apertura) aspetta la sonda fino a CHAT_DB_TIMEOUT_SEC
+BREAKER_DB = CircuitBreaker(
+    soglia_errori=int(os.getenv("CHAT_DB_ERRORI", "3")),
+    timeout_apertura=float(os.getenv("CHAT_DB_RIPROVA_SEC", "30")),
+    aperto=True
+)
+
+# connessioni riusate tra le richieste (autocommit: ogni SELECT vede dati freschi)
+DB_POOL = PoolConnessioni(
+    lambda: mysql.connect(autocommit=True, connection_timeout=2, **DB_CONFIG),
+    dimensione=int(os.getenv("CHAT_DB_POOL", "4")),
+    breaker=BREAKER_DB
+)
+
+
+def _sonda_db():
     try:
-        return mysql.connect(**DB_CONFIG)
-    except:
+        with DB_POOL.connessione():
+            pass
+    except Exception:
+        pass
+
+
+def _sonda_da_aspettare():
+    # semiaperto: una prova è già in corso (di solito la sonda in volo su ESECUTORE_DB)
+    return BREAKER_DB.prova_possibile() or BREAKER_DB.stato == CircuitBreaker.SEMIAPERTO
+
+
+def mysql_available():
+    """
+    True a circuito chiuso. Se è ora di riprovare, la sonda gira su
+    ESECUTORE_DB e chi chiama la aspetta fino al suo timeout: la prima
+    richiesta dopo l'avvio usa già il DB se risponde. Le richieste
+    contemporanee aspettano la stessa sonda; oltre il timeout la sonda
+    finisce in background e si risponde col fallback.
+    """
+    if not MYSQL_DRIVER:
+        return False
+    if BREAKER_DB.stato == CircuitBreaker.CHIUSO:
+        return True
+    if _sonda_da_aspettare():
+        try:
+            ESECUTORE_DB.esegui(_sonda_db)
+        except TimeoutError:
+            pass
+    return BREAKER_DB.stato == CircuitBreaker.CHIUSO
+
+
+async def mysql_available_async():
+    """Come mysql_available(), senza bloccare l'event loop durante la sonda."""
+    if not MYSQL_DRIVER:
+        return False
+    if BREAKER_DB.stato == CircuitBreaker.CHIUSO:
+        return True
+    if _sonda_da_aspettare():
+        try:
+            await ESECUTORE_DB.esegui_async(_sonda_db)
+        except (TimeoutError, asyncio.TimeoutError):
+            pass
+    return BREAKER_DB.stato == CircuitBreaker.CHIUSO
+
+
+def get_db():
+    """Context manager su una connessione del pool, None se MySQL non è disponibile."""
+    if not mysql_available():
         return None
+    return DB_POOL.connessione()
 
 
 # ---------------------------------------------------
@@ -90,36 +142,81 @@ def fallback_response(prompt):
 # RISPOSTE AVANZATE BASATE SU INTENTI FROM DB
 # ---------------------------------------------------
 
+# tetto lato server alla durata della SELECT (MySQL >= 5.7, altrove è un commento)
+QUERY_MAX_MS = int(os.getenv("CHAT_DB_QUERY_MS", "5000"))
+
+
+def leggi_intenti(pool):
+    """SELECT degli intenti attivi; solleva eccezione se il DB non risponde."""
+    with fase("db_intent_load"), pool.connessione() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT /*+ MAX_EXECUTION_TIME({QUERY_MAX_MS}) */ * FROM ai_intenti WHERE attivo=1")
+            return righe_dict(cur)
+        finally:
+            cur.close()
+
+
 def load_intents():
-    conn = get_db()
-    if not conn:
+    if not mysql_available():
         return []
     try:
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM ai_intenti WHERE attivo=1")
-        rows = cur.fetchall()
-        conn.close()
-        return rows
+        return leggi_intenti(DB_POOL)
     except:
         return []
 
 
-def match_intent(prompt, intents):
-    p = prompt.lower()
-    best = None
-    best_score = 0
+# intenti in memoria per CHAT_INTENTI_TTL secondi, esempi già normalizzati
+CACHE_INTENTI = CacheIntenti(
+    lambda: leggi_intenti(DB_POOL),
+    ttl=float(os.getenv("CHAT_INTENTI_TTL", "300")),
+    # dopo una ricarica fallita si riprova insieme al circuit breaker
+    riprova=float(os.getenv("CHAT_DB_RIPROVA_SEC", "30"))
+)
 
-    for intent in intents:
-        for example in (intent["esempi_domande"] or "").split("\n"):
-            s = difflib.SequenceMatcher(None, p, example.lower()).ratio()
-            if s > best_score:
-                best_score = s
-                best = intent
 
-    if best_score < 0.45:
-        return None
+# ricariche degli intenti in un pool limitato di thread: la richiesta
+# aspetta al massimo CHAT_DB_TIMEOUT_SEC, poi usa gli ultimi intenti noti
+ESECUTORE_DB = EsecutoreDB(
+    max_thread=int(os.getenv("CHAT_DB_POOL", "4")),
+    timeout=float(os.getenv("CHAT_DB_TIMEOUT_SEC", "1"))
+)
 
-    return best
+
+def intenti_chat():
+    """Intenti per una richiesta chat (route sincrona)."""
+    if not mysql_available():
+        return []
+    if CACHE_INTENTI.fresca():
+        return CACHE_INTENTI.ultimi()
+    try:
+        return ESECUTORE_DB.esegui(CACHE_INTENTI.intenti)
+    except TimeoutError:
+        print("⚠️ Intenti chat: DB lento, uso gli ultimi caricati")
+        return CACHE_INTENTI.ultimi()
+
+
+async def intenti_chat_async():
+    """Come intenti_chat(), senza bloccare l'event loop (asgi.py)."""
+    if not await mysql_available_async():
+        return []
+    if CACHE_INTENTI.fresca():
+        return CACHE_INTENTI.ultimi()
+    try:
+        return await ESECUTORE_DB.esegui_async(CACHE_INTENTI.intenti)
+    except (TimeoutError, asyncio.TimeoutError):
+        print("⚠️ Intenti chat: DB lento, uso gli ultimi caricati")
+        return CACHE_INTENTI.ultimi()
+
+
+def match_intent(prompt, intents):
+    # indice pronto se gli intenti vengono dalla cache, altrimenti si costruisce qui
+    indice = getattr(intents, "indice", None)
+    if indice is None:
+        indice = IndiceIntenti(intents)
+    with fase("intent_match"):
+        intento, _ = indice.migliore(prompt.lower())
+    return intento
 
 
 def answer_from_intent(intent):
@@ -133,6 +230,24 @@ def answer_from_intent(intent):
 # ROUTE PRINCIPALE CHAT
 # ---------------------------------------------------
 
+PROMPT_VUOTO = "Scrivimi qualcosa 😊"
+
+# in modalità ASGI gli intenti arrivano già caricati (senza bloccare) da asgi.py
+INTENTI_RICHIESTA = contextvars.ContextVar("gofoody_intenti_chat", default=None)
+
+
+def rispondi(prompt, intents):
+    """Risposta dall'intento più simile, altrimenti il fallback locale."""
+    # modalità avanzata
+    if intents:
+        match = match_intent(prompt, intents)
+        if match:
+            return answer_from_intent(match)
+
+    # fallback sicuro (identico al tuo file funzionante)
+    return fallback_response(prompt)
+
+
 def register_chat_routes(app):
 
     @app.route("/ai/chat", methods=["POST"])
@@ -141,16 +256,9 @@ def register_chat_routes(app):
         prompt = (data.get("prompt") or "").strip()
 
         if not prompt:
-            return jsonify({"risposta": "Scrivimi qualcosa 😊"})
-
-        # modalità avanzata
-        if MYSQL_AVAILABLE:
-            intents = load_intents()
-            if intents:
-                match = match_intent(prompt, intents)
-                if match:
-                    risposta = answer_from_intent(match)
-                    return jsonify({"risposta": risposta})
-
-        # fallback sicuro (identico al tuo file funzionante)
-        return jsonify({"risposta": fallback_response(prompt)})
+            return jsonify({"risposta": PROMPT_VUOTO})
+
+        intents = INTENTI_RICHIESTA.get()
+        if intents is None:
+            intents = intenti_chat()
+        return jsonify({"risposta": rispondi(prompt, intents)})
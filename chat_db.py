@@ -0,0 +1,288 @@
+# ================================================================
+#  GoFoody AI - chat_db.py (pool connessioni + cache intenti + timeout)
+# ================================================================
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from indice_intenti import ListaIntenti
+
+
+# ---------------------------------------------------
+# CIRCUIT BREAKER
+# ---------------------------------------------------
+
+class CircuitoAperto(Exception):
+    """Il circuit breaker non permette chiamate al database."""
+
+
+class CircuitBreaker:
+    """
+    Stati:
+      - chiuso:     le chiamate passano; dopo `soglia_errori` errori di fila si apre
+      - aperto:     nessuna chiamata per `timeout_apertura` secondi
+      - semiaperto: passa una sola chiamata di prova; se riesce si chiude,
+                    se fallisce si riapre per un altro `timeout_apertura`
+    """
+
+    CHIUSO = "chiuso"
+    APERTO = "aperto"
+    SEMIAPERTO = "semiaperto"
+
+    def __init__(self, soglia_errori=3, timeout_apertura=30.0, aperto=False, orologio=time.monotonic):
+        self.soglia_errori = soglia_errori
+        self.timeout_apertura = timeout_apertura
+        self.orologio = orologio
+        self._lock = threading.Lock()
+        self.errori = 0
+        # aperto=True: stato sconosciuto all'avvio, la prima prova è subito permessa
+        self.stato = self.APERTO if aperto else self.CHIUSO
+        self._riprova_da = self.orologio()
+
+    def prova_possibile(self):
+        """True se il circuito è aperto ma il timeout è scaduto."""
+        return self.stato == self.APERTO and self.orologio() >= self._riprova_da
+
+    def permesso(self):
+        with self._lock:
+            if self.stato == self.CHIUSO:
+                return True
+            if self.stato == self.APERTO and self.orologio() >= self._riprova_da:
+                # questa chiamata è la prova: le altre restano bloccate
+                self.stato = self.SEMIAPERTO
+                return True
+            return False
+
+    def successo(self):
+        with self._lock:
+            if self.stato != self.CHIUSO:
+                print("✅ MySQL di nuovo raggiungibile: modalità avanzata attiva")
+            self.stato = self.CHIUSO
+            self.errori = 0
+
+    def fallimento(self):
+        with self._lock:
+            self.errori += 1
+            if self.stato == self.SEMIAPERTO or self.errori >= self.soglia_errori:
+                if self.stato == self.CHIUSO:
+                    print("⚠️ MySQL non raggiungibile: attivo fallback locale")
+                self.stato = self.APERTO
+                self._riprova_da = self.orologio() + self.timeout_apertura
+
+
+# ---------------------------------------------------
+# POOL DI CONNESSIONI
+# ---------------------------------------------------
+
+class PoolConnessioni:
+    """
+    Pool minimale per qualunque connettore DB-API (mysql.connector,
+    sqlite3, un finto connettore nei test): `connetti` è la funzione che
+    apre una nuova connessione. Restano aperte al massimo `dimensione`
+    connessioni inattive; quelle rotte vengono scartate. `aperte` conta
+    le connessioni aperte in questo momento, in uso o inattive.
+
+    Il pool non limita le connessioni contemporanee: se ne chiedono più
+    di `dimensione` insieme, ne apre altre e chiude quelle in eccesso al
+    rilascio. In chat.py il limite viene dai thread di EsecutoreDB.
+
+    Con un `breaker` ogni uso del pool ne registra l'esito, e a circuito
+    aperto `connessione()` solleva subito CircuitoAperto.
+    """
+
+    def __init__(self, connetti, dimensione=4, breaker=None):
+        self.connetti = connetti
+        self.dimensione = dimensione
+        self.breaker = breaker
+        self._libere = queue.LifoQueue(maxsize=dimensione)
+        self._lock = threading.Lock()
+        self.aperte = 0
+
+    def _prendi(self):
+        while True:
+            try:
+                conn = self._libere.get_nowait()
+            except queue.Empty:
+                conn = self.connetti()
+                with self._lock:
+                    self.aperte += 1
+                return conn
+            if _viva(conn):
+                return conn
+            self._scarta(conn)
+
+    def _scarta(self, conn):
+        _chiudi(conn)
+        with self._lock:
+            self.aperte -= 1
+
+    def _rilascia(self, conn):
+        try:
+            # chiude l'eventuale transazione: la prossima SELECT vede dati freschi
+            conn.rollback()
+            self._libere.put_nowait(conn)
+        except Exception:
+            self._scarta(conn)
+
+    @contextmanager
+    def connessione(self):
+        if self.breaker and not self.breaker.permesso():
+            raise CircuitoAperto()
+        try:
+            conn = self._prendi()
+        except Exception:
+            if self.breaker:
+                self.breaker.fallimento()
+            raise
+        try:
+            yield conn
+        except Exception:
+            self._scarta(conn)
+            if self.breaker:
+                self.breaker.fallimento()
+            raise
+        else:
+            self._rilascia(conn)
+            if self.breaker:
+                self.breaker.successo()
+
+    def svuota(self):
+        while True:
+            try:
+                self._scarta(self._libere.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _viva(conn):
+    verifica = getattr(conn, "is_connected", None)
+    if verifica is None:
+        return True
+    try:
+        return bool(verifica())
+    except Exception:
+        return False
+
+
+def _chiudi(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def righe_dict(cur):
+    """fetchall() come lista di dict, con qualunque cursore DB-API."""
+    colonne = [c[0] for c in cur.description or ()]
+    return [dict(zip(colonne, r)) for r in cur.fetchall()]
+
+
+# ---------------------------------------------------
+# CACHE INTENTI CON TTL
+# ---------------------------------------------------
+
+def prepara_intento(row):
+    """Copia dell'intento con gli esempi già divisi e in minuscolo."""
+    intento = dict(row)
+    intento["_esempi"] = tuple(
+        e.lower() for e in (intento.get("esempi_domande") or "").split("\n")
+    )
+    return intento
+
+
+class CacheIntenti:
+    """
+    Intenti tenuti in memoria per `ttl` secondi: la maggior parte delle
+    richieste chat non tocca il database. Se la ricarica fallisce si
+    continua con l'ultima lista valida, ma si riprova dopo `riprova`
+    secondi invece di un ttl intero: quando il DB torna, tornano subito
+    anche gli intenti.
+    """
+
+    def __init__(self, carica, ttl=300.0, riprova=30.0, orologio=time.monotonic):
+        self.carica = carica
+        self.ttl = ttl
+        self.riprova = riprova
+        self.orologio = orologio
+        self._lock = threading.Lock()
+        self._intenti = []
+        self._scadenza = None
+        self.ricariche = 0
+
+    def intenti(self):
+        if self._scadenza is not None and self.orologio() < self._scadenza:
+            return self._intenti
+
+        with self._lock:
+            # un altro thread potrebbe averla appena ricaricata
+            if self._scadenza is not None and self.orologio() < self._scadenza:
+                return self._intenti
+            try:
+                righe = self.carica()
+            except Exception as e:
+                print("⚠️ Ricarica intenti fallita:", e)
+                righe = None
+            self.ricariche += 1
+            if righe is None:
+                self._scadenza = self.orologio() + min(self.ttl, self.riprova)
+                return self._intenti
+            # indice TF-IDF degli esempi costruito qui, fuori dalle richieste
+            self._intenti = ListaIntenti(prepara_intento(r) for r in righe)
+            self._scadenza = self.orologio() + self.ttl
+            return self._intenti
+
+    def fresca(self):
+        """True se intenti() risponderebbe dalla memoria, senza ricaricare."""
+        return self._scadenza is not None and self.orologio() < self._scadenza
+
+    def ultimi(self):
+        """L'ultima lista caricata, senza mai toccare il database."""
+        return self._intenti
+
+    def invalida(self):
+        self._scadenza = None
+
+
+# ---------------------------------------------------
+# CHIAMATE DB CON TIMEOUT
+# ---------------------------------------------------
+
+class EsecutoreDB:
+    """
+    Pool limitato di thread per le chiamate bloccanti al database: chi
+    chiama aspetta al massimo `timeout` secondi, poi va avanti (la query
+    finisce in background e il risultato resta in cache per la prossima
+    richiesta). Il worker HTTP non resta mai bloccato su un DB lento.
+
+    Finché una chiamata a fn è in corso, le richieste successive aspettano
+    quella invece di accodarne un'altra: con il DB bloccato la coda del
+    pool non cresce.
+    """
+
+    def __init__(self, max_thread=4, timeout=1.0):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_thread, thread_name_prefix="chat-db")
+        self._lock = threading.Lock()
+        # fn → ultimo futuro (al massimo uno in corso per fn)
+        self._in_corso = {}
+
+    def _futuro(self, fn):
+        with self._lock:
+            futuro = self._in_corso.get(fn)
+            if futuro is None or futuro.done():
+                futuro = self._in_corso[fn] = self._pool.submit(fn)
+            return futuro
+
+    def esegui(self, fn):
+        """Risultato di fn() entro il timeout, altrimenti TimeoutError."""
+        return self._futuro(fn).result(timeout=self.timeout)
+
+    async def esegui_async(self, fn):
+        """Come esegui(), ma attende senza bloccare l'event loop."""
+        futuro = asyncio.wrap_future(self._futuro(fn))
+        # shield: allo scadere si smette di aspettare, la query non si può interrompere
+        return await asyncio.wait_for(asyncio.shield(futuro), self.timeout)
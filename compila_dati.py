@@ -0,0 +1,72 @@
+# ================================================================
+#  GoFoody AI - compila_dati.py (build step: data/ → data/dati.snap)
+# ================================================================
+#
+#  python compila_dati.py               → scrive data/dati.snap
+#  python compila_dati.py --verifica    → confronta snapshot e JSON
+#
+#  Su Render gira nel buildCommand: i worker poi caricano lo snapshot
+#  invece di rifare parsing JSON, indici e vettori nutrienti.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# i dati vanno calcolati dai JSON, non da uno snapshot vecchio
+os.environ["GOFOODY_SNAPSHOT"] = "0"
+
+
+def verifica(A, path):
+    """Lo snapshot riletto deve coincidere con i dati calcolati dai JSON."""
+    import snapshot_dati
+
+    dati = snapshot_dati.leggi_file(path, snapshot_dati._leggi_dati)
+    errori = []
+    if dati.nutrienti != A.NUTRIENTS:
+        errori.append("nutrienti")
+    if dati.ricette != A.ITALIAN_RECIPES:
+        errori.append("ricette")
+    for nome, indice in (
+        ("nutrienti", A.INDICE_NUTRIENTI),
+        ("nutrienti_canon", A.INDICE_NUTRIENTI_CANON),
+        ("italian_recipes", A.INDICE_ITALIAN_RECIPES.indice),
+    ):
+        letto = dati.indici[nome]
+        if letto.chiavi != indice.chiavi or dict(letto.posting) != dict(indice.posting):
+            errori.append("indice " + nome)
+    if dati.vettori != [A.vettori_ricetta(r) for r in A.ITALIAN_RECIPES.values()]:
+        errori.append("vettori")
+    return errori
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila lo snapshot binario dei dati GoFoody")
+    parser.add_argument("--output", help="percorso dello snapshot (default data/dati.snap)")
+    parser.add_argument("--verifica", action="store_true", help="rilegge lo snapshot e lo confronta con i JSON")
+    args = parser.parse_args()
+
+    import app as A
+
+    t0 = time.perf_counter()
+    try:
+        path = A.compila_snapshot_dati(args.output)
+    except ValueError as e:
+        # dati che il formato non rappresenta: i worker useranno i JSON
+        print("⚠️ Snapshot non compilato:", e)
+        return 0
+    print(f"💾 {path} ({os.path.getsize(path) / 1024:.0f} KB, {time.perf_counter() - t0:.2f}s)")
+
+    if args.verifica:
+        errori = verifica(A, path)
+        if errori:
+            print("❌ Snapshot diverso dai JSON:", ", ".join(errori))
+            return 1
+        print("✅ Snapshot identico ai JSON")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import heapq
+import json
 import os
 from flask import request, jsonify
 
@@ -16,12 +18,131 @@ def verifica_chiave():
     return token == AI_KEY
 
 
+# ===========================
+# SCADENZE
+# ===========================
+# entro quanti giorni un alimento genera un avviso
+GIORNI_ALERT = 5
+# entro quanti giorni la scadenza pesa nella classifica delle ricette:
+# un alimento che scade oggi conta 1 + BONUS_SCADENZA, uno oltre
+# l'orizzonte (o senza data, o già scaduto) conta 1 come prima
+ORIZZONTE_GIORNI = 7
+BONUS_SCADENZA = 1.0
+
+# stringa → data già letta: tra gli utenti le date si ripetono molto
+MAX_DATE_CACHE = 4096
+_date = {}
+
+
+def data_scadenza(scad_str):
+    """Data di "YYYY-MM-DD", None se manca o non è valida (anche se non è una stringa)."""
+    if not isinstance(scad_str, str):
+        return None
+    scad_str = scad_str.strip()
+    if not scad_str:
+        return None
+    try:
+        return _date[scad_str]
+    except KeyError:
+        pass
+    try:
+        data_scad = datetime.strptime(scad_str, "%Y-%m-%d").date()
+    except ValueError:
+        data_scad = None
+    if len(_date) >= MAX_DATE_CACHE:
+        _date.clear()
+    _date[scad_str] = data_scad
+    return data_scad
+
+
+def giorni_alla_scadenza(scad_str, oggi):
+    """Giorni da oggi alla data "YYYY-MM-DD", None se manca o non è valida."""
+    data_scad = data_scadenza(scad_str)
+    if data_scad is None:
+        return None
+    return (data_scad - oggi).days
+
+
+def messaggio_scadenza(nome, giorni):
+    """Avviso per un alimento che scade tra `giorni` giorni, None se è lontano."""
+    if giorni < 0:
+        return f"⚠️ {nome} è scaduto da {-giorni} giorni!"
+    if giorni == 0:
+        return f"⚠️ {nome} scade OGGI — consumalo subito!"
+    if giorni <= 2:
+        return f"⏳ {nome} scade tra {giorni} giorni — usalo prima possibile."
+    if giorni <= GIORNI_ALERT:
+        return f"📅 {nome} è da consumare entro {giorni} giorni."
+    # Nessun alert per alimenti con scadenza lontana
+    return None
+
+
+def peso_scadenza(giorni):
+    if giorni is None or giorni < 0 or giorni >= ORIZZONTE_GIORNI:
+        return 1.0
+    return 1.0 + BONUS_SCADENZA * (ORIZZONTE_GIORNI - giorni) / ORIZZONTE_GIORNI
+
+
+class DispensaScadenze:
+    """
+    Dispensa strutturata ({"nome", "scadenza"} o solo il nome) letta una
+    volta sola: date analizzate e alimenti con data in un min-heap per
+    scadenza, da cui escono sia gli avvisi sia i pesi per le ricette.
+    """
+
+    def __init__(self, dispensa, oggi=None):
+        oggi = oggi or datetime.now().date()
+        # (nome, giorni alla scadenza o None) nell'ordine della richiesta
+        self.voci = []
+        self.heap = []
+        for ordine, item in enumerate(dispensa or []):
+            if isinstance(item, dict):
+                nome = str(item.get("nome") or "")
+                giorni = giorni_alla_scadenza(item.get("scadenza"), oggi)
+            else:
+                nome, giorni = str(item or ""), None
+            self.voci.append((nome, giorni))
+            if giorni is not None:
+                heapq.heappush(self.heap, (giorni, ordine, nome))
+
+    def nomi(self):
+        return [nome for nome, _ in self.voci]
+
+    def alert(self):
+        """Avvisi dal primo che scade; si ferma al primo alimento senza avviso."""
+        coda = list(self.heap)
+        suggerimenti = []
+        while coda and coda[0][0] <= GIORNI_ALERT:
+            giorni, _, nome = heapq.heappop(coda)
+            suggerimenti.append(messaggio_scadenza(nome.capitalize().strip(), giorni))
+        if not suggerimenti:
+            suggerimenti.append("✅ Tutti gli alimenti in dispensa sono in buono stato.")
+        return suggerimenti
+
+    def pesi(self):
+        """Nome normalizzato → peso per la classifica (il più alto tra i doppioni)."""
+        pesi = {}
+        for nome, giorni in self.voci:
+            nome = nome.strip().lower()
+            pesi[nome] = max(pesi.get(nome, 0.0), peso_scadenza(giorni))
+        return pesi
+
+    def firma(self):
+        """
+        Giorni alla scadenza per nome, per le chiavi di cache: nomi così
+        come arrivano e nell'ordine della richiesta, perché alert() li
+        mostra così e a pari giorni li lascia in quell'ordine.
+        """
+        return [(nome, giorni) for nome, giorni in self.voci if giorni is not None]
+
+
 # ===========================
 # FUNZIONE PRINCIPALE
 # ===========================
-def suggerisci_usi(dispensa):
+def suggerisci_usi(dispensa, oggi=None):
     """
     Analizza una lista di alimenti e restituisce suggerimenti su cosa consumare prima.
+    `oggi` (date) è condiviso tra gli utenti nelle chiamate multiple.
     
     Parametri:
         dispensa: elenco di dizionari, es.
@@ -31,34 +152,15 @@ def suggerisci_usi(dispensa):
             {"nome": "Pasta", "scadenza": ""}
         ]
     """
-    oggi = datetime.now().date()
     suggerimenti = []
-    
-    for item in dispensa:
-        nome = item.get("nome", "").capitalize().strip()
-        scad_str = item.get("scadenza", "").strip()
-        if not scad_str:
-            continue
-        
-        try:
-            data_scad = datetime.strptime(scad_str, "%Y-%m-%d").date()
-        except ValueError:
-            continue
 
-        giorni = (data_scad - oggi).days
-        
-        # Analisi temporale
-        if giorni < 0:
-            suggerimenti.append(f"⚠️ {nome} è scaduto da {-giorni} giorni!")
-        elif giorni == 0:
-            suggerimenti.append(f"⚠️ {nome} scade OGGI — consumalo subito!")
-        elif giorni <= 2:
-            suggerimenti.append(f"⏳ {nome} scade tra {giorni} giorni — usalo prima possibile.")
-        elif giorni <= 5:
-            suggerimenti.append(f"📅 {nome} è da consumare entro {giorni} giorni.")
-        else:
-            # Nessun alert per alimenti con scadenza lontana
+    # stesso ordine della richiesta (DispensaScadenze.alert ordina per scadenza)
+    for nome, giorni in DispensaScadenze(dispensa, oggi).voci:
+        if giorni is None:
             continue
+        messaggio = messaggio_scadenza(nome.capitalize().strip(), giorni)
+        if messaggio:
+            suggerimenti.append(messaggio)
 
     if not suggerimenti:
         suggerimenti.append("✅ Tutti gli alimenti in dispensa sono in buono stato.")
@@ -66,6 +168,26 @@ def suggerisci_usi(dispensa):
     return suggerimenti
 
 
+def alert_utenti(righe, oggi=None, inizio=1):
+    """
+    Avvisi per più utenti: righe JSON {"user_id", "dispensa"} (testo o già
+    decodificate) → risultati {"user_id", "alert"}, uno per riga e nello
+    stesso ordine; le righe vuote si saltano. Una riga non valida dà
+    {"riga", "error"} (numerate da `inizio`) e non ferma le altre. "Oggi"
+    è lo stesso per tutti.
+    """
+    oggi = oggi or datetime.now().date()
+    for n, riga in enumerate(righe, inizio):
+        if isinstance(riga, (str, bytes)) and not riga.strip():
+            continue
+        try:
+            voce = json.loads(riga) if isinstance(riga, (str, bytes)) else riga
+            dispensa = voce.get("dispensa") or []
+            yield {"user_id": voce.get("user_id"), "alert": suggerisci_usi(dispensa, oggi)}
+        except (ValueError, AttributeError, TypeError) as e:
+            yield {"riga": n, "error": str(e)}
+
+
 # ===========================
 # ENDPOINT (opzionale Flask)
 # ===========================
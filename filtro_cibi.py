@@ -0,0 +1,86 @@
+# ================================================================
+#  GoFoody AI - filtro_cibi.py (cibi non graditi → ricette escluse)
+# ================================================================
+
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+MAX_CIBI_CACHE = 1024
+
+# tra un testo e il successivo: un cibo che non lo contiene non può
+# trovarsi a cavallo di due ricette
+SEPARATORE = "\x00"
+
+
+class FiltroCibi:
+    """
+    Testo ricercabile (titolo + descrizione in minuscolo) di ogni ricetta,
+    concatenato una volta sola al caricamento del catalogo.
+
+    Per ogni cibo non gradito l'insieme delle ricette che lo contengono si
+    calcola con una scansione del testo concatenato (str.find, un salto
+    alla ricetta successiva per ogni match) e resta in cache: "pesce",
+    "latticini" e simili si ripetono tra le richieste. Una richiesta fa
+    solo l'unione degli insiemi dei suoi cibi.
+
+    Stessa semantica di `any(no in testo for no in cibi_no)`: sottostringa,
+    non parola intera.
+    """
+
+    def __init__(self, testi, capienza=MAX_CIBI_CACHE):
+        self.testi = list(testi)
+        self.inizi = []
+        pos = 0
+        for t in self.testi:
+            self.inizi.append(pos)
+            pos += len(t) + 1
+        self.corpus = SEPARATORE.join(self.testi)
+        self.capienza = capienza
+        self._esclusi = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.testi)
+
+    def _scansiona(self, no):
+        if not no or SEPARATORE in no:
+            # caso degenere: confronto ricetta per ricetta
+            return frozenset(i for i, t in enumerate(self.testi) if no in t)
+        corpus, inizi = self.corpus, self.inizi
+        trovate = []
+        pos = corpus.find(no)
+        while pos >= 0:
+            i = bisect_right(inizi, pos) - 1
+            trovate.append(i)
+            if i + 1 >= len(inizi):
+                break
+            pos = corpus.find(no, inizi[i + 1])
+        return frozenset(trovate)
+
+    def ricette_con(self, no):
+        """Indici delle ricette il cui testo contiene `no` (già minuscolo)."""
+        with self._lock:
+            esclusi = self._esclusi.get(no)
+            if esclusi is not None:
+                self._esclusi.move_to_end(no)
+                return esclusi
+        esclusi = self._scansiona(no)
+        with self._lock:
+            self._esclusi[no] = esclusi
+            while len(self._esclusi) > self.capienza:
+                self._esclusi.popitem(last=False)
+        return esclusi
+
+    def esclusi(self, cibi_no):
+        """
+        Indici delle ricette che contengono almeno un cibo non gradito,
+        None se non si esclude niente (nessun cibo, o li conterrebbero tutte).
+        """
+        if not cibi_no:
+            return None
+        insiemi = [self.ricette_con(no) for no in set(cibi_no)]
+        esclusi = insiemi[0].union(*insiemi[1:]) if len(insiemi) > 1 else insiemi[0]
+        if len(esclusi) == len(self.testi):
+            return None
+        return esclusi
@@ -0,0 +1,47 @@
+# ================================================================
+#  GoFoody AI - gunicorn.conf.py (preload + dati condivisi copy-on-write)
+# ================================================================
+#
+#  Con GOFOODY_PRELOAD=1 (default) app.py viene importato una sola volta
+#  nel master: ricette, nutrienti, indici, vettori e catalogo CSV vengono
+#  costruiti lì e i worker li ereditano dal fork, condividendo le pagine
+#  di memoria finché nessuno le scrive.
+#
+#  Il garbage collector scrive nell'header di ogni oggetto che visita:
+#  senza gc.freeze() la prima collection in un worker "sporcherebbe" le
+#  pagine condivise e le copierebbe. Quindi:
+#    - gc disabilitato durante il caricamento nel master
+#    - gc.freeze() prima del fork: gli oggetti caricati finiscono nella
+#      generazione permanente e il gc dei worker non li tocca più
+#
+#  Numero di worker e porta restano quelli di gunicorn (WEB_CONCURRENCY,
+#  PORT). Misura: python misura_memoria.py
+
+import gc
+import os
+
+preload_app = os.getenv("GOFOODY_PRELOAD", "1").strip().lower() not in ("0", "false", "no", "off")
+
+if preload_app:
+    # il file di config è eseguito prima del caricamento dell'app
+    gc.disable()
+
+
+def on_starting(server):
+    # metriche di un avvio precedente: pid che i nuovi worker possono riusare
+    import metriche
+    metriche.azzera_cartella()
+
+
+def when_ready(server):
+    # app già caricata nel master, nessun worker ancora avviato
+    if preload_app:
+        gc.freeze()
+        gc.enable()
+        server.log.info("Dati condivisi congelati (%d oggetti)", gc.get_freeze_count())
+
+
+def pre_fork(server, worker):
+    # anche i worker riavviati dopo il primo giro ereditano oggetti congelati
+    if preload_app:
+        gc.freeze()
@@ -0,0 +1,135 @@
+# ================================================================
+#  GoFoody AI - indice_intenti.py (TF-IDF n-grammi per gli intenti chat)
+# ================================================================
+
+import math
+import os
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# soglia sul coseno TF-IDF al posto di 0.45 su SequenceMatcher.ratio():
+# su parafrasi degli esempi (refusi, parole in più o in meno, ordine
+# diverso) è la più alta che perde meno dell'1% dei match di difflib,
+# e scarta molti più prompt fuori tema
+SOGLIA = float(os.getenv("CHAT_SOGLIA_INTENTO", "0.35"))
+
+
+# ---------------------------------------------------
+# VETTORI
+# ---------------------------------------------------
+
+def ngrammi_parole(testo, n=3):
+    """Trigrammi di caratteri per parola, con uno spazio ai bordi."""
+    for parola in testo.split():
+        s = " " + parola + " "
+        if len(s) <= n:
+            yield s
+        else:
+            for i in range(len(s) - n + 1):
+                yield s[i:i + n]
+
+
+def _pesi(conteggi, idf, idf_ignoto):
+    """n-gramma → tf-idf normalizzato L2 (tf sublineare)."""
+    pesi = {g: (1.0 + math.log(c)) * idf.get(g, idf_ignoto) for g, c in conteggi.items()}
+    norma = math.sqrt(sum(w * w for w in pesi.values()))
+    if not norma:
+        return {}
+    return {g: w / norma for g, w in pesi.items()}
+
+
+# ---------------------------------------------------
+# INDICE
+# ---------------------------------------------------
+
+class IndiceIntenti:
+    """
+    Tutti gli esempi di tutti gli intenti come vettori TF-IDF di trigrammi
+    di caratteri, costruiti una volta per lista di intenti caricata.
+
+    Per un prompt: un vettore e un prodotto scalare sparso con tutti gli
+    esempi (posting list n-gramma → esempi, un bincount con NumPy),
+    invece di un SequenceMatcher per esempio. Il punteggio è il coseno
+    tra prompt ed esempio; a pari punteggio vince il primo esempio in
+    ordine di caricamento, come nella scansione originale.
+    """
+
+    def __init__(self, intenti, n=3):
+        self.n = n
+        self.intenti = list(intenti)
+        self.intento_di = []
+        conteggi = []
+        for i, intento in enumerate(self.intenti):
+            esempi = intento.get("_esempi")
+            if esempi is None:
+                esempi = [e.lower() for e in (intento.get("esempi_domande") or "").split("\n")]
+            for esempio in esempi:
+                self.intento_di.append(i)
+                conteggi.append(Counter(ngrammi_parole(esempio, n)))
+
+        df = Counter(g for c in conteggi for g in c)
+        totale = len(conteggi)
+        self.idf = {g: math.log((1 + totale) / (1 + d)) + 1.0 for g, d in df.items()}
+        # un n-gramma mai visto pesa come il più raro: testo in più nel
+        # prompt abbassa il coseno, come abbassava il ratio di difflib
+        self.idf_ignoto = math.log(1 + totale) + 1.0
+
+        posting = defaultdict(list)
+        for e, c in enumerate(conteggi):
+            for g, w in _pesi(c, self.idf, self.idf_ignoto).items():
+                posting[g].append((e, w))
+        self.posting = dict(posting)
+
+        self._np_posting = None
+        if np is not None:
+            self._np_posting = {
+                g: (np.fromiter((e for e, _ in voci), dtype=np.int64, count=len(voci)),
+                    np.fromiter((w for _, w in voci), dtype=np.float64, count=len(voci)))
+                for g, voci in self.posting.items()
+            }
+
+    def __len__(self):
+        return len(self.intento_di)
+
+    def punteggi(self, prompt):
+        """Coseno tra il prompt (già minuscolo) e ogni esempio."""
+        q = _pesi(Counter(ngrammi_parole(prompt, self.n)), self.idf, self.idf_ignoto)
+        if self._np_posting is not None:
+            voci = [(self._np_posting[g], w) for g, w in q.items() if g in self._np_posting]
+            if not voci:
+                return np.zeros(len(self.intento_di))
+            ids = np.concatenate([p[0] for p, _ in voci])
+            pesi = np.concatenate([p[1] * w for p, w in voci])
+            return np.bincount(ids, weights=pesi, minlength=len(self.intento_di))
+
+        punteggi = [0.0] * len(self.intento_di)
+        for g, w in q.items():
+            for e, we in self.posting.get(g, ()):
+                punteggi[e] += we * w
+        return punteggi
+
+    def migliore(self, prompt, soglia=SOGLIA):
+        """(intento, punteggio) dell'esempio più simile, (None, punteggio) sotto soglia."""
+        if not self.intento_di:
+            return None, 0.0
+        punteggi = self.punteggi(prompt)
+        if isinstance(punteggi, list):
+            e = max(range(len(punteggi)), key=punteggi.__getitem__)
+        else:
+            e = int(np.argmax(punteggi))
+        punteggio = float(punteggi[e])
+        if punteggio < soglia:
+            return None, punteggio
+        return self.intenti[self.intento_di[e]], punteggio
+
+
+class ListaIntenti(list):
+    """Lista di intenti caricata insieme al suo indice (costruito una volta)."""
+
+    def __init__(self, intenti=()):
+        super().__init__(intenti)
+        self.indice = IndiceIntenti(self)
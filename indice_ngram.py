@@ -0,0 +1,311 @@
+# ================================================================
+#  GoFoody AI - indice_ngram.py (ricerca fuzzy veloce sulle chiavi)
+# ================================================================
+
+import bisect
+import difflib
+import itertools
+import threading
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# chiavi aggiunte dopo la vista NumPy controllate una per una; oltre
+# questa quota la vista si ricostruisce
+MAX_CHIAVI_NUOVE = 1024
+
+
+# ---------------------------------------------------
+# N-GRAMMI DI CARATTERI
+# ---------------------------------------------------
+
+def ngrammi(testo, n=2):
+    """Bigrammi con bordi (^ e $): anche le chiavi corte hanno almeno un n-gramma."""
+    s = "^" + testo + "$"
+    if len(s) <= n:
+        return {s}
+    return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+
+# ---------------------------------------------------
+# INDICE
+# ---------------------------------------------------
+
+class IndiceNgram:
+    """
+    Indice invertito n-gramma → chiavi, costruito una volta sola.
+
+    `migliore()` restituisce la stessa chiave della scansione lineare con
+    difflib.SequenceMatcher(None, query, chiave).ratio(), ma calcola il
+    punteggio solo sui candidati che condividono almeno un n-gramma e la
+    cui lunghezza rende ancora raggiungibile la soglia. È esatto per
+    soglie >= 2/3 (nell'app 0.75 e 0.82): due testi senza n-grammi in
+    comune, bordi compresi, hanno ratio() < 2/3.
+
+    Con NumPy il filtro sui candidati è vettoriale: per ogni chiave i
+    conteggi dei caratteri, e il limite di quick_ratio() (2 * caratteri
+    in comune / (lq + lk), che ratio() non supera mai) viene calcolato per
+    tutti i candidati insieme. ratio() gira solo su quelli che restano.
+    """
+
+    def __init__(self, chiavi, n=2):
+        self.n = n
+        self.chiavi = []
+        self.lunghezze = []
+        self.posting = defaultdict(list)
+        self._vista = None
+        self._lock_vista = threading.Lock()
+        for k in chiavi:
+            self.aggiungi(k)
+
+    @classmethod
+    def da_posting(cls, chiavi, posting, n=2):
+        """Indice già costruito (es. letto dallo snapshot dei dati): nessun n-gramma da calcolare."""
+        indice = cls((), n)
+        indice.chiavi = list(chiavi)
+        indice.lunghezze = [len(k) for k in indice.chiavi]
+        indice.posting = defaultdict(list, posting)
+        return indice
+
+    def __len__(self):
+        return len(self.chiavi)
+
+    def aggiungi(self, chiave):
+        """Aggiunge una chiave in coda (l'ordine di inserimento decide i pareggi)."""
+        i = len(self.chiavi)
+        # prima chiave e lunghezza, poi i posting: un lettore concorrente
+        # non vede mai un id senza chiave
+        self.chiavi.append(chiave)
+        self.lunghezze.append(len(chiave))
+        for g in ngrammi(chiave, self.n):
+            self.posting[g].append(i)
+        return i
+
+    def primo_contenente(self, sotto):
+        """Id della prima chiave (in ordine di inserimento) che contiene `sotto`, o None."""
+        if not sotto:
+            return None
+        if len(sotto) < self.n:
+            candidati = range(len(self.chiavi))
+        else:
+            # una chiave che contiene `sotto` ne contiene tutti gli n-grammi interni
+            grammi = {sotto[i:i + self.n] for i in range(len(sotto) - self.n + 1)}
+            liste = sorted((self.posting.get(g, []) for g in grammi), key=len)
+            if not liste[0]:
+                return None
+            comuni = set(liste[0])
+            for lista in liste[1:]:
+                comuni.intersection_update(lista)
+                if not comuni:
+                    return None
+            candidati = sorted(comuni)
+
+        for i in candidati:
+            if sotto in self.chiavi[i]:
+                return i
+        return None
+
+    def candidati(self, query):
+        """Id delle chiavi con almeno un n-gramma in comune, dai più simili ai meno simili."""
+        comuni = defaultdict(int)
+        for g in ngrammi(query, self.n):
+            for i in self.posting.get(g, ()):
+                comuni[i] += 1
+        return sorted(comuni, key=lambda i: (-comuni[i], i))
+
+    def migliore(self, query, soglia):
+        """(chiave, punteggio) del match migliore sopra soglia, altrimenti (None, punteggio)."""
+        i, score = self.migliore_id(query, soglia)
+        if i is None:
+            return None, score
+        return self.chiavi[i], score
+
+    def _vista_numpy(self):
+        """VistaNumpy aggiornata (ricostruita se mancano troppe chiavi), None senza NumPy."""
+        if np is None or not self.chiavi:
+            return None
+        vista = self._vista
+        if vista is None or len(self.chiavi) - vista.n > MAX_CHIAVI_NUOVE:
+            with self._lock_vista:
+                vista = self._vista
+                if vista is None or len(self.chiavi) - vista.n > MAX_CHIAVI_NUOVE:
+                    vista = self._vista = VistaNumpy(self.chiavi, self.posting)
+        return vista
+
+    def candidati_con_limite(self, query, soglia):
+        """
+        [(id, limite)] come candidati(), senza le chiavi il cui limite di
+        quick_ratio() è sotto soglia. `limite` è None quando non è stato
+        calcolato (senza NumPy, o per le chiavi aggiunte dopo la vista):
+        il controllo resta al chiamante.
+        """
+        vista = self._vista_numpy()
+        if vista is None:
+            return [(i, None) for i in self.candidati(query)]
+
+        grammi = ngrammi(query, self.n)
+        risultato = vista.candidati(query, grammi, soglia)
+        # chiavi arrivate dopo la vista: in coda, controllate dal chiamante
+        for i in range(vista.n, len(self.chiavi)):
+            if grammi & ngrammi(self.chiavi[i], self.n):
+                risultato.append((i, None))
+        return risultato
+
+    def migliore_id(self, query, soglia):
+        """Come migliore(), ma restituisce l'id della chiave."""
+        if not query or not self.chiavi:
+            return None, 0
+
+        lq = len(query)
+        sm = difflib.SequenceMatcher(None)
+        sm.set_seq1(query)
+
+        best_id = None
+        best_score = 0
+        for i, limite_i in self.candidati_con_limite(query, soglia):
+            # a parità di punteggio vince la chiave inserita prima,
+            # come nella scansione lineare
+            limite = max(best_score, soglia)
+            if limite_i is not None:
+                if limite_i < limite:
+                    continue
+                sm.set_seq2(self.chiavi[i])
+            else:
+                lk = self.lunghezze[i]
+                # ratio = 2*M / (lq + lk) con M <= min(lq, lk)
+                if 2.0 * min(lq, lk) / (lq + lk) < limite:
+                    continue
+                sm.set_seq2(self.chiavi[i])
+                if sm.real_quick_ratio() < limite or sm.quick_ratio() < limite:
+                    continue
+            score = sm.ratio()
+            if score > best_score or (score == best_score and best_id is not None and i < best_id):
+                best_id = i
+                best_score = score
+
+        if best_id is None or best_score < soglia:
+            return None, best_score
+        return best_id, best_score
+
+    def sopra_soglia(self, query, soglia):
+        """
+        Id di tutte le chiavi con SequenceMatcher(None, chiave, query).ratio() >= soglia.
+        Qui la query è il secondo argomento, come in copertura_ingredienti.
+        """
+        if not query or not self.chiavi:
+            return []
+
+        lq = len(query)
+        sm = difflib.SequenceMatcher(None)
+        sm.set_seq2(query)
+
+        trovati = []
+        for i, limite in self.candidati_con_limite(query, soglia):
+            sm.set_seq1(self.chiavi[i])
+            if limite is None:
+                lk = self.lunghezze[i]
+                if 2.0 * min(lq, lk) / (lq + lk) < soglia:
+                    continue
+                if sm.real_quick_ratio() < soglia or sm.quick_ratio() < soglia:
+                    continue
+            if sm.ratio() >= soglia:
+                trovati.append(i)
+        return trovati
+
+
+class VistaNumpy:
+    """
+    Le prime `n` chiavi di un IndiceNgram in array: posting per n-gramma
+    e una matrice chiave × carattere con i conteggi, per il limite di
+    quick_ratio() su tutti i candidati in una volta.
+    """
+
+    def __init__(self, chiavi, posting):
+        self.n = n = len(chiavi)
+        self.lunghezze = np.fromiter((len(k) for k in chiavi[:n]), dtype=np.float64, count=n)
+        caratteri = sorted(set(itertools.chain.from_iterable(chiavi[:n])))
+        self.alfabeto = {c: j for j, c in enumerate(caratteri)}
+        self.conteggi = np.zeros((n, len(caratteri)), dtype=np.uint16)
+        for i, k in enumerate(chiavi[:n]):
+            for c, m in Counter(k).items():
+                self.conteggi[i, self.alfabeto[c]] = min(m, 65535)
+        # le posting list sono in ordine di id: basta tagliarle a n
+        self.posting = {}
+        for g, ids in list(posting.items()):
+            fine = bisect.bisect_left(ids, n)
+            if fine:
+                self.posting[g] = np.asarray(ids[:fine], dtype=np.int64)
+
+    def candidati(self, query, grammi, soglia):
+        """[(id, limite quick_ratio)] con limite >= soglia, per n-grammi comuni decrescenti."""
+        liste = [self.posting[g] for g in grammi if g in self.posting]
+        if not liste:
+            return []
+        ids, comuni = np.unique(np.concatenate(liste), return_counts=True)
+
+        q = np.zeros(len(self.alfabeto), dtype=np.uint16)
+        for c, m in Counter(query).items():
+            j = self.alfabeto.get(c)
+            if j is not None:
+                q[j] = min(m, 65535)
+        in_comune = np.minimum(self.conteggi[ids], q).sum(axis=1, dtype=np.int64)
+        # stessa aritmetica di SequenceMatcher.quick_ratio()
+        limite = 2.0 * in_comune / (len(query) + self.lunghezze[ids])
+
+        tenuti = limite >= soglia
+        ids, comuni, limite = ids[tenuti], comuni[tenuti], limite[tenuti]
+        # ids è crescente: l'ordinamento stabile tiene l'id come secondo criterio
+        ordine = np.argsort(-comuni, kind="stable")
+        return list(zip(ids[ordine].tolist(), limite[ordine].tolist()))
+
+
+# ---------------------------------------------------
+# INDICE SULLE CHIAVI DI UN DIZIONARIO
+# ---------------------------------------------------
+
+class IndiceDizionario:
+    """
+    IndiceNgram sulle chiavi di un dict che cresce solo in coda (come
+    USER_RECIPES): le chiavi nuove vengono indicizzate alla prima ricerca.
+    `forma` trasforma la chiave nel testo indicizzato (es. "_" → " ").
+    """
+
+    def __init__(self, dizionario, forma=None, n=2, indice=None):
+        self.dizionario = dizionario
+        self.forma = forma or (lambda k: k)
+        self.originali = []
+        self.indice = IndiceNgram((), n)
+        if indice is not None:
+            # indice precalcolato sulle prime len(indice) chiavi del dict
+            self.originali = list(itertools.islice(dizionario, len(indice)))
+            self.indice = indice
+        self._lock = threading.Lock()
+        self.sincronizza()
+
+    def sincronizza(self):
+        if len(self.dizionario) == len(self.originali):
+            return
+        with self._lock:
+            try:
+                nuove = list(itertools.islice(self.dizionario, len(self.originali), None))
+            except RuntimeError:
+                # dict modificato da un altro thread: riprova alla prossima ricerca
+                return
+            for k in nuove:
+                self.indice.aggiungi(self.forma(k))
+                self.originali.append(k)
+
+    def primo_contenente(self, sotto):
+        self.sincronizza()
+        i = self.indice.primo_contenente(sotto)
+        return None if i is None else self.originali[i]
+
+    def migliore(self, query, soglia):
+        self.sincronizza()
+        i, score = self.indice.migliore_id(query, soglia)
+        if i is None:
+            return None, score
+        return self.originali[i], score
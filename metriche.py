@@ -0,0 +1,299 @@
+# ================================================================
+#  GoFoody AI - metriche.py (latenze per route e per fase, /metrics)
+# ================================================================
+#
+#  Istogrammi e contatori in memoria per processo. Con
+#  GOFOODY_METRICS_DIR ogni worker gunicorn scrive periodicamente le sue
+#  metriche in un file della cartella e /metrics somma quelle di tutti
+#  i worker vivi, più i totali dei worker finiti (FILE_RITIRATI): un
+#  worker riciclato non fa tornare indietro i contatori. Il master
+#  gunicorn svuota la cartella all'avvio (azzera_cartella).
+#
+#  /metrics non ha autenticazione.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from ricette_utente import LockFile
+
+BUCKET = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICHE_DIR = os.getenv("GOFOODY_METRICS_DIR", "").strip()
+INTERVALLO_SCRITTURA = float(os.getenv("GOFOODY_METRICS_FLUSH_SEC", "5"))
+
+DESCRIZIONI = {
+    "gofoody_http_request_duration_seconds": "Latenza delle richieste HTTP per route",
+    "gofoody_stage_duration_seconds": "Durata delle fasi interne degli handler",
+}
+
+_lock = threading.Lock()
+# (nome, ((etichetta, valore), ...)) → [conteggi per bucket..., +Inf, somma]
+_istogrammi = {}
+# (nome, ((etichetta, valore), ...)) → [valore]
+_contatori = {}
+_ultima_scrittura = 0.0
+# pid che ha scritto il file di questo processo: dopo un fork è diverso
+_pid_scrittore = None
+
+# somma delle metriche dei worker finiti, e il lock per aggiornarla
+FILE_RITIRATI = "ritirate.json"
+FILE_LOCK = "metriche.lock"
+
+
+# ---------------------------------------------------
+# REGISTRAZIONE
+# ---------------------------------------------------
+
+def osserva(nome, secondi, **etichette):
+    chiave = (nome, tuple(sorted(etichette.items())))
+    with _lock:
+        h = _istogrammi.get(chiave)
+        if h is None:
+            h = _istogrammi[chiave] = [0] * (len(BUCKET) + 1) + [0.0]
+        for i, limite in enumerate(BUCKET):
+            if secondi <= limite:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKET)] += 1
+        h[-1] += secondi
+
+
+def incrementa(nome, valore=1, **etichette):
+    chiave = (nome, tuple(sorted(etichette.items())))
+    with _lock:
+        c = _contatori.get(chiave)
+        if c is None:
+            c = _contatori[chiave] = [0]
+        c[0] += valore
+
+
+def descrivi(nome, testo):
+    """Testo HELP di una metrica registrata da un altro modulo."""
+    DESCRIZIONI[nome] = testo
+
+
+@contextmanager
+def fase(nome):
+    """Cronometra una fase interna: `with fase("coverage_scoring"): ...`"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        osserva("gofoody_stage_duration_seconds", time.perf_counter() - t0, stage=nome)
+
+
+def azzera():
+    with _lock:
+        _istogrammi.clear()
+        _contatori.clear()
+
+
+# ---------------------------------------------------
+# AGGREGAZIONE TRA WORKER
+# ---------------------------------------------------
+
+def _esporta():
+    with _lock:
+        return (
+            [["histogram", nome, list(etichette), list(h)] for (nome, etichette), h in _istogrammi.items()]
+            + [["counter", nome, list(etichette), list(c)] for (nome, etichette), c in _contatori.items()]
+        )
+
+
+def _file_processo(pid=None):
+    return os.path.join(METRICHE_DIR, f"metriche_{pid or os.getpid()}.json")
+
+
+def _leggi(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _somma(totali, voci):
+    for tipo, nome, etichette, valori in voci:
+        chiave = (tipo, nome, tuple(map(tuple, etichette)))
+        acc = totali.get(chiave)
+        if acc is None:
+            totali[chiave] = list(valori)
+        else:
+            for i, v in enumerate(valori):
+                acc[i] += v
+    return totali
+
+
+def ritira_file(path):
+    """
+    Somma le metriche di un processo finito in FILE_RITIRATI e cancella
+    il suo file. Sotto lock: se due worker ritirano lo stesso file, il
+    secondo non lo trova più e non conta niente due volte.
+    """
+    with LockFile(os.path.join(METRICHE_DIR, FILE_LOCK)):
+        if not os.path.exists(path):
+            return
+        voci = _leggi(path)
+        if voci:
+            path_ritirati = os.path.join(METRICHE_DIR, FILE_RITIRATI)
+            totali = _somma(_somma({}, _leggi(path_ritirati) or []), voci)
+            tmp = path_ritirati + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump([[t, n, list(e), v] for (t, n, e), v in totali.items()], f)
+            os.replace(tmp, path_ritirati)
+        os.remove(path)
+
+
+def azzera_cartella():
+    """Toglie i file di un avvio precedente (pid riusati, totali vecchi): per il master gunicorn."""
+    if not METRICHE_DIR or not os.path.isdir(METRICHE_DIR):
+        return
+    for nome_file in os.listdir(METRICHE_DIR):
+        if nome_file.startswith("metriche_") or nome_file.startswith(FILE_RITIRATI):
+            try:
+                os.remove(os.path.join(METRICHE_DIR, nome_file))
+            except OSError:
+                pass
+
+
+def scrivi_file_processo(forza=False):
+    """Salva le metriche di questo worker (al massimo ogni INTERVALLO_SCRITTURA)."""
+    global _ultima_scrittura, _pid_scrittore
+    if not METRICHE_DIR:
+        return
+    adesso = time.monotonic()
+    if not forza and adesso - _ultima_scrittura < INTERVALLO_SCRITTURA:
+        return
+    _ultima_scrittura = adesso
+    try:
+        os.makedirs(METRICHE_DIR, exist_ok=True)
+        path = _file_processo()
+        if _pid_scrittore != os.getpid():
+            # prima scrittura di questo processo: un file con il suo pid è
+            # di un worker finito con lo stesso pid, i suoi conteggi restano
+            ritira_file(path)
+            _pid_scrittore = os.getpid()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_esporta(), f)
+        os.replace(tmp, path)
+    except Exception as e:
+        print("⚠️ Scrittura metriche fallita:", e)
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _raccogli():
+    """Metriche sommate su tutti i worker vivi e su quelli finiti (o solo questo processo)."""
+    if not METRICHE_DIR:
+        return {(t, n, tuple(map(tuple, e))): v for t, n, e, v in _esporta()}
+
+    scrivi_file_processo(forza=True)
+    vivi = []
+    for nome_file in os.listdir(METRICHE_DIR):
+        if not (nome_file.startswith("metriche_") and nome_file.endswith(".json")):
+            continue
+        try:
+            pid = int(nome_file[len("metriche_"):-len(".json")])
+        except ValueError:
+            continue
+        path = os.path.join(METRICHE_DIR, nome_file)
+        if _pid_vivo(pid):
+            vivi.append(path)
+            continue
+        try:
+            ritira_file(path)
+        except OSError as e:
+            print("⚠️ Ritiro metriche fallito:", e)
+
+    totali = _somma({}, _leggi(os.path.join(METRICHE_DIR, FILE_RITIRATI)) or [])
+    for path in vivi:
+        _somma(totali, _leggi(path) or [])
+    return totali
+
+
+# ---------------------------------------------------
+# FORMATO PROMETHEUS
+# ---------------------------------------------------
+
+def _etichette(coppie):
+    if not coppie:
+        return ""
+    return "{" + ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in coppie
+    ) + "}"
+
+
+def testo_prometheus():
+    righe = []
+    per_nome = {}
+    for (tipo, nome, etichette), valori in sorted(_raccogli().items()):
+        per_nome.setdefault((tipo, nome), []).append((etichette, valori))
+
+    for (tipo, nome), serie in per_nome.items():
+        righe.append(f"# HELP {nome} {DESCRIZIONI.get(nome, nome)}")
+        righe.append(f"# TYPE {nome} {tipo}")
+        if tipo == "counter":
+            for etichette, valori in serie:
+                righe.append(f"{nome}{_etichette(etichette)} {valori[0]}")
+            continue
+        for etichette, h in serie:
+            cumulato = 0
+            for limite, conteggio in zip(BUCKET, h):
+                cumulato += conteggio
+                righe.append(f"{nome}_bucket{_etichette(etichette + (('le', repr(limite)),))} {cumulato}")
+            cumulato += h[len(BUCKET)]
+            righe.append(f"{nome}_bucket{_etichette(etichette + (('le', '+Inf'),))} {cumulato}")
+            righe.append(f"{nome}_sum{_etichette(etichette)} {h[-1]:.6f}")
+            righe.append(f"{nome}_count{_etichette(etichette)} {cumulato}")
+    return "\n".join(righe) + "\n"
+
+
+# ---------------------------------------------------
+# MIDDLEWARE FLASK + /metrics
+# ---------------------------------------------------
+
+def registra_metriche(app):
+
+    @app.before_request
+    def _inizio_richiesta():
+        g._metriche_t0 = time.perf_counter()
+
+    def _registra(status):
+        t0 = g.pop("_metriche_t0", None)
+        if t0 is None:
+            return
+        regola = request.url_rule.rule if request.url_rule else "<non_trovata>"
+        osserva(
+            "gofoody_http_request_duration_seconds", time.perf_counter() - t0,
+            route=regola, method=request.method, status=str(status)
+        )
+        scrivi_file_processo()
+
+    @app.after_request
+    def _fine_richiesta(response):
+        _registra(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _errore_richiesta(exc):
+        # eccezioni non gestite: after_request non viene chiamato
+        _registra(500)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(testo_prometheus(), mimetype="text/plain; version=0.0.4")
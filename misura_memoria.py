@@ -0,0 +1,150 @@
+# ================================================================
+#  GoFoody AI - misura_memoria.py (RSS/PSS dei worker gunicorn)
+# ================================================================
+#
+#  python misura_memoria.py                 → 4 worker, preload sì/no
+#  python misura_memoria.py --workers 2     → altro numero di worker
+#
+#  Avvia gunicorn con gunicorn.conf.py, manda un po' di traffico a ogni
+#  worker e legge /proc/<pid>/smaps_rollup (solo Linux):
+#    RSS = pagine residenti (contano anche quelle condivise)
+#    PSS = condivise divise tra i processi che le usano
+#    USS = pagine private del processo (quello che costa un worker in più)
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+API_KEY = os.getenv("AI_KEY", "gofoody_3f8G7pLzR!x2N9tQ@uY5aWsE#jD6kHrV^m1ZbTqL4cP0oFi")
+
+
+def porta_libera():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memoria(pid):
+    """kB da smaps_rollup: Rss, Pss e USS (Private_Clean + Private_Dirty)."""
+    valori = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for riga in f:
+            parti = riga.split()
+            if len(parti) >= 2 and parti[0].endswith(":"):
+                try:
+                    valori[parti[0][:-1]] = int(parti[1])
+                except ValueError:
+                    pass
+    return {
+        "rss": valori.get("Rss", 0),
+        "pss": valori.get("Pss", 0),
+        "uss": valori.get("Private_Clean", 0) + valori.get("Private_Dirty", 0),
+    }
+
+
+def figli(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def richiesta(url, dati=None):
+    req = urllib.request.Request(url)
+    if dati is not None:
+        req.data = json.dumps(dati).encode("utf-8")
+        req.add_header("Content-Type", "application/json")
+        req.add_header("Authorization", "Bearer " + API_KEY)
+    with urllib.request.urlopen(req, timeout=30) as r:
+        return r.read()
+
+
+def traffico(base, n):
+    """
+    Le stesse route calde dei benchmark, così ogni worker tocca i dati.
+    Solo piatti già presenti: /ai/meal non deve salvare ricette utente.
+    """
+    with open(os.path.join(BASE_DIR, "data", "italian_recipes.json"), encoding="utf-8") as f:
+        piatti = [r["titolo"] for r in json.load(f).values()][:50]
+    for i in range(n):
+        richiesta(base + "/ai/meal", {"alimento": piatti[i % len(piatti)], "quantita": "200 g"})
+        richiesta(base + "/ai/ricette", {"dispensa": ["pasta", "pomodoro", "aglio", str(i)]})
+
+
+def misura(preload, workers, richieste):
+    porta = porta_libera()
+    env = dict(os.environ, GOFOODY_PRELOAD="1" if preload else "0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "-w", str(workers), "-b", f"127.0.0.1:{porta}", "app:app"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{porta}"
+    try:
+        limite = time.time() + 120
+        while True:
+            try:
+                richiesta(base + "/health")
+                if len(figli(proc.pid)) >= workers:
+                    break
+            except OSError:
+                pass
+            if time.time() > limite or proc.poll() is not None:
+                raise RuntimeError("gunicorn non si è avviato")
+            time.sleep(0.2)
+
+        traffico(base, richieste)
+        time.sleep(0.5)
+
+        master = memoria(proc.pid)
+        lavoratori = [memoria(p) for p in figli(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    n = len(lavoratori)
+    return {
+        "preload": preload,
+        "workers": n,
+        "master": master,
+        "worker_medio": {k: sum(w[k] for w in lavoratori) // n for k in ("rss", "pss", "uss")},
+        "pss_totale": master["pss"] + sum(w["pss"] for w in lavoratori),
+    }
+
+
+def stampa(r):
+    w = r["worker_medio"]
+    etichetta = "preload + gc.freeze" if r["preload"] else "senza preload"
+    print(f"  {etichetta:<22} worker RSS {w['rss'] / 1024:7.1f} MB   "
+          f"PSS {w['pss'] / 1024:7.1f} MB   USS {w['uss'] / 1024:7.1f} MB   "
+          f"PSS totale ({r['workers']} worker + master) {r['pss_totale'] / 1024:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria per worker gunicorn con e senza preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--richieste", type=int, default=200, help="richieste di riscaldamento")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("❌ Serve Linux con /proc/<pid>/smaps_rollup")
+        return 1
+
+    print(f"\n▶ gunicorn con {args.workers} worker, {args.richieste} richieste di riscaldamento")
+    risultati = [misura(p, args.workers, args.richieste) for p in (False, True)]
+    for r in risultati:
+        stampa(r)
+
+    senza, con = risultati
+    print(f"  → USS per worker: {senza['worker_medio']['uss'] / 1024:.1f} → "
+          f"{con['worker_medio']['uss'] / 1024:.1f} MB, PSS totale: "
+          f"{senza['pss_totale'] / 1024:.1f} → {con['pss_totale'] / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
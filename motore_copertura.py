@@ -0,0 +1,169 @@
+# ================================================================
+#  GoFoody AI - motore_copertura.py (copertura: posting list e NumPy)
+# ================================================================
+
+import heapq
+import itertools
+import os
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# "numpy" (default se disponibile) oppure "python" (Counter + heap, solo
+# libreria standard) per confrontare i risultati dei due percorsi
+MOTORE = os.getenv("GOFOODY_MOTORE_COPERTURA", "numpy").strip().lower()
+
+
+def numpy_attivo():
+    return np is not None and MOTORE == "numpy"
+
+
+def _punteggio(valore):
+    # troncato come la copertura (int(), non round): con tutti i pesi a 1
+    # la somma è il conteggio esatto e il punteggio è la copertura. I due
+    # percorsi sommano i pesi di una ricetta nello stesso ordine (quello
+    # di `liste`), quindi danno gli stessi float
+    return int(valore)
+
+
+# ---------------------------------------------------
+# POSTING LIST INGREDIENTE → RICETTE
+# ---------------------------------------------------
+
+class PostingIngredienti:
+    """
+    Per ogni id ingrediente, le ricette che lo contengono (una voce per
+    occorrenza, come il conteggio di copertura_ids). Una richiesta tocca
+    solo le liste degli ingredienti in dispensa, non tutto il catalogo.
+
+    Con NumPy i conteggi sono un solo np.unique sulle liste concatenate
+    (lavoro proporzionale alle liste, non al catalogo), altrimenti un
+    Counter.
+    """
+
+    def __init__(self, ids_ricette, n_ingredienti):
+        self.n_ricette = len(ids_ricette)
+        self.totali = [len(ids) for ids in ids_ricette]
+        self.posting = [[] for _ in range(n_ingredienti)]
+        for r, ids in enumerate(ids_ricette):
+            for i in ids:
+                self.posting[i].append(r)
+
+        self._np_posting = None
+        if np is not None:
+            self._np_posting = [np.asarray(lista, dtype=np.int64) for lista in self.posting]
+            self._np_totali = np.asarray(self.totali, dtype=np.float64)
+
+    def migliori(self, coperti, k, escludi=None):
+        """
+        [(ricetta, copertura)] delle k ricette con copertura > 0 più alta,
+        a pari merito nell'ordine del catalogo (come un sort stabile
+        decrescente). `escludi(ricetta)` viene chiamata solo sulle prime
+        posizioni, non su tutti i candidati.
+        """
+        liste = [i for i in coperti if self.posting[i]]
+        if not liste or k <= 0:
+            return []
+        if numpy_attivo() and self._np_posting is not None:
+            return self._migliori_numpy(liste, k, escludi)
+        return self._migliori_python(liste, k, escludi)
+
+    def _migliori_python(self, liste, k, escludi):
+        match = Counter(itertools.chain.from_iterable(self.posting[i] for i in liste))
+        totali = self.totali
+        candidati = []
+        for r, m in match.items():
+            # stessa aritmetica di copertura_ids
+            c = int((m / totali[r]) * 100)
+            if c > 0:
+                candidati.append((c, -r))
+
+        top = heapq.nlargest(k, candidati)
+        if escludi is not None and any(escludi(-r) for _, r in top):
+            candidati.sort(reverse=True)
+            top = itertools.islice((v for v in candidati if not escludi(-v[1])), k)
+        return [(-r, c) for c, r in top]
+
+    def _migliori_numpy(self, liste, k, escludi):
+        n = self.n_ricette
+        candidati, match = np.unique(
+            np.concatenate([self._np_posting[i] for i in liste]), return_counts=True
+        )
+        cop = ((match / self._np_totali[candidati]) * 100).astype(np.int64)
+        positivi = cop > 0
+        candidati = candidati[positivi]
+        cop = cop[positivi]
+
+        # copertura decrescente, poi indice crescente in un'unica chiave
+        chiave = cop * (n + 1) + (n - candidati)
+        if len(chiave) > k:
+            ordine = np.argpartition(-chiave, k - 1)[:k]
+            ordine = ordine[np.argsort(-chiave[ordine])]
+        else:
+            ordine = np.argsort(-chiave)
+
+        scelte = [(int(candidati[j]), int(cop[j])) for j in ordine]
+        if escludi is not None and any(escludi(r) for r, _ in scelte):
+            scelte = itertools.islice(
+                ((int(candidati[j]), int(cop[j])) for j in np.argsort(-chiave)
+                 if not escludi(int(candidati[j]))), k
+            )
+        return list(scelte)
+
+    # ---------------------------------------------------
+    # COPERTURA PESATA (SCADENZE)
+    # ---------------------------------------------------
+
+    def migliori_pesati(self, pesi, k, escludi=None):
+        """
+        [(ricetta, copertura, punteggio)] delle k ricette con punteggio più
+        alto: la copertura con ogni ingrediente contato `pesi[id]` volte
+        invece di una, troncata all'intero come la copertura (con tutti i
+        pesi a 1 la classifica è quella di migliori()). A pari punteggio
+        nell'ordine del catalogo.
+        """
+        liste = [i for i in pesi if self.posting[i]]
+        if not liste or k <= 0:
+            return []
+        if numpy_attivo() and self._np_posting is not None:
+            candidati = self._pesati_numpy(liste, pesi)
+        else:
+            candidati = self._pesati_python(liste, pesi)
+
+        candidati.sort(key=lambda v: (-v[2], v[0]))
+        if escludi is not None:
+            candidati = (v for v in candidati if not escludi(v[0]))
+        return list(itertools.islice(candidati, k))
+
+    def _pesati_python(self, liste, pesi):
+        match = Counter()
+        somma = Counter()
+        for i in liste:
+            w = pesi[i]
+            for r in self.posting[i]:
+                match[r] += 1
+                somma[r] += w
+        totali = self.totali
+        candidati = []
+        for r, m in match.items():
+            c = int((m / totali[r]) * 100)
+            if c > 0:
+                candidati.append((r, c, _punteggio(somma[r] / totali[r] * 100)))
+        return candidati
+
+    def _pesati_numpy(self, liste, pesi):
+        ids = np.concatenate([self._np_posting[i] for i in liste])
+        w = np.concatenate([np.full(len(self._np_posting[i]), pesi[i]) for i in liste])
+        candidati, inverso, match = np.unique(ids, return_inverse=True, return_counts=True)
+        # bincount sugli indici compatti: lungo quanto i candidati, non il catalogo
+        somma = np.bincount(inverso, weights=w, minlength=len(candidati))
+        cop = ((match / self._np_totali[candidati]) * 100).astype(np.int64)
+        punteggio = somma / self._np_totali[candidati] * 100
+        positivi = cop > 0
+        return [
+            (int(r), int(c), _punteggio(float(p)))
+            for r, c, p in zip(candidati[positivi], cop[positivi], punteggio[positivi])
+        ]
@@ -0,0 +1,132 @@
+# ================================================================
+#  GoFoody AI - notifiche_dispensa.py (avvisi scadenze per tutti gli utenti)
+# ================================================================
+#
+#  python notifiche_dispensa.py utenti.jsonl > avvisi.jsonl
+#  cat utenti.jsonl | python notifiche_dispensa.py --processi 4
+#  python notifiche_dispensa.py --prova 20000 > /dev/null
+#
+#  Per il job notturno delle notifiche: una riga {"user_id", "dispensa"}
+#  per utente in ingresso, una riga {"user_id", "alert"} per utente in
+#  uscita, nello stesso ordine, scritte man mano. Al posto di una chiamata
+#  /ai/dispensa per utente: "oggi" calcolato una volta per tutto il job,
+#  date lette una volta per processo (dispensa_ai.data_scadenza) e blocchi
+#  di righe distribuiti su un pool di processi. Il throughput (utenti/s)
+#  va su stderr.
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dispensa_ai import alert_utenti
+
+BLOCCO = 500
+
+
+def elabora_blocco(righe, oggi, inizio):
+    """Righe JSON → righe JSON dei risultati (gira nei processi del pool)."""
+    return [
+        json.dumps(r, ensure_ascii=False)
+        for r in alert_utenti(righe, datetime.date.fromisoformat(oggi), inizio)
+    ]
+
+
+def blocchi(righe, dimensione):
+    """(prima riga, [righe]) a blocchi di `dimensione`."""
+    righe = iter(righe)
+    inizio = 1
+    while True:
+        blocco = list(itertools.islice(righe, dimensione))
+        if not blocco:
+            return
+        yield inizio, blocco
+        inizio += len(blocco)
+
+
+def elabora(righe, uscita, oggi, processi, dimensione=BLOCCO):
+    """Scrive i risultati su `uscita` nell'ordine delle righe; ritorna quanti."""
+    n = 0
+    if processi <= 1:
+        for inizio, blocco in blocchi(righe, dimensione):
+            for riga in elabora_blocco(blocco, oggi, inizio):
+                uscita.write(riga + "\n")
+                n += 1
+        return n
+
+    # al massimo qualche blocco per processo in volo: l'ingresso non viene
+    # letto tutto in memoria prima di cominciare a scrivere
+    with ProcessPoolExecutor(max_workers=processi) as pool:
+        in_volo = deque()
+        for inizio, blocco in blocchi(righe, dimensione):
+            in_volo.append(pool.submit(elabora_blocco, blocco, oggi, inizio))
+            if len(in_volo) >= processi * 2:
+                for riga in in_volo.popleft().result():
+                    uscita.write(riga + "\n")
+                    n += 1
+        while in_volo:
+            for riga in in_volo.popleft().result():
+                uscita.write(riga + "\n")
+                n += 1
+    return n
+
+
+def righe_prova(utenti, oggi, seed=0):
+    """Utenti finti con 5-30 alimenti e scadenze tra -3 e +20 giorni."""
+    rng = random.Random(seed)
+    alimenti = ["latte", "yogurt", "pomodori", "zucchine", "pollo", "uova", "pane",
+                "mozzarella", "insalata", "pasta", "riso", "mele", "banane", "tonno"]
+    for u in range(utenti):
+        dispensa = []
+        for _ in range(rng.randint(5, 30)):
+            giorni = rng.randint(-3, 20)
+            scadenza = "" if rng.random() < 0.2 else (oggi + datetime.timedelta(days=giorni)).isoformat()
+            dispensa.append({"nome": rng.choice(alimenti), "scadenza": scadenza})
+        yield json.dumps({"user_id": u, "dispensa": dispensa})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avvisi scadenze per più utenti (JSON lines)")
+    parser.add_argument("ingresso", nargs="?", help="file JSONL {user_id, dispensa} (default stdin)")
+    parser.add_argument("--output", help="file JSONL dei risultati (default stdout)")
+    parser.add_argument("--processi", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--blocco", type=int, default=BLOCCO, help="utenti per blocco inviato a un processo")
+    parser.add_argument("--oggi", help="data YYYY-MM-DD (default: oggi)")
+    parser.add_argument("--prova", type=int, default=0, help="N utenti generati al posto dell'ingresso")
+    args = parser.parse_args()
+
+    oggi = datetime.date.fromisoformat(args.oggi) if args.oggi else datetime.date.today()
+
+    if args.prova:
+        righe = righe_prova(args.prova, oggi)
+    elif args.ingresso:
+        righe = open(args.ingresso, encoding="utf-8")
+    else:
+        righe = sys.stdin
+    uscita = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    t0 = time.perf_counter()
+    try:
+        n = elabora(righe, uscita, oggi.isoformat(), args.processi, max(1, args.blocco))
+    finally:
+        if uscita is not sys.stdout:
+            uscita.close()
+        if righe is not sys.stdin and hasattr(righe, "close"):
+            righe.close()
+    dt = time.perf_counter() - t0
+
+    print(f"📊 {n} utenti in {dt:.2f}s ({n / dt if dt else 0:.0f} utenti/s, "
+          f"{args.processi} processi)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
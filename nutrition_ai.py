@@ -1,8 +1,9 @@
 import os
-import json
 from flask import request, jsonify
 from datetime import datetime
 
+import archivio_nutrienti
+
 # ===========================
 # CONFIG SICUREZZA
 # ===========================
@@ -19,20 +20,13 @@ def verifica_chiave():
 
 
 # ===============================================
-# CARICAMENTO DATABASE NUTRIZIONALE (300 alimenti)
+# DATABASE NUTRIZIONALE (condiviso con app.py)
 # ===============================================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-NUTRIENTS_PATH = os.path.join(BASE_DIR, "data", "nutrients.json")
 
-try:
-    with open(NUTRIENTS_PATH, "r", encoding="utf-8") as f:
-        NUTRIENT_DB = json.load(f)
-    if not isinstance(NUTRIENT_DB, list):
-        NUTRIENT_DB = []
-    print("✅ nutrients.json caricato (300 alimenti)")
-except Exception as e:
-    print("❌ Errore caricamento nutrients.json:", e)
-    NUTRIENT_DB = []
+# stesso archivio di app.py: nutrients.json (o lo snapshot) letto una
+# volta per processo, ricerca per chiave/alias/label in O(1)
+ARCHIVIO = archivio_nutrienti.carica(BASE_DIR)
 
 
 # ===============================================
@@ -40,19 +34,8 @@ except Exception as e:
 # ===============================================
 def normalizza_nome(nome):
     nome = nome.lower().strip()
-    # sinonimi base come API
-    mapping = {
-        "pomodori": "pomodoro",
-        "pomodorini": "pomodoro",
-        "datterini": "pomodoro",
-        "ciliegino": "pomodoro",
-        "ciliegini": "pomodoro",
-        "banane": "banana",
-        "mele": "mela",
-        "arance": "arancia",
-        "zucchine": "zucchina"
-    }
-    return mapping.get(nome, nome)
+    # sinonimi base come API (stessa tabella alias di app.py)
+    return archivio_nutrienti.ALIAS.get(nome, nome)
 
 
 # ===============================================
@@ -63,31 +46,29 @@ def trova_nutrienti(alimento_norm):
     Cerca il valore nutrizionale in nutrients.json
     (kcal, carb, proteine, grassi per 100g)
     """
-    alimento_norm = alimento_norm.lower().strip()
-
-    for row in NUTRIENT_DB:
-        nome = row.get("nome", "").lower()
-        if alimento_norm == nome:
-            return row
+    chiave = ARCHIVIO.trova_parziale(alimento_norm)
+    if chiave is None:
+        return None
+    return ARCHIVIO.get(chiave)
 
-    # fuzzy fallback: contiene
-    for row in NUTRIENT_DB:
-        nome = row.get("nome", "").lower()
-        if alimento_norm in nome or nome in alimento_norm:
-            return row
 
-    return None
+def macro_alimento(alimento):
+    """kcal e macro per 100 g (CAMPI dell'archivio), None se l'alimento manca."""
+    chiave = ARCHIVIO.trova_parziale(alimento)
+    if chiave is None:
+        return None
+    return ARCHIVIO.macro(chiave)
 
 
 # ===============================================
 # FUNZIONE: CALCOLA KCAL DATI ALIMENTO + GRAMMI
 # ===============================================
 def calcola_kcal_da_nutrienti(alimento, quantita_g):
-    nutr = trova_nutrienti(alimento)
-    if not nutr:
+    macro = macro_alimento(alimento)
+    if not macro:
         return None  # l’AI principale gestirà fallback
 
-    kcal100 = float(nutr.get("kcal_100g", 0))
+    kcal100 = macro["kcal_per_100g"]
     return round((kcal100 * quantita_g) / 100.0, 1)
 
 
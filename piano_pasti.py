@@ -0,0 +1,129 @@
+# ================================================================
+#  GoFoody AI - piano_pasti.py (piano settimanale in una chiamata)
+# ================================================================
+#
+#  Il catalogo viene valutato una volta sola contro la dispensa; poi,
+#  giorno per giorno, una beam search riempie gli slot di PASTI_GIORNO:
+#    - categoria adatta allo slot (assegna_categoria)
+#    - nessuna ricetta ripetuta entro `no_ripeti_giorni` giorni
+#    - kcal del giorno vicine all'obiettivo, se c'è (solo per le ricette
+#      con kcal note: le altre non pesano né a favore né contro)
+#  A parità di copertura decide un rumore fisso dato dal seed: stesso
+#  seed, stesso piano.
+
+import heapq
+import random
+
+# categorie preferite per slot, nell'ordine; se nessuna è disponibile
+# lo slot prende qualsiasi ricetta
+CATEGORIE_PASTO = {
+    "Colazione": ("Ricetta",),
+    "Spuntino": ("Ricetta", "Contorno"),
+    "Pranzo": ("Primo", "Secondo"),
+    "Cena": ("Secondo", "Contorno", "Primo"),
+}
+
+# quota delle kcal giornaliere per slot (5 pasti: somma 1.0)
+QUOTE_KCAL = {
+    "Colazione": 0.20,
+    "Spuntino": 0.10,
+    "Pranzo": 0.35,
+    "Cena": 0.25,
+}
+
+LARGHEZZA_BEAM = 8
+CANDIDATI_PER_CATEGORIA = 12
+
+# punti di copertura (0-100) persi per uno scarto del 100% dalle kcal
+PESO_KCAL = 100.0
+
+
+class PianoPasti:
+    """
+    Piano su `ricette` (dict con "categoria", "kcal_stimate" e
+    "kcal_note") dati i punteggi di copertura per indice. `escludi(indice)` toglie le ricette
+    con cibi non graditi.
+    """
+
+    def __init__(self, ricette, coperture, seed=0, escludi=None):
+        self.ricette = ricette
+        rng = random.Random(seed)
+        # copertura intera + rumore in [0, 1): cambia solo i pareggi
+        self.valore = [coperture.get(i, 0) + rng.random() for i in range(len(ricette))]
+
+        ordine = sorted(
+            (i for i in range(len(ricette)) if escludi is None or not escludi(i)),
+            key=lambda i: -self.valore[i],
+        )
+        self.tutte = ordine
+        self.per_categoria = {}
+        for i in ordine:
+            self.per_categoria.setdefault(ricette[i]["categoria"], []).append(i)
+
+    def _candidati(self, pasto, bloccate, scelte):
+        """Migliori ricette libere per lo slot: prima le categorie preferite, poi tutte."""
+        liste = [self.per_categoria.get(c, ()) for c in CATEGORIE_PASTO.get(pasto, ())]
+        for permessi in (lambda i: i not in bloccate and i not in scelte,
+                         lambda i: i not in scelte):
+            for gruppo in (liste, [self.tutte]):
+                candidati = []
+                for lista in gruppo:
+                    n = 0
+                    for i in lista:
+                        if permessi(i):
+                            candidati.append(i)
+                            n += 1
+                            if n >= CANDIDATI_PER_CATEGORIA:
+                                break
+                if candidati:
+                    return candidati
+        # catalogo più piccolo degli slot di un giorno: si ripete
+        return self.tutte[:CANDIDATI_PER_CATEGORIA]
+
+    def _scarto_kcal(self, kcal, obiettivo):
+        if not obiettivo:
+            return 0.0
+        return PESO_KCAL * abs(kcal - obiettivo) / obiettivo
+
+    def giorno(self, pasti, bloccate, kcal_giorno=None):
+        """Indici delle ricette per ogni slot del giorno (beam search)."""
+        # (valore, scelte, kcal note, quota degli slot con kcal note)
+        beam = [(0.0, (), 0.0, 0.0)]
+        for pasto in pasti:
+            quota_pasto = QUOTE_KCAL.get(pasto, 0.0)
+            obiettivo = kcal_giorno * quota_pasto if kcal_giorno else None
+            espansi = []
+            for valore, scelte, kcal, quota in beam:
+                for i in self._candidati(pasto, bloccate, scelte):
+                    r = self.ricette[i]
+                    if r["kcal_note"]:
+                        k = r["kcal_stimate"]
+                        espansi.append((
+                            valore + self.valore[i] - self._scarto_kcal(k, obiettivo),
+                            scelte + (i,),
+                            kcal + k,
+                            quota + quota_pasto,
+                        ))
+                    else:
+                        espansi.append((valore + self.valore[i], scelte + (i,), kcal, quota))
+            beam = heapq.nlargest(LARGHEZZA_BEAM, espansi, key=lambda s: s[0])
+
+        if kcal_giorno:
+            # a fine giornata conta il totale, non solo le quote per slot:
+            # quello dei pasti con kcal note contro la loro parte di obiettivo
+            beam.sort(key=lambda s: -(s[0] - self._scarto_kcal(s[2], kcal_giorno * s[3])))
+        return list(beam[0][1])
+
+    def settimana(self, pasti, giorni=7, no_ripeti_giorni=3, kcal_giorno=None):
+        """[[indice ricetta per slot] per giorno]."""
+        if not self.tutte:
+            return [[] for _ in range(giorni)]
+        piano = []
+        ultimo_giorno = {}
+        for g in range(giorni):
+            bloccate = {i for i, d in ultimo_giorno.items() if g - d < no_ripeti_giorni}
+            scelte = self.giorno(pasti, bloccate, kcal_giorno)
+            for i in scelte:
+                ultimo_giorno[i] = g
+            piano.append(scelte)
+        return piano
@@ -0,0 +1,179 @@
+# ================================================================
+#  GoFoody AI - quantita.py (testo della quantità → grammi)
+# ================================================================
+#
+#  Grammatica (compilata una volta sola):
+#
+#    [testo] VALORE [(- | – | a | o) VALORE] [unità] [testo]
+#
+#    VALORE = 200 | 1.5 | 1,5 | 1/2 | 1 1/2 | un | mezzo | due ...
+#
+#  Un intervallo ("2-3 uova") vale il punto medio. L'unità è la prima
+#  parola intera riconosciuta (non una sottostringa: "olio" non è un
+#  litro). Senza unità un valore fino a 5 conta come pezzi, oltre come
+#  grammi, come sempre.
+
+import re
+
+MAX_VOCI_CACHE = 4096
+
+# pezzi senza peso noto nei nutrienti
+PESO_PEZZO_DEFAULT = 100.0
+# "3" = 3 pezzi, "150" = 150 g
+MAX_PEZZI_SENZA_UNITA = 5
+
+PEZZI = "pezzi"
+
+# parola → grammi per unità (liquidi a densità 1), PEZZI = peso dell'alimento
+UNITA = {}
+for _grammi, _nomi in (
+    (0.001, "mg milligrammo milligrammi"),
+    (1.0, "g gr grammo grammi"),
+    (100.0, "hg etto etti"),
+    (1000.0, "kg chilo chili kilo chilogrammo chilogrammi"),
+    (1.0, "ml millilitro millilitri"),
+    (10.0, "cl centilitro centilitri"),
+    (100.0, "dl decilitro decilitri"),
+    (1000.0, "l lt litro litri"),
+    # misure da cucina
+    (1.0, "pizzico pizzichi"),
+    (5.0, "cucchiaino cucchiaini spicchio spicchi"),
+    (15.0, "cucchiaio cucchiai"),
+    (50.0, "tazzina tazzine"),
+    (200.0, "bicchiere bicchieri"),
+    (250.0, "tazza tazze"),
+    (PEZZI, "pz pezzo pezzi unità fetta fette porzione porzioni"),
+):
+    for _nome in _nomi.split():
+        UNITA[_nome] = _grammi
+del _grammi, _nomi, _nome
+
+NUMERI_PAROLA = {
+    "mezzo": 0.5, "mezza": 0.5,
+    "un": 1.0, "uno": 1.0, "una": 1.0,
+    "due": 2.0, "tre": 3.0, "quattro": 4.0, "cinque": 5.0,
+    "sei": 6.0, "sette": 7.0, "otto": 8.0, "nove": 9.0, "dieci": 10.0,
+}
+
+_VALORE = r"\d+\s+\d+\s*/\s*\d+|\d+\s*/\s*\d+|\d+(?:[.,]\d+)?"
+_PAROLA = "|".join(sorted(NUMERI_PAROLA, key=len, reverse=True))
+_INTERVALLO = r"\s*[-–]\s*|\s+(?:a|o)\s+"
+
+GRAMMATICA = re.compile(
+    rf"(?P<da>{_VALORE})(?:(?:{_INTERVALLO})(?P<a>{_VALORE}))?"
+)
+GRAMMATICA_PAROLE = re.compile(
+    rf"\b(?P<da>{_PAROLA})\b(?:(?:{_INTERVALLO})(?P<a>{_PAROLA})\b)?"
+)
+PAROLE = re.compile(r"[a-zàèéìòù]+")
+CIFRA = re.compile(r"\d")
+
+FRAZIONI_UNICODE = {"½": " 1/2", "¼": " 1/4", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3"}
+
+
+def _numero(testo):
+    testo = testo.strip()
+    if testo in NUMERI_PAROLA:
+        return NUMERI_PAROLA[testo]
+    if "/" not in testo:
+        return float(testo.replace(",", "."))
+    sopra, sotto = testo.split("/")
+    parti = sopra.split()
+    intero = float(parti[0]) if len(parti) == 2 else 0.0
+    den = float(sotto)
+    # "1/0": vale il numeratore
+    return intero + (float(parti[-1]) / den if den else float(parti[-1]))
+
+
+def _peso(voce):
+    try:
+        return float((voce or {}).get("default_weight_g", 0) or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+def pesi_pezzo(nutrienti):
+    """Chiave alimento → default_weight_g, solo per i pesi > 0."""
+    pesi = {}
+    for k, voce in nutrienti.items():
+        peso = _peso(voce)
+        if peso > 0:
+            pesi[k] = peso
+    return pesi
+
+
+def analizza(testo):
+    """
+    (valore, grammi per unità) del testo, grammi per unità = PEZZI per i
+    pezzi e None senza unità. (0.0, None) se non c'è nessun numero.
+    """
+    for simbolo, frazione in FRAZIONI_UNICODE.items():
+        if simbolo in testo:
+            testo = testo.replace(simbolo, frazione)
+
+    m = GRAMMATICA.search(testo) or GRAMMATICA_PAROLE.search(testo)
+    if not m:
+        return 0.0, None
+    valore = _numero(m.group("da"))
+    if m.group("a"):
+        valore = (valore + _numero(m.group("a"))) / 2
+
+    # prima le parole dopo il numero ("200 g", fino al numero successivo),
+    # poi quelle prima ("g 200")
+    dopo = CIFRA.split(testo[m.end():], 1)[0]
+    for parte in (dopo, testo[:m.start()]):
+        for parola in PAROLE.findall(parte):
+            if parola in UNITA:
+                return valore, UNITA[parola]
+    return valore, None
+
+
+class ParserQuantita:
+    """
+    Quantità → grammi. L'analisi del testo ("200 g", "2 cucchiai") e il
+    peso di un pezzo per alimento si ripetono tra le richieste e tra gli
+    alimenti di un batch: restano in due cache separate.
+
+    `chiave_alimento` porta il nome alla chiave di `pesi` (normalizzazione,
+    slug e alias dell'app).
+    """
+
+    def __init__(self, pesi, chiave_alimento):
+        self.pesi = pesi
+        self.chiave_alimento = chiave_alimento
+        self._analisi = {}
+        self._pezzi = {}
+
+    def analizza(self, quantita):
+        if isinstance(quantita, (int, float)):
+            testo = str(quantita)
+        else:
+            testo = str(quantita or "").lower().strip()
+        risultato = self._analisi.get(testo)
+        if risultato is None:
+            risultato = analizza(testo)
+            if len(self._analisi) >= MAX_VOCI_CACHE:
+                self._analisi.clear()
+            self._analisi[testo] = risultato
+        return risultato
+
+    def peso_pezzo(self, alimento):
+        peso = self._pezzi.get(alimento)
+        if peso is None:
+            peso = self.pesi.get(self.chiave_alimento(alimento), PESO_PEZZO_DEFAULT)
+            if len(self._pezzi) >= MAX_VOCI_CACHE:
+                self._pezzi.clear()
+            self._pezzi[alimento] = peso
+        return peso
+
+    def grammi(self, alimento, quantita):
+        valore, unita = self.analizza(quantita)
+        if unita == PEZZI or (unita is None and valore <= MAX_PEZZI_SENZA_UNITA):
+            return self.peso_pezzo(alimento) * valore
+        if unita is None:
+            return valore
+        return valore * unita
+
+    def grammi_molti(self, voci):
+        """[(alimento, quantita)] → [grammi], nello stesso ordine."""
+        return [self.grammi(alimento, quantita) for alimento, quantita in voci]
@@ -0,0 +1,210 @@
+# ================================================================
+#  GoFoody AI - ricette_utente.py (journal append-only ricette utente)
+# ================================================================
+
+import json
+import os
+import queue
+import threading
+import atexit
+
+try:
+    import fcntl
+except ImportError:  # Windows: nessun lock tra processi
+    fcntl = None
+
+# compattazione dopo N righe scritte da questo processo o ogni N secondi
+COMPATTA_OGNI_RIGHE = int(os.getenv("USER_RECIPES_COMPATTA_RIGHE", "500"))
+COMPATTA_OGNI_SEC = float(os.getenv("USER_RECIPES_COMPATTA_SEC", "300"))
+
+
+# ---------------------------------------------------
+# LOCK TRA WORKER
+# ---------------------------------------------------
+
+class LockFile:
+    """Lock esclusivo su file (flock), condiviso da tutti i worker gunicorn."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.path, "a")
+        if fcntl:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        self._f.close()
+        self._f = None
+
+
+# ---------------------------------------------------
+# LETTURA SNAPSHOT + JOURNAL
+# ---------------------------------------------------
+
+def _leggi_snapshot(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        dati = json.load(f)
+    return dati if isinstance(dati, dict) else {}
+
+
+def _rigioca_journal(path, ricette):
+    """Applica le righe del journal in ordine: l'ultima scrittura vince."""
+    if not os.path.exists(path):
+        return ricette
+    with open(path, "r", encoding="utf-8") as f:
+        for riga in f:
+            try:
+                voce = json.loads(riga)
+            except ValueError:
+                # riga troncata da un crash durante l'append
+                continue
+            if isinstance(voce, dict) and voce.get("key"):
+                ricette[voce["key"]] = voce.get("ricetta")
+    return ricette
+
+
+def _finisce_a_capo(path):
+    """True se il file manca, è vuoto o termina con un a capo."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+def carica_ricette_utente(snapshot_path, journal_path):
+    """Ricette utente = ultimo snapshot compattato + journal."""
+    try:
+        # sotto lock: una compattazione concorrente non deve svuotare il
+        # journal tra la lettura dello snapshot e quella del journal
+        with LockFile(journal_path + ".lock"):
+            ricette = _leggi_snapshot(snapshot_path)
+            return _rigioca_journal(journal_path, ricette)
+    except Exception as e:
+        print("❌ Errore caricamento ricette utente:", e)
+        return {}
+
+
+# ---------------------------------------------------
+# JOURNAL CON SCRITTURA IN BACKGROUND
+# ---------------------------------------------------
+
+class JournalRicette:
+    """
+    `registra()` mette la ricetta in coda e ritorna subito: un thread di
+    background la accoda al file JSON lines sotto flock (O(1) per ricetta)
+    e periodicamente compatta il journal nello snapshot user_recipes.json.
+
+    Il thread parte alla prima scrittura, quindi anche dopo il fork dei
+    worker gunicorn.
+    """
+
+    def __init__(self, snapshot_path, journal_path):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.lock_path = journal_path + ".lock"
+        self._coda = queue.Queue()
+        self._thread = None
+        self._avvio = threading.Lock()
+        self._righe = 0
+
+    def registra(self, key, ricetta):
+        self._avvia()
+        self._coda.put((key, ricetta))
+
+    def registra_molte(self, voci):
+        """Più ricette in un solo append (una sola acquisizione del lock)."""
+        voci = list(voci)
+        if voci:
+            self._avvia()
+            self._coda.put(voci)
+
+    def flush(self):
+        """Attende che tutte le scritture in coda siano su disco."""
+        if self._thread:
+            self._coda.join()
+
+    def _avvia(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._avvio:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="journal-ricette", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _loop(self):
+        while True:
+            try:
+                voce = self._coda.get(timeout=COMPATTA_OGNI_SEC)
+            except queue.Empty:
+                self._compatta_sicuro()
+                continue
+
+            # raccoglie quello che è già in coda: un solo append per lotto
+            lotto = [voce]
+            while True:
+                try:
+                    lotto.append(self._coda.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                righe = []
+                for v in lotto:
+                    righe.extend(v if isinstance(v, list) else [v])
+                self._append(righe)
+                if self._righe >= COMPATTA_OGNI_RIGHE:
+                    self._compatta_sicuro()
+            except Exception as e:
+                print("❌ Errore scrittura journal ricette utente:", e)
+            finally:
+                for _ in lotto:
+                    self._coda.task_done()
+
+    def _append(self, voci):
+        testo = "".join(
+            json.dumps({"key": k, "ricetta": r}, ensure_ascii=False) + "\n"
+            for k, r in voci
+        )
+        with LockFile(self.lock_path):
+            if not _finisce_a_capo(self.journal_path):
+                # ultima riga troncata da un crash: la nuova non ci si attacca
+                testo = "\n" + testo
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(testo)
+                f.flush()
+        self._righe += len(voci)
+
+    def _compatta_sicuro(self):
+        try:
+            self.compatta()
+        except Exception as e:
+            print("❌ Errore compattazione ricette utente:", e)
+
+    def compatta(self):
+        """Fonde journal e snapshot in un nuovo user_recipes.json e svuota il journal."""
+        with LockFile(self.lock_path):
+            if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+                self._righe = 0
+                return
+            ricette = _rigioca_journal(self.journal_path, _leggi_snapshot(self.snapshot_path))
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(ricette, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.snapshot_path)
+            open(self.journal_path, "w").close()
+            self._righe = 0
+        print(f"💾 user_recipes.json compattato ({len(ricette)} ricette)")
@@ -0,0 +1,440 @@
+# ================================================================
+#  GoFoody AI - snapshot_dati.py (snapshot binario della cartella data/)
+# ================================================================
+#
+#  `python compila_dati.py` (build step su Render) scrive data/dati.snap:
+#  tabella nutrienti, ricette base, indici n-grammi e vettori nutrienti
+#  per ricetta già calcolati. I worker lo leggono al posto dei JSON
+#  quando è più recente delle sorgenti, altrimenti si torna ai JSON.
+#
+#  Formato:
+#    MAGIC (8 byte) | versione, lunghezza header (uint32 little endian)
+#    | header JSON (sezioni + schema tabelle) | sezioni allineate a 8 byte
+#
+#  Ogni sezione è un array piatto (typecode di `array`) letto con
+#  memoryview.cast direttamente dal file mappato in memoria; le stringhe
+#  sono un unico blob UTF-8 separato da \0 (una sola decode + split).
+#
+#  Il guadagno è solo sul tempo di avvio (niente parsing JSON né calcolo
+#  di indici e vettori): le sezioni diventano subito liste, dict e tuple
+#  Python come quelli dei JSON, perché il resto dell'app lavora su quelli,
+#  e il file viene chiuso dopo la lettura. Ogni worker ha quindi la sua
+#  copia dei dati, niente resta condiviso tramite la page cache.
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import defaultdict
+
+from indice_ngram import IndiceNgram
+
+MAGIC = b"GOFOODY\x00"
+VERSIONE_FORMATO = 1
+NOME_FILE = "dati.snap"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# i dati derivati (chiavi normalizzate, indici, vettori) dipendono anche
+# dal codice che li calcola: se cambia, lo snapshot non è più valido
+SORGENTI = (
+    os.path.join("data", "nutrients.json"),
+    os.path.join("data", "italian_recipes.json"),
+    "app.py",
+    "archivio_nutrienti.py",
+    "indice_ngram.py",
+)
+
+ATTIVO = os.getenv("GOFOODY_SNAPSHOT", "1").strip().lower() not in ("0", "false", "no", "off")
+
+MANCANTE = 0xFFFFFFFF
+_MANCA = object()
+
+# flag dei valori numerici: distingue 52 da 52.0 come nel JSON originale
+_NUM_MANCA, _NUM_INT, _NUM_FLOAT = 0, 1, 2
+
+_HEADER = struct.Struct("<II")
+
+
+def percorso_snapshot(base_dir=BASE_DIR):
+    return os.path.join(base_dir, "data", NOME_FILE)
+
+
+def firme_sorgenti(base_dir=BASE_DIR):
+    firme = {}
+    for rel in SORGENTI:
+        try:
+            st = os.stat(os.path.join(base_dir, rel))
+        except OSError:
+            continue
+        firme[rel] = [st.st_mtime_ns, st.st_size]
+    return firme
+
+
+# ---------------------------------------------------
+# SCRITTURA
+# ---------------------------------------------------
+
+class ScrittoreSnapshot:
+    def __init__(self):
+        self.sezioni = {}
+        self.tabelle = {}
+        self._stringhe = []
+        self._id_stringhe = {}
+
+    def stringa(self, s):
+        i = self._id_stringhe.get(s)
+        if i is None:
+            if not isinstance(s, str) or "\x00" in s:
+                raise ValueError(f"stringa non rappresentabile: {s!r}")
+            i = self._id_stringhe[s] = len(self._stringhe)
+            self._stringhe.append(s)
+        return i
+
+    def array(self, nome, typecode, valori):
+        self.sezioni[nome] = array(typecode, valori)
+
+    def tabella(self, nome, righe):
+        """
+        Lista di dict come colonne: "s" stringhe, "n" numeri, "t" liste di
+        dict (sotto-tabella + offset). Altri tipi → ValueError.
+        """
+        colonne = []
+        for r in righe:
+            if not isinstance(r, dict):
+                raise ValueError(f"{nome}: riga non dict")
+            for k in r:
+                if k not in colonne:
+                    colonne.append(k)
+
+        schema = []
+        for k in colonne:
+            valori = [r.get(k, _MANCA) for r in righe]
+            presenti = [v for v in valori if v is not _MANCA]
+            sezione = f"{nome}.{k}"
+
+            if all(isinstance(v, str) for v in presenti):
+                self.array(sezione, "I", (MANCANTE if v is _MANCA else self.stringa(v) for v in valori))
+                schema.append([k, "s"])
+
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in presenti):
+                flag = []
+                numeri = []
+                for v in valori:
+                    if v is _MANCA:
+                        flag.append(_NUM_MANCA)
+                        numeri.append(0.0)
+                    elif isinstance(v, int):
+                        if float(v) != v:
+                            raise ValueError(f"{sezione}: intero troppo grande")
+                        flag.append(_NUM_INT)
+                        numeri.append(float(v))
+                    else:
+                        flag.append(_NUM_FLOAT)
+                        numeri.append(v)
+                self.array(sezione, "d", numeri)
+                self.array(sezione + "#", "B", flag)
+                schema.append([k, "n"])
+
+            elif all(isinstance(v, list) for v in presenti):
+                offset = [0]
+                figli = []
+                for v in valori:
+                    if v is not _MANCA:
+                        figli.extend(v)
+                    offset.append(len(figli) if v is not _MANCA else MANCANTE)
+                # l'offset di fine di una riga senza lista è MANCANTE: la
+                # riga successiva parte comunque dall'ultimo valido
+                self.array(sezione + "@", "I", offset)
+                self.tabella(sezione, figli)
+                schema.append([k, "t"])
+
+            else:
+                raise ValueError(f"{sezione}: tipo non supportato")
+
+        self.tabelle[nome] = {"righe": len(righe), "colonne": schema}
+
+    def indice(self, nome, indice):
+        """Chiavi e posting di un IndiceNgram (gli n-grammi sono stringhe)."""
+        self.array(nome + ".chiavi", "I", (self.stringa(k) for k in indice.chiavi))
+        grammi = list(indice.posting)
+        offset = [0]
+        ids = []
+        for g in grammi:
+            ids.extend(indice.posting[g])
+            offset.append(len(ids))
+        self.array(nome + ".grammi", "I", (self.stringa(g) for g in grammi))
+        self.array(nome + ".offset", "I", offset)
+        self.array(nome + ".ids", "I", ids)
+        self.tabelle[nome] = {"n": indice.n}
+
+    def salva(self, path, meta):
+        self.array("stringhe", "B", "\x00".join(self._stringhe).encode("utf-8"))
+
+        posizione = 0
+        sezioni = {}
+        for nome, arr in self.sezioni.items():
+            sezioni[nome] = [arr.typecode, posizione, len(arr)]
+            posizione += _allinea(len(arr) * arr.itemsize)
+
+        header = json.dumps({
+            "meta": meta,
+            "tabelle": self.tabelle,
+            "sezioni": sezioni,
+            "n_stringhe": len(self._stringhe),
+        }, ensure_ascii=False).encode("utf-8")
+        header += b" " * (_allinea(len(MAGIC) + _HEADER.size + len(header)) - len(MAGIC) - _HEADER.size - len(header))
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER.pack(VERSIONE_FORMATO, len(header)))
+            f.write(header)
+            for arr in self.sezioni.values():
+                if sys.byteorder != "little":
+                    arr = array(arr.typecode, arr)
+                    arr.byteswap()
+                dati = arr.tobytes()
+                f.write(dati)
+                f.write(b"\x00" * (_allinea(len(dati)) - len(dati)))
+        os.replace(tmp, path)
+
+
+def _allinea(n):
+    return (n + 7) & ~7
+
+
+# ---------------------------------------------------
+# LETTURA
+# ---------------------------------------------------
+
+class LettoreSnapshot:
+    def __init__(self, mv):
+        if bytes(mv[:len(MAGIC)]) != MAGIC:
+            raise ValueError("non è uno snapshot GoFoody")
+        versione, lunghezza = _HEADER.unpack_from(mv, len(MAGIC))
+        if versione != VERSIONE_FORMATO:
+            raise ValueError(f"versione formato {versione} != {VERSIONE_FORMATO}")
+        inizio = len(MAGIC) + _HEADER.size
+        header = json.loads(bytes(mv[inizio:inizio + lunghezza]).decode("utf-8"))
+        self._mv = mv
+        self._dati = inizio + lunghezza
+        self.meta = header["meta"]
+        self.tabelle = header["tabelle"]
+        self.sezioni = header["sezioni"]
+
+        testo = bytes(self._array_mv("stringhe")).decode("utf-8")
+        self.stringhe = testo.split("\x00") if header["n_stringhe"] else []
+
+    def _array_mv(self, nome):
+        typecode, posizione, n = self.sezioni[nome]
+        da = self._dati + posizione
+        return self._mv[da:da + n * array(typecode).itemsize]
+
+    def array(self, nome):
+        """La sezione copiata in una lista Python (il mmap si chiude dopo la lettura)."""
+        typecode = self.sezioni[nome][0]
+        with self._array_mv(nome) as parte, parte.cast(typecode) as valori:
+            if sys.byteorder != "little":
+                valori = array(typecode, valori.tobytes())
+                valori.byteswap()
+            return valori.tolist()
+
+    def tabella(self, nome):
+        schema = self.tabelle[nome]
+        n = schema["righe"]
+        stringhe = self.stringhe
+        colonne = []
+        for k, tipo in schema["colonne"]:
+            sezione = f"{nome}.{k}"
+            if tipo == "s":
+                valori = [_MANCA if i == MANCANTE else stringhe[i] for i in self.array(sezione)]
+            elif tipo == "n":
+                valori = [
+                    v if f == _NUM_FLOAT else int(v) if f == _NUM_INT else _MANCA
+                    for v, f in zip(self.array(sezione), self.array(sezione + "#"))
+                ]
+            else:
+                figli = self.tabella(sezione)
+                valori = []
+                da = 0
+                for a in self.array(sezione + "@")[1:]:
+                    if a == MANCANTE:
+                        valori.append(_MANCA)
+                        continue
+                    valori.append(figli[da:a])
+                    da = a
+            colonne.append((k, valori))
+
+        righe = []
+        for i in range(n):
+            righe.append({k: valori[i] for k, valori in colonne if valori[i] is not _MANCA})
+        return righe
+
+    def indice(self, nome):
+        stringhe = self.stringhe
+        chiavi = [stringhe[i] for i in self.array(nome + ".chiavi")]
+        grammi = [stringhe[i] for i in self.array(nome + ".grammi")]
+        offset = self.array(nome + ".offset")
+        ids = self.array(nome + ".ids")
+        posting = defaultdict(list)
+        for j, g in enumerate(grammi):
+            posting[g] = ids[offset[j]:offset[j + 1]]
+        return IndiceNgram.da_posting(chiavi, posting, self.tabelle[nome]["n"])
+
+
+def leggi_file(path, leggi):
+    """
+    Apre lo snapshot in memoria (mmap) e chiama leggi(LettoreSnapshot):
+    `leggi` deve copiare quello che gli serve, il mapping si chiude all'uscita.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as mv:
+                return leggi(LettoreSnapshot(mv))
+
+
+# ---------------------------------------------------
+# DATI GOFOODY
+# ---------------------------------------------------
+
+class DatiSnapshot:
+    """
+    Contenuto dello snapshot, già in oggetti Python:
+      - nutrienti:  dict come nutrients.json
+      - ricette:    dict come italian_recipes.json
+      - indici:     nome → IndiceNgram
+      - vettori:    per ogni ricetta (stesso ordine) le righe
+                    (nome, quantita_g base, vettore per 100 g)
+    """
+
+    def __init__(self, nutrienti, ricette, indici, vettori, campi):
+        self.nutrienti = nutrienti
+        self.ricette = ricette
+        self.indici = indici
+        self.vettori = vettori
+        self.campi = campi
+
+
+def compila(path, nutrienti, ricette, indici, vettori, campi, base_dir=BASE_DIR):
+    """
+    `indici`: nome → IndiceNgram; `vettori`: righe per ogni ricetta di
+    `ricette` in ordine; `campi`: nomi dei valori nei vettori.
+    """
+    w = ScrittoreSnapshot()
+
+    w.array("nutrienti.chiavi", "I", (w.stringa(k) for k in nutrienti))
+    w.tabella("nutrienti", list(nutrienti.values()))
+
+    w.array("ricette.chiavi", "I", (w.stringa(k) for k in ricette))
+    w.tabella("ricette", list(ricette.values()))
+
+    for nome, indice in indici.items():
+        w.indice("indice." + nome, indice)
+
+    # vettori distinti una volta sola, le righe li riferiscono per id
+    id_vettori = {}
+    valori = []
+    offset = [0]
+    nomi, quantita, rif = [], [], []
+    for righe in vettori:
+        for nome, base_q, vett in righe:
+            nomi.append(w.stringa(nome))
+            quantita.append(base_q)
+            if vett not in id_vettori:
+                id_vettori[vett] = len(id_vettori)
+                valori.extend(vett)
+            rif.append(id_vettori[vett])
+        offset.append(len(nomi))
+    w.array("vettori.offset", "I", offset)
+    w.array("vettori.nomi", "I", nomi)
+    w.array("vettori.quantita", "d", quantita)
+    w.array("vettori.rif", "I", rif)
+    w.array("vettori.valori", "d", valori)
+
+    w.salva(path, {
+        "sorgenti": firme_sorgenti(base_dir),
+        "indici": list(indici),
+        "campi": list(campi),
+    })
+
+
+def _leggi_dati(r):
+    nutrienti = dict(zip(
+        [r.stringhe[i] for i in r.array("nutrienti.chiavi")], r.tabella("nutrienti")
+    ))
+    ricette = dict(zip(
+        [r.stringhe[i] for i in r.array("ricette.chiavi")], r.tabella("ricette")
+    ))
+    indici = {nome: r.indice("indice." + nome) for nome in r.meta["indici"]}
+
+    campi = tuple(r.meta["campi"])
+    k = len(campi)
+    valori = r.array("vettori.valori")
+    tabella_vettori = [tuple(valori[i:i + k]) for i in range(0, len(valori), k)]
+    nomi = [r.stringhe[i] for i in r.array("vettori.nomi")]
+    quantita = r.array("vettori.quantita")
+    rif = r.array("vettori.rif")
+    offset = r.array("vettori.offset")
+    vettori = [
+        tuple(
+            (nomi[j], quantita[j], tabella_vettori[rif[j]])
+            for j in range(offset[i], offset[i + 1])
+        )
+        for i in range(len(offset) - 1)
+    ]
+    return DatiSnapshot(nutrienti, ricette, indici, vettori, campi)
+
+
+def snapshot_valido(path, base_dir=BASE_DIR):
+    """
+    True se lo snapshot esiste ed è più recente di tutte le sorgenti
+    (e le loro dimensioni coincidono con quelle compilate).
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, "rb") as f:
+            testa = f.read(len(MAGIC) + _HEADER.size)
+            if testa[:len(MAGIC)] != MAGIC:
+                return False
+            versione, lunghezza = _HEADER.unpack_from(testa, len(MAGIC))
+            if versione != VERSIONE_FORMATO:
+                return False
+            compilate = json.loads(f.read(lunghezza).decode("utf-8"))["meta"]["sorgenti"]
+    except (OSError, ValueError, KeyError, struct.error):
+        return False
+
+    attuali = firme_sorgenti(base_dir)
+    if set(attuali) != set(compilate):
+        return False
+    for rel, (mtime_src, size) in attuali.items():
+        if mtime_src > mtime or compilate[rel][1] != size:
+            return False
+    return True
+
+
+_caricati = {}
+
+
+def apri(base_dir=BASE_DIR):
+    """
+    DatiSnapshot se lo snapshot è attivo e valido, altrimenti None
+    (si usano i JSON). Letto una volta per processo e condiviso tra i
+    moduli che lo chiedono.
+    """
+    if not ATTIVO:
+        return None
+    path = percorso_snapshot(base_dir)
+    if path in _caricati:
+        return _caricati[path]
+    dati = None
+    if snapshot_valido(path, base_dir):
+        try:
+            dati = leggi_file(path, _leggi_dati)
+        except Exception as e:
+            print("⚠️ Snapshot dati illeggibile, uso i JSON:", e)
+            dati = None
+    _caricati[path] = dati
+    return dati
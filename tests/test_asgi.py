@@ -0,0 +1,144 @@
+# asgi.py davanti all'app Flask: in-process con il trasporto ASGI di
+# httpx e attraverso un vero server uvicorn (streaming e header).
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("a2wsgi")
+
+import app as A
+import asgi
+import chat
+from app import API_KEY
+from chat_db import prepara_intento
+from indice_intenti import ListaIntenti
+from ricette_utente import JournalRicette
+
+AUTH = {"Authorization": "Bearer " + API_KEY}
+
+
+@pytest.fixture(autouse=True, scope="module")
+def journal_temporaneo(tmp_path_factory):
+    # /ai/meal salva le ricette nuove: niente scritture in data/
+    cartella = tmp_path_factory.mktemp("ricette_utente")
+    originale = A.JOURNAL_RICETTE
+    A.JOURNAL_RICETTE = JournalRicette(str(cartella / "user_recipes.json"),
+                                       str(cartella / "user_recipes.jsonl"))
+    yield
+    A.JOURNAL_RICETTE.flush()
+    A.JOURNAL_RICETTE = originale
+
+
+def richiesta(metodo, path, **kwargs):
+    async def esegui():
+        trasporto = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=trasporto, base_url="http://test") as client:
+            return await client.request(metodo, path, **kwargs)
+    return asyncio.run(esegui())
+
+
+# ---------------------------------------------------
+# IN-PROCESS (httpx.ASGITransport)
+# ---------------------------------------------------
+
+def test_health():
+    r = richiesta("GET", "/health")
+    assert r.status_code == 200
+    assert "/ai/dispensa/batch" in r.json()["routes"]
+
+
+def test_autorizzazione_e_cors():
+    corpo = {"dispensa": ["pasta", "pomodoro"]}
+    r = richiesta("POST", "/ai/ricette", json=corpo, headers={"Origin": "https://app.gofoody.it"})
+    assert r.status_code == 401
+    assert r.headers["access-control-allow-origin"] == "https://app.gofoody.it"
+
+    r = richiesta("POST", "/ai/ricette", json=corpo, headers=AUTH)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert r.json()["ricette"]
+
+
+def test_etag_e_if_none_match():
+    corpo = {"dispensa": ["pasta", "pomodoro"], "max_ricette": 2}
+    prima = richiesta("POST", "/ai/ricette", json=corpo, headers=AUTH)
+    etag = prima.headers["etag"]
+    r = richiesta("POST", "/ai/ricette", json=corpo, headers={**AUTH, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+
+def test_chat_usa_gli_intenti_caricati_sull_event_loop(monkeypatch):
+    intenti = ListaIntenti([prepara_intento({
+        "id": 1, "descrizione": "", "esempi_domande": "ciao gofoody",
+        "esempi_risposte": "Risposta dagli intenti",
+    })])
+
+    async def intenti_async():
+        return intenti
+
+    def mai_sincrono():
+        raise AssertionError("in modalità ASGI gli intenti arrivano dall'event loop")
+
+    monkeypatch.setattr(chat, "intenti_chat_async", intenti_async)
+    monkeypatch.setattr(chat, "intenti_chat", mai_sincrono)
+    r = richiesta("POST", "/ai/chat", json={"prompt": "ciao gofoody"})
+    assert r.json() == {"risposta": "Risposta dagli intenti"}
+
+
+# ---------------------------------------------------
+# UVICORN
+# ---------------------------------------------------
+
+@pytest.fixture(scope="module")
+def server():
+    uvicorn = pytest.importorskip("uvicorn")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    config = uvicorn.Config(asgi.app, host="127.0.0.1", port=porta, log_level="warning", lifespan="off")
+    srv = uvicorn.Server(config)
+    thread = threading.Thread(target=srv.run, daemon=True)
+    thread.start()
+    limite = time.monotonic() + 10
+    while not srv.started:
+        assert time.monotonic() < limite, "uvicorn non parte"
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{porta}"
+    srv.should_exit = True
+    thread.join(5)
+
+
+def test_uvicorn_streaming(server):
+    righe = "\n".join(
+        json.dumps({"user_id": i, "dispensa": [{"nome": "pane", "scadenza": "2000-01-01"}]})
+        for i in range(50)
+    )
+    with httpx.Client(base_url=server) as client:
+        with client.stream("POST", "/ai/dispensa/batch", content=righe, headers=AUTH) as r:
+            assert r.status_code == 200
+            assert r.headers["content-type"] == "application/x-ndjson"
+            # generatore Flask → risposta chunked, non un corpo unico
+            assert r.headers.get("transfer-encoding") == "chunked"
+            assert "content-length" not in r.headers
+            risultati = [json.loads(x) for x in r.iter_lines() if x]
+    assert [x["user_id"] for x in risultati] == list(range(50))
+    assert "scaduto" in risultati[0]["alert"][0]
+
+
+def test_uvicorn_header(server):
+    with httpx.Client(base_url=server) as client:
+        r = client.post("/ai/meal", json={"alimento": "mela", "quantita": "150 g"},
+                        headers={**AUTH, "Origin": "https://app.gofoody.it"})
+        assert r.status_code == 200
+        assert r.headers["access-control-allow-origin"] == "https://app.gofoody.it"
+        assert int(r.headers["content-length"]) == len(r.content)
+
+        r = client.post("/ai/meal", json={"alimento": "mela"}, headers={"Authorization": "Bearer sbagliata"})
+        assert r.status_code in (401, 403)
@@ -0,0 +1,83 @@
+# chat.py: avvio a freddo del circuit breaker, con un finto MySQL.
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import chat
+from chat_db import CircuitBreaker, EsecutoreDB, PoolConnessioni
+
+
+class FintaConnessione:
+    def is_connected(self):
+        return True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def finto_mysql(monkeypatch):
+    """Breaker aperto come all'avvio; `stato["latenza"]` e `stato["giu"]` decidono il DB."""
+    stato = {"latenza": 0.0, "giu": False, "connessioni": 0}
+
+    def connetti():
+        time.sleep(stato["latenza"])
+        if stato["giu"]:
+            raise OSError("MySQL giù")
+        stato["connessioni"] += 1
+        return FintaConnessione()
+
+    breaker = CircuitBreaker(soglia_errori=3, timeout_apertura=30, aperto=True)
+    monkeypatch.setattr(chat, "MYSQL_DRIVER", True)
+    monkeypatch.setattr(chat, "BREAKER_DB", breaker)
+    monkeypatch.setattr(chat, "DB_POOL", PoolConnessioni(connetti, breaker=breaker))
+    monkeypatch.setattr(chat, "ESECUTORE_DB", EsecutoreDB(max_thread=2, timeout=0.5))
+    return stato
+
+
+def test_prima_richiesta_usa_gia_il_db(finto_mysql):
+    assert chat.mysql_available()
+    assert chat.BREAKER_DB.stato == CircuitBreaker.CHIUSO
+    assert finto_mysql["connessioni"] == 1
+
+
+def test_prima_richiesta_async(finto_mysql):
+    assert asyncio.run(chat.mysql_available_async())
+
+
+def test_richieste_contemporanee_aspettano_la_stessa_sonda(finto_mysql):
+    finto_mysql["latenza"] = 0.1
+    risultati = []
+    thread = [threading.Thread(target=lambda: risultati.append(chat.mysql_available())) for _ in range(4)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    assert risultati == [True] * 4
+    assert finto_mysql["connessioni"] == 1
+
+
+def test_db_lento_fallback_entro_il_timeout(finto_mysql):
+    finto_mysql["latenza"] = 1.0
+    t0 = time.monotonic()
+    assert not chat.mysql_available()
+    assert time.monotonic() - t0 < 0.9
+    # la sonda finisce in background e chiude il circuito
+    time.sleep(0.8)
+    assert chat.mysql_available()
+
+
+def test_db_giu_si_riprova_solo_dopo_il_timeout(finto_mysql):
+    finto_mysql["giu"] = True
+    assert not chat.mysql_available()
+    assert chat.BREAKER_DB.stato == CircuitBreaker.APERTO
+    # circuito aperto: nessuna attesa e nessuna nuova sonda
+    t0 = time.monotonic()
+    assert not chat.mysql_available()
+    assert time.monotonic() - t0 < 0.05
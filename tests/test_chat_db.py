@@ -0,0 +1,262 @@
+# Pool connessioni e cache intenti senza MySQL: sqlite3 in memoria o un
+# finto connettore, orologio finto per il TTL.
+
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from chat_db import CacheIntenti, CircuitBreaker, CircuitoAperto, EsecutoreDB, PoolConnessioni, righe_dict
+
+
+class Orologio:
+    def __init__(self):
+        self.adesso = 0.0
+
+    def __call__(self):
+        return self.adesso
+
+
+class FintaConnessione:
+    def __init__(self):
+        self.viva = True
+        self.chiusa = False
+        self.rollback_fatti = 0
+
+    def is_connected(self):
+        return self.viva
+
+    def rollback(self):
+        self.rollback_fatti += 1
+
+    def close(self):
+        self.chiusa = True
+
+
+def pool_finto(dimensione=2, breaker=None):
+    aperte = []
+
+    def connetti():
+        aperte.append(FintaConnessione())
+        return aperte[-1]
+
+    return PoolConnessioni(connetti, dimensione=dimensione, breaker=breaker), aperte
+
+
+# ---------------------------------------------------
+# POOL
+# ---------------------------------------------------
+
+def test_pool_sqlite_riusa_la_connessione():
+    pool = PoolConnessioni(lambda: sqlite3.connect(":memory:"), dimensione=2)
+    with pool.connessione() as conn:
+        conn.execute("CREATE TABLE ai_intenti (id INTEGER, attivo INTEGER)")
+        conn.execute("INSERT INTO ai_intenti VALUES (1, 1)")
+        # il pool fa rollback al rilascio
+        conn.commit()
+        prima = conn
+    with pool.connessione() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM ai_intenti WHERE attivo=1")
+        assert righe_dict(cur) == [{"id": 1, "attivo": 1}]
+    assert conn is prima
+    assert pool.aperte == 1
+
+
+def test_pool_restituisce_con_rollback():
+    pool, aperte = pool_finto()
+    with pool.connessione():
+        pass
+    assert aperte[0].rollback_fatti == 1
+    assert not aperte[0].chiusa
+
+
+def test_pool_connessioni_contemporanee():
+    pool, aperte = pool_finto(dimensione=2)
+    with pool.connessione() as a, pool.connessione() as b:
+        assert a is not b
+    # tornano entrambe nel pool
+    with pool.connessione() as c, pool.connessione() as d:
+        assert {id(c), id(d)} == {id(a), id(b)}
+    assert len(aperte) == 2
+    assert pool.aperte == 2
+
+
+def test_pool_scarta_la_connessione_rotta():
+    pool, aperte = pool_finto()
+    with pool.connessione() as conn:
+        pass
+    conn.viva = False
+    with pool.connessione() as nuova:
+        assert nuova is not conn
+    assert conn.chiusa
+    assert len(aperte) == 2
+    assert pool.aperte == 1
+
+
+def test_pool_chiude_la_connessione_se_la_query_fallisce():
+    pool, aperte = pool_finto()
+    with pytest.raises(RuntimeError):
+        with pool.connessione():
+            raise RuntimeError("query fallita")
+    assert aperte[0].chiusa
+    assert pool.aperte == 0
+    with pool.connessione() as conn:
+        assert conn is not aperte[0]
+    assert pool.aperte == 1
+
+
+def test_pool_non_tiene_piu_di_dimensione_connessioni():
+    pool, aperte = pool_finto(dimensione=1)
+    # il pool non limita le connessioni contemporanee, solo quelle inattive
+    with pool.connessione(), pool.connessione(), pool.connessione():
+        assert pool.aperte == 3
+    assert sum(c.chiusa for c in aperte) == 2
+    assert pool.aperte == 1
+    pool.svuota()
+    assert pool.aperte == 0
+
+
+def test_pool_con_circuito_aperto():
+    orologio = Orologio()
+    breaker = CircuitBreaker(soglia_errori=1, timeout_apertura=30, orologio=orologio)
+
+    def connetti():
+        raise OSError("MySQL giù")
+
+    pool = PoolConnessioni(connetti, breaker=breaker)
+    with pytest.raises(OSError):
+        with pool.connessione():
+            pass
+    assert pool.aperte == 0
+    with pytest.raises(CircuitoAperto):
+        with pool.connessione():
+            pass
+
+
+# ---------------------------------------------------
+# CACHE INTENTI
+# ---------------------------------------------------
+
+INTENTI = [{"id": 1, "esempi_domande": "Ciao\nBuongiorno", "esempi_risposte": "Ciao!"}]
+
+
+def cache_finta(ttl=300.0, righe=INTENTI):
+    orologio = Orologio()
+    chiamate = []
+
+    def carica():
+        chiamate.append(orologio())
+        return righe
+
+    return CacheIntenti(carica, ttl=ttl, orologio=orologio), orologio, chiamate
+
+
+def test_cache_prepara_gli_intenti():
+    cache, _, _ = cache_finta()
+    intenti = cache.intenti()
+    assert intenti[0]["_esempi"] == ("ciao", "buongiorno")
+    assert intenti.indice is not None
+
+
+def test_cache_non_ricarica_entro_il_ttl():
+    cache, orologio, chiamate = cache_finta(ttl=300)
+    cache.intenti()
+    orologio.adesso = 299
+    assert cache.fresca()
+    cache.intenti()
+    assert chiamate == [0.0]
+
+
+def test_cache_ricarica_dopo_il_ttl():
+    cache, orologio, chiamate = cache_finta(ttl=300)
+    cache.intenti()
+    orologio.adesso = 300
+    assert not cache.fresca()
+    cache.intenti()
+    assert chiamate == [0.0, 300]
+    assert cache.ricariche == 2
+
+
+def test_cache_invalida():
+    cache, _, chiamate = cache_finta()
+    cache.intenti()
+    cache.invalida()
+    cache.intenti()
+    assert len(chiamate) == 2
+
+
+def test_cache_dopo_un_errore_riprova_presto():
+    orologio = Orologio()
+    esiti = [INTENTI, OSError("MySQL giù"), INTENTI]
+
+    def carica():
+        esito = esiti.pop(0)
+        if isinstance(esito, Exception):
+            raise esito
+        return esito
+
+    cache = CacheIntenti(carica, ttl=300, riprova=30, orologio=orologio)
+    cache.intenti()
+    orologio.adesso = 300
+    # ricarica fallita: restano gli ultimi intenti, ma solo per `riprova` secondi
+    assert cache.intenti()[0]["id"] == 1
+    orologio.adesso = 329
+    assert cache.fresca()
+    orologio.adesso = 330
+    assert not cache.fresca()
+    cache.intenti()
+    assert esiti == []
+    # ricarica riuscita: di nuovo un ttl intero
+    orologio.adesso = 629
+    assert cache.fresca()
+
+
+def test_cache_senza_righe_non_aspetta_il_ttl():
+    orologio = Orologio()
+    cache = CacheIntenti(lambda: None, ttl=300, riprova=30, orologio=orologio)
+    assert cache.intenti() == []
+    orologio.adesso = 30
+    assert not cache.fresca()
+
+
+def test_cache_riprova_mai_oltre_il_ttl():
+    orologio = Orologio()
+    cache = CacheIntenti(lambda: None, ttl=5, riprova=30, orologio=orologio)
+    cache.intenti()
+    orologio.adesso = 5
+    assert not cache.fresca()
+
+
+# ---------------------------------------------------
+# ESECUTORE CON TIMEOUT
+# ---------------------------------------------------
+
+def test_esecutore_db_bloccato_una_sola_chiamata_in_corso():
+    sblocca = threading.Event()
+    chiamate = []
+
+    def ricarica():
+        chiamate.append(1)
+        sblocca.wait(5)
+        return "intenti"
+
+    esecutore = EsecutoreDB(max_thread=2, timeout=0.05)
+    for _ in range(5):
+        with pytest.raises(TimeoutError):
+            esecutore.esegui(ricarica)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(esecutore.esegui_async(ricarica))
+    # niente coda: le richieste aspettano la stessa ricarica
+    assert len(chiamate) == 1
+    assert esecutore._pool._work_queue.qsize() == 0
+
+    sblocca.set()
+    esecutore.timeout = 5
+    assert esecutore.esegui(ricarica) == "intenti"
+    # conclusa la precedente, la successiva ne avvia una nuova
+    prima = len(chiamate)
+    assert esecutore.esegui(ricarica) == "intenti"
+    assert len(chiamate) == prima + 1
@@ -0,0 +1,47 @@
+# Scadenze della dispensa: date non valide e cache delle risposte di /ai/ricette.
+
+import datetime
+
+import pytest
+
+import app as A
+from dispensa_ai import DispensaScadenze, data_scadenza
+
+AUTH = {"Authorization": "Bearer " + A.API_KEY}
+
+
+@pytest.fixture
+def client():
+    return A.app.test_client()
+
+
+def tra(giorni):
+    return (datetime.date.today() + datetime.timedelta(days=giorni)).isoformat()
+
+
+@pytest.mark.parametrize("valore", [None, "", "  ", 5, 3.5, ["2025-01-01"], {"a": 1}, "2025-13-40", "domani"])
+def test_data_scadenza_non_valida(valore):
+    assert data_scadenza(valore) is None
+
+
+def test_data_scadenza_valida():
+    assert data_scadenza(" 2025-11-13 ") == datetime.date(2025, 11, 13)
+
+
+def test_scadenza_numerica_ignorata(client):
+    r = client.post("/ai/ricette", headers=AUTH,
+                    json={"dispensa": [{"nome": "pasta", "scadenza": 5}, {"nome": "latte", "scadenza": tra(1)}]})
+    assert r.status_code == 200
+    assert r.get_json()["alert"] == [DispensaScadenze([{"nome": "latte", "scadenza": tra(1)}]).alert()[0]]
+
+
+def test_cache_rispetta_ordine_a_pari_scadenza(client):
+    def alert(dispensa):
+        r = client.post("/ai/ricette", headers=AUTH, json={"dispensa": dispensa})
+        return r.get_json()["alert"]
+
+    a = alert([{"nome": "latte", "scadenza": tra(1)}, {"nome": "yogurt", "scadenza": tra(1)}])
+    c = alert([{"nome": "yogurt", "scadenza": tra(1)}, {"nome": "latte", "scadenza": tra(1)}])
+    assert a == DispensaScadenze([{"nome": "latte", "scadenza": tra(1)},
+                                  {"nome": "yogurt", "scadenza": tra(1)}]).alert()
+    assert c == a[::-1]
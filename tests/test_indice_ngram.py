@@ -0,0 +1,150 @@
+# indice_ngram.py: stessi risultati della scansione lineare con difflib.
+
+import difflib
+import random
+
+import pytest
+
+import indice_ngram as I
+from indice_ngram import IndiceDizionario, IndiceNgram
+
+# soglie dell'app (0.75, 0.82) e il minimo per cui l'indice è esatto (2/3)
+SOGLIE = (2 / 3, 0.75, 0.82)
+
+
+def lineare(chiavi, query):
+    """Punteggi della vecchia scansione: (query, chiave) per migliore(), (chiave, query) per sopra_soglia()."""
+    sm = difflib.SequenceMatcher(None)
+    diretti, inversi = [], []
+    for k in chiavi:
+        sm.set_seqs(query, k)
+        diretti.append(sm.ratio())
+        sm.set_seqs(k, query)
+        inversi.append(sm.ratio())
+    return diretti, inversi
+
+
+def lineare_migliore(punteggi, soglia):
+    """Il vecchio ciclo: il primo punteggio massimo in ordine vince."""
+    best, best_score = None, 0
+    for i, score in enumerate(punteggi):
+        if score > best_score:
+            best, best_score = i, score
+    return (best, best_score) if best_score >= soglia else (None, None)
+
+
+def chiavi_casuali(rng, n):
+    # alfabeto piccolo e parole ripetute: tanti pareggi e quasi-doppioni
+    parole = ["pasta", "pesto", "pasto", "riso", "risotto", "pane", "panna", "uovo", "uova", "a", "ab"]
+    chiavi = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            chiavi.append(" ".join(rng.choice(parole) for _ in range(rng.randint(1, 3))))
+        else:
+            chiavi.append("".join(rng.choice("abcdeo ") for _ in range(rng.randint(1, 10))))
+    return chiavi
+
+
+def refuso(rng, testo):
+    testo = list(testo)
+    for _ in range(rng.randint(0, 3)):
+        p = rng.randrange(len(testo) + 1)
+        op = rng.random()
+        if op < 0.4 and p < len(testo):
+            testo[p] = rng.choice("abcdeiou")
+        elif op < 0.7 and p < len(testo) and len(testo) > 1:
+            del testo[p]
+        else:
+            testo.insert(p, rng.choice("abcdeiou "))
+    return "".join(testo)
+
+
+def query_casuali(rng, chiavi, n):
+    return [refuso(rng, rng.choice(chiavi)) for _ in range(n)] + chiavi_casuali(rng, n // 4)
+
+
+def verifica(indice, chiavi, queries):
+    for q in queries:
+        diretti, inversi = lineare(chiavi, q)
+        for soglia in SOGLIE:
+            i, score = indice.migliore_id(q, soglia)
+            atteso, score_atteso = lineare_migliore(diretti, soglia)
+            assert i == atteso, (q, soglia)
+            if atteso is not None:
+                assert score == score_atteso
+            sopra = [j for j, score in enumerate(inversi) if score >= soglia]
+            assert sorted(indice.sopra_soglia(q, soglia)) == sopra, (q, soglia)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def motore(request, monkeypatch):
+    if request.param == "numpy":
+        if I.np is None:
+            pytest.skip("NumPy non installato")
+    else:
+        monkeypatch.setattr(I, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_come_la_scansione_lineare(motore, seed):
+    rng = random.Random(seed)
+    chiavi = chiavi_casuali(rng, 400)
+    indice = IndiceNgram(chiavi)
+    verifica(indice, chiavi, query_casuali(rng, chiavi, 80))
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_chiavi_aggiunte_dopo_la_vista(motore, seed, monkeypatch):
+    monkeypatch.setattr(I, "MAX_CHIAVI_NUOVE", 50)
+    rng = random.Random(100 + seed)
+    chiavi = chiavi_casuali(rng, 300)
+    indice = IndiceNgram(chiavi)
+    indice.migliore_id("pasta", 0.75)
+    vista = indice._vista
+
+    # sotto MAX_CHIAVI_NUOVE: stessa vista, le nuove controllate una per una
+    for k in chiavi_casuali(rng, 40):
+        indice.aggiungi(k)
+        chiavi.append(k)
+    verifica(indice, chiavi, query_casuali(rng, chiavi, 40))
+    assert indice._vista is vista
+
+    # oltre: la vista si ricostruisce su tutte le chiavi
+    for k in chiavi_casuali(rng, 60):
+        indice.aggiungi(k)
+        chiavi.append(k)
+    verifica(indice, chiavi, query_casuali(rng, chiavi, 40))
+    if motore == "numpy":
+        assert indice._vista is not vista and indice._vista.n == len(chiavi)
+
+
+def test_pareggi_vince_la_prima_chiave(motore):
+    chiavi = ["abcx", "abcy", "abcz", "xabc"]
+    indice = IndiceNgram(chiavi)
+    assert indice.migliore("abcq", 0.5) == ("abcx", 0.75)
+    indice.aggiungi("abcw")
+    assert indice.migliore("abcw", 0.5) == ("abcw", 1.0)
+    assert indice.migliore("abcv", 0.5) == ("abcx", 0.75)
+
+
+def test_indice_dizionario_segue_il_dict():
+    ricette = {"pasta_al_pesto": 1}
+    indice = IndiceDizionario(ricette, forma=lambda k: k.replace("_", " "))
+    assert indice.migliore("pasta al pesta", 0.75)[0] == "pasta_al_pesto"
+    ricette["pasta_al_pesta"] = 2
+    assert indice.migliore("pasta al pesta", 0.75) == ("pasta_al_pesta", 1.0)
+
+
+def test_user_vince_i_pareggi_sulle_base(monkeypatch):
+    A = pytest.importorskip("app")
+    base = next(k for k in A.ITALIAN_RECIPES if "_" in k)
+    query = base.replace("_", " ") + "x"
+    # stessa chiave nelle ricette utente: stesso punteggio fuzzy
+    user = {base: {"titolo": "dalla dispensa dell'utente", "ingredienti": []}}
+    monkeypatch.setattr(A, "USER_RECIPES", user)
+    monkeypatch.setattr(A, "INDICE_USER_RECIPES", IndiceDizionario(user, forma=lambda k: k.replace("_", " ")))
+
+    assert A.INDICE_USER_RECIPES.migliore(query, 0.75) == A.INDICE_ITALIAN_RECIPES.migliore(query, 0.75)
+    ricetta, sorgente = A.trova_ricetta(query)
+    assert (ricetta, sorgente) == (user[base], "user")
@@ -0,0 +1,47 @@
+# /ai/meal/batch: ogni voce deve valere quanto la chiamata singola a /ai/meal.
+
+import pytest
+
+import app as A
+from ricette_utente import JournalRicette
+
+AUTH = {"Authorization": "Bearer " + A.API_KEY}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # le ricette apprese vanno in un journal temporaneo e non restano in memoria
+    monkeypatch.setattr(A, "JOURNAL_RICETTE", JournalRicette(str(tmp_path / "user_recipes.json"),
+                                                             str(tmp_path / "user_recipes.jsonl")))
+    prima = dict(A.USER_RECIPES)
+    yield A.app.test_client()
+    A.JOURNAL_RICETTE.flush()
+    A.USER_RECIPES.clear()
+    A.USER_RECIPES.update(prima)
+
+
+def singole(client, voci):
+    return [client.post("/ai/meal", json=v, headers=AUTH).get_json() for v in voci]
+
+
+def batch(client, voci):
+    return client.post("/ai/meal/batch", json={"alimenti": voci}, headers=AUTH).get_json()
+
+
+@pytest.mark.parametrize("voci", [
+    [{"alimento": "mela", "quantita": "150 g"}, {"alimento": "mela"}],
+    [{"alimento": "una mela", "quantita": "150 g"}, {"alimento": "una mela", "quantita": "2"}],
+    [{"alimento": "mela"}, {"alimento": "mela", "quantita": "300 g", "porzioni": 2}],
+])
+def test_stesso_nome_quantita_diverse(client, voci):
+    attese = singole(client, voci)
+    A.USER_RECIPES.clear()
+    risultati = batch(client, voci)["risultati"]
+    assert risultati == attese
+    assert risultati[0]["kcal_totali"] != risultati[1]["kcal_totali"]
+
+
+def test_mela_150g_poi_senza_quantita(client):
+    risultati = batch(client, [{"alimento": "mela", "quantita": "150 g"}, {"alimento": "mela"}])["risultati"]
+    assert [r["kcal_totali"] for r in risultati] == [78.0, 52.0]
+    assert [r["new_recipe"] for r in risultati] == [True, True]
@@ -0,0 +1,91 @@
+# motore_copertura.py: NumPy e Counter danno la stessa classifica, e quella
+# del vecchio calcolo ricetta per ricetta (copertura_ids + sort stabile).
+
+import random
+
+import pytest
+
+import motore_copertura as M
+from motore_copertura import PostingIngredienti
+from vocabolario_ingredienti import copertura_ids
+
+MOTORI = ["python"] + (["numpy"] if M.np is not None else [])
+
+
+def con_motore(monkeypatch, motore):
+    monkeypatch.setattr(M, "MOTORE", motore)
+
+
+def riferimento(ids_ricette, coperti, k, escludi=None):
+    """Ogni ricetta valutata con copertura_ids, poi sort stabile decrescente."""
+    punteggi = [(r, copertura_ids(ids, coperti)) for r, ids in enumerate(ids_ricette)]
+    ordinati = sorted((v for v in punteggi if v[1] > 0), key=lambda v: -v[1])
+    if escludi is not None:
+        ordinati = [v for v in ordinati if not escludi(v[0])]
+    return ordinati[:k]
+
+
+def catalogo_casuale(rng, n_ricette, n_ingredienti):
+    ids = []
+    for _ in range(n_ricette):
+        n = rng.choice([1, 2, 3, 4, 5, 7, 9, 12, 25, 50])
+        ids.append([rng.randrange(n_ingredienti) for _ in range(n)])
+    return ids
+
+
+@pytest.mark.parametrize("motore", MOTORI)
+def test_come_il_vecchio_calcolo_sul_catalogo(monkeypatch, motore):
+    A = pytest.importorskip("app")
+    con_motore(monkeypatch, motore)
+    catalogo = A.CATALOGO_RICETTE.snapshot()
+    ids_ricette = [r["ingredienti_id"] for r in catalogo.ricette]
+    ingredienti = sorted({i for r in catalogo.ricette for i in r["ingredienti"]})
+    rng = random.Random(7)
+    for _ in range(200):
+        dispensa = [A.normalizza(x) for x in rng.sample(ingredienti, rng.randint(0, 8))]
+        coperti = catalogo.vocabolario.risolvi_dispensa(dispensa)
+        k = rng.randint(1, len(ids_ricette))
+        escludi = (lambda r: r % 3 == 0) if rng.random() < 0.5 else None
+        assert catalogo.posting.migliori(coperti, k, escludi) == riferimento(ids_ricette, coperti, k, escludi)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_motori_uguali(monkeypatch, seed):
+    if M.np is None:
+        pytest.skip("NumPy non installato")
+    rng = random.Random(seed)
+    ids_ricette = catalogo_casuale(rng, 3000, 300)
+    posting = PostingIngredienti(ids_ricette, 300)
+    for _ in range(100):
+        coperti = set(rng.sample(range(300), rng.randint(1, 60)))
+        pesi = {i: rng.choice([1.0, 1.0, 1.2857142857142858, 1.5714285714285714, 2.0]) for i in coperti}
+        k = rng.randint(1, 50)
+        escludi = (lambda r: r % 5 == 0) if rng.random() < 0.5 else None
+        risultati = {}
+        for motore in ("python", "numpy"):
+            con_motore(monkeypatch, motore)
+            risultati[motore] = (posting.migliori(coperti, k, escludi),
+                                 posting.migliori_pesati(pesi, k, escludi))
+        assert risultati["python"] == risultati["numpy"]
+        assert risultati["python"][0] == riferimento(ids_ricette, coperti, k, escludi)
+
+
+@pytest.mark.parametrize("motore", MOTORI)
+def test_pesi_a_uno_come_migliori(monkeypatch, motore):
+    con_motore(monkeypatch, motore)
+    # 29/50 * 100 = 57.99999999999999: la copertura tronca a 57, e così il punteggio
+    ids_ricette = [list(range(50)), list(range(100, 150)), [0, 1, 2], [0, 200]]
+    posting = PostingIngredienti(ids_ricette, 201)
+    coperti = set(range(29)) | set(range(100, 129))
+    assert posting.migliori(coperti, 10) == [(2, 100), (0, 57), (1, 57), (3, 50)]
+    pesi = dict.fromkeys(coperti, 1.0)
+    assert posting.migliori_pesati(pesi, 10) == [(r, c, c) for r, c in posting.migliori(coperti, 10)]
+
+    rng = random.Random(3)
+    ids_ricette = catalogo_casuale(rng, 2000, 200)
+    posting = PostingIngredienti(ids_ricette, 200)
+    for _ in range(50):
+        coperti = set(rng.sample(range(200), rng.randint(1, 80)))
+        k = rng.randint(1, 100)
+        pesati = posting.migliori_pesati(dict.fromkeys(coperti, 1.0), k)
+        assert pesati == [(r, c, c) for r, c in posting.migliori(coperti, k)]
@@ -0,0 +1,52 @@
+# /ai/piano: validazione dei parametri e kcal stimate.
+
+import pytest
+
+import app as A
+from piano_pasti import PianoPasti
+
+AUTH = {"Authorization": "Bearer " + A.API_KEY}
+
+
+@pytest.fixture
+def client():
+    return A.app.test_client()
+
+
+@pytest.mark.parametrize("kcal", ["nan", "inf", "-inf", "NaN", -100, "abc"])
+def test_kcal_giornaliere_non_valide(client, kcal):
+    r = client.post("/ai/piano", json={"dispensa": ["pasta"], "kcal_giornaliere": kcal}, headers=AUTH)
+    assert r.status_code == 400
+    assert r.get_json() == {"error": "PARAMETRI_NON_VALIDI"}
+
+
+def test_kcal_giornaliere_valide(client):
+    r = client.post("/ai/piano", json={"dispensa": ["pasta"], "kcal_giornaliere": "2000", "giorni": 2},
+                    headers=AUTH)
+    assert r.status_code == 200
+    assert len(r.get_json()["piano"]) == 2
+
+
+def test_giornate_con_kcal_parziali(client):
+    r = client.post("/ai/piano", json={"dispensa": ["pasta"], "giorni": 3}, headers=AUTH)
+    for giorno in r.get_json()["piano"]:
+        note = [p for p in giorno["pasti"] if p["kcal_note"]]
+        assert giorno["kcal_stimate"] == round(sum(p["kcal_stimate"] for p in note), 1)
+        assert giorno["kcal_parziali"] == (len(note) < len(giorno["pasti"]))
+
+
+def test_kcal_ignote_fuori_dallo_scarto():
+    ricette = [
+        # kcal ignote: 0 stimate, ma non devono contare come "0 kcal"
+        {"categoria": "Primo", "kcal_stimate": 0.0, "kcal_note": False},
+        {"categoria": "Primo", "kcal_stimate": 245.0, "kcal_note": True},
+    ]
+    # obiettivo 700 → quota pranzo 245: la nota è esatta, l'ignota non
+    # perde punti e vince con la copertura più alta
+    piano = PianoPasti(ricette, {0: 50, 1: 40}, seed=1)
+    assert piano.giorno(["Pranzo"], set(), kcal_giorno=700) == [0]
+    # una nota lontana dall'obiettivo invece perde punti
+    ricette[1]["kcal_stimate"] = 100.0
+    piano = PianoPasti(ricette, {0: 40, 1: 50}, seed=1)
+    assert piano.giorno(["Pranzo"], set(), kcal_giorno=700) == [0]
+    assert piano.giorno(["Pranzo"], set()) == [1]
@@ -0,0 +1,145 @@
+# quantita.py: testo della quantità → grammi.
+
+import re
+
+import pytest
+
+from quantita import PESO_PEZZO_DEFAULT, ParserQuantita
+
+# uovo: 60 g a pezzo; "x" non ha peso → PESO_PEZZO_DEFAULT
+PESI = {"uovo": 60.0}
+
+
+@pytest.fixture
+def parser():
+    return ParserQuantita(PESI, lambda alimento: alimento)
+
+
+def vecchia_quantita(alimento, quantita):
+    """quantita_to_grams prima di quantita.py, per i casi che non devono cambiare."""
+    if isinstance(quantita, (int, float)):
+        s = str(quantita)
+    else:
+        s = str(quantita or "").lower().strip()
+    m = re.search(r"([0-9]+(?:\.[0-9]+)?)", s)
+    if not m:
+        return 0.0
+    num = float(m.group(1))
+    if "kg" in s:
+        return num * 1000
+    if "mg" in s:
+        return num / 1000
+    if "ml" in s:
+        return num
+    if "l" in s and "ml" not in s:
+        return num * 1000
+    if "g" in s:
+        return num
+    if "pz" in s or "pezzo" in s or "pezzi" in s or num <= 5:
+        return PESI.get(alimento, PESO_PEZZO_DEFAULT) * num
+    return num
+
+
+@pytest.mark.parametrize("quantita, grammi", [
+    ("200 g", 200), ("200g", 200), ("200 gr", 200), ("1 grammo", 1),
+    ("2 hg", 200), ("1 etto", 100), ("3 etti", 300),
+    ("1 kg", 1000), ("1,5 kg", 1500), ("1.5 kg", 1500), ("2 chili", 2000),
+    ("250 mg", 0.25),
+    ("250 ml", 250), ("2 cl", 20), ("3 dl", 300), ("1 l", 1000), ("1 lt", 1000), ("2 litri", 2000),
+    ("g 200", 200),
+])
+def test_unita(parser, quantita, grammi):
+    assert parser.grammi("x", quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("quantita, grammi", [
+    ("1 pizzico", 1), ("1 cucchiaino", 5), ("2 cucchiaini", 10), ("1 spicchio", 5),
+    ("1 cucchiaio", 15), ("2 cucchiai", 30), ("1 tazzina", 50),
+    ("1 bicchiere", 200), ("2 bicchieri", 400), ("1 tazza", 250),
+    # l'unità è una parola intera: "olio" non è un litro
+    ("1 cucchiaio di olio", 15), ("olio 20", 20),
+])
+def test_misure_da_cucina(parser, quantita, grammi):
+    assert parser.grammi("x", quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("quantita, grammi", [
+    ("1/2 kg", 500), ("1 1/2 kg", 1500), ("½ kg", 500), ("1½ kg", 1500),
+    ("1/2", 50), ("1 1/2", 150), ("3/4 l", 750),
+    ("1/0", 100),
+])
+def test_frazioni(parser, quantita, grammi):
+    assert parser.grammi("x", quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("quantita, grammi", [
+    # punto medio, poi la regola dei pezzi o l'unità
+    ("2-3", 150), ("2 – 3", 150), ("2 a 3", 150), ("3 o 4", 210),
+    ("200-300 g", 250), ("1-2 kg", 1500), ("tre o quattro", 210),
+])
+def test_intervalli(parser, quantita, grammi):
+    assert parser.grammi("uovo", quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("quantita, grammi", [
+    ("mezzo kg", 500), ("un etto", 100), ("un kg", 1000), ("due etti", 200),
+    ("un bicchiere", 200), ("due", 120), ("mezza", 30), ("uno", 60),
+])
+def test_numeri_in_parola(parser, quantita, grammi):
+    assert parser.grammi("uovo", quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("alimento, quantita, grammi", [
+    ("uovo", "2 pz", 120), ("uovo", "1 pezzo", 60), ("uovo", "3 pezzi", 180),
+    ("uovo", "2 fette", 120), ("uovo", "1 porzione", 60), ("uovo", "10 porzioni", 600),
+    ("x", "2 pz", 2 * PESO_PEZZO_DEFAULT),
+])
+def test_pezzi(parser, alimento, quantita, grammi):
+    assert parser.grammi(alimento, quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("alimento, quantita, grammi", [
+    ("uovo", "1", 60), ("uovo", "5", 300), ("uovo", "6", 6), ("uovo", "2.5", 150),
+    ("x", "3", 300), ("x", "150", 150),
+    ("uovo", 3, 180), ("uovo", 150, 150), ("x", 2.5, 250),
+])
+def test_senza_unita_fino_a_5_pezzi(parser, alimento, quantita, grammi):
+    assert parser.grammi(alimento, quantita) == pytest.approx(grammi)
+
+
+@pytest.mark.parametrize("quantita", ["", None, "q.b.", "a piacere", "0"])
+def test_senza_numero(parser, quantita):
+    assert parser.grammi("x", quantita) == 0.0
+
+
+@pytest.mark.parametrize("alimento, quantita", [
+    ("x", "200 g"), ("x", "200g"), ("x", "150 gr"), ("x", "1 kg"), ("x", "1.5 kg"),
+    ("x", "250 mg"), ("x", "500 ml"), ("x", "2 l"), ("x", "1 litro"),
+    ("x", "150"), ("x", "3"), ("x", 150), ("x", 2), ("x", ""), ("x", None),
+    ("uovo", "2"), ("uovo", "5"), ("uovo", "6"), ("uovo", "2 pz"), ("uovo", "1 pezzo"),
+    ("uovo", "3 pezzi"), ("uovo", "2.5"),
+])
+def test_come_prima(parser, alimento, quantita):
+    # gli ingressi che il vecchio parser leggeva bene danno gli stessi grammi
+    assert parser.grammi(alimento, quantita) == pytest.approx(vecchia_quantita(alimento, quantita))
+
+
+@pytest.mark.parametrize("alimento, quantita, prima, ora", [
+    ("x", "1 bicchiere di latte", 1000, 200),  # la "l" di latte era un litro
+    ("x", "1 bicchiere", 100, 200),            # era un pezzo
+    ("x", "1 cucchiaio di olio", 1000, 15),
+    ("x", "3 dl", 3000, 300),
+    ("x", "1,5 kg", 1000, 1500),
+    ("x", "1/2", 100, 50),
+    ("uovo", "10 porzioni", 10, 600),       # porzione ora è un pezzo
+    ("uovo", "2-3", 120, 150),              # intervallo: punto medio
+])
+def test_cambiati_di_proposito(parser, alimento, quantita, prima, ora):
+    assert vecchia_quantita(alimento, quantita) == pytest.approx(prima)
+    assert parser.grammi(alimento, quantita) == pytest.approx(ora)
+
+
+def test_cache_e_batch(parser):
+    voci = [("uovo", "2"), ("x", "200 g"), ("uovo", "2"), ("uovo", " 2 ")]
+    assert parser.grammi_molti(voci) == [120, 200, 120, 120]
+    assert set(parser._analisi) == {"2", "200 g"}
@@ -0,0 +1,102 @@
+# /ai/ricetta_singola: "rigenera" con il cursore.
+
+import shutil
+
+import pytest
+
+import app as A
+from catalogo_ricette import CatalogoRicette
+
+AUTH = {"Authorization": "Bearer " + A.API_KEY}
+RICHIESTA = {"pasto": "Pranzo", "dispensa": ["pasta", "pomodoro"]}
+
+
+@pytest.fixture
+def client():
+    A.CLASSIFICHE_SINGOLE.svuota()
+    return A.app.test_client()
+
+
+def chiedi(client, cursore=None, **altri):
+    corpo = dict(RICHIESTA, **altri)
+    if cursore is not None:
+        corpo["cursore"] = cursore
+    return client.post("/ai/ricetta_singola", json=corpo, headers=AUTH)
+
+
+def classifica(client):
+    """Tutte le ricette seguendo i cursori, fino al ritorno alla prima."""
+    r = chiedi(client).get_json()
+    titoli = [r["ricetta"]["titolo"]]
+    cursori = [r["cursore"]]
+    while not r["cursore"].endswith(".0"):
+        r = chiedi(client, r["cursore"]).get_json()
+        titoli.append(r["ricetta"]["titolo"])
+        cursori.append(r["cursore"])
+    return titoli, cursori
+
+
+def test_pagine_e_ultima_pagina(client):
+    titoli, cursori = classifica(client)
+    n = len(titoli)
+    assert 1 < n <= A.LUNGHEZZA_CLASSIFICA
+    assert len(set(titoli)) == n
+    # cursore i → ricetta i, posizioni consecutive
+    assert [c.rsplit(".", 1)[1] for c in cursori] == [str(i) for i in range(1, n)] + ["0"]
+    # prima le ricette che usano la dispensa
+    prima = chiedi(client).get_json()["ricetta"]
+    assert prima["copertura"] > 0
+
+    # confine di pagina: la ricetta 2 è quella dopo la 1 e prima della 3
+    r = chiedi(client, cursori[0]).get_json()
+    assert r["ricetta"]["titolo"] == titoli[1] and r["cursore"] == cursori[1]
+
+    # dall'ultima si torna alla prima
+    r = chiedi(client, cursori[-2]).get_json()
+    assert r["ricetta"]["titolo"] == titoli[-1]
+    assert chiedi(client, r["cursore"]).get_json()["ricetta"]["titolo"] == titoli[0]
+
+
+@pytest.mark.parametrize("cursore", [
+    "garbage", "abc.1", ".1", "x" * 32 + ".1", "0" * 32 + ".", "0" * 32 + ".-1",
+    "0" * 32 + ".1.2", "0" * 32 + ".99999", 5, ["a"], {"a": 1},
+])
+def test_cursore_non_valido(client, cursore):
+    r = chiedi(client, cursore)
+    assert r.status_code == 400
+    assert r.get_json() == {"error": "CURSORE_NON_VALIDO"}
+
+
+def test_cursore_manomesso_oltre_la_classifica(client):
+    cursore = chiedi(client).get_json()["cursore"]
+    token = cursore.split(".")[0]
+    assert chiedi(client, f"{token}.{A.LUNGHEZZA_CLASSIFICA}").status_code == 400
+
+
+def test_cursore_di_un_altra_richiesta_riparte(client):
+    titoli, cursori = classifica(client)
+    r = chiedi(client, cursori[2], dispensa=["riso"])
+    assert r.status_code == 200
+    assert r.get_json()["ricetta"] == chiedi(client, dispensa=["riso"]).get_json()["ricetta"]
+
+
+def test_cursore_dopo_il_ricaricamento_del_catalogo(client, tmp_path, monkeypatch):
+    titoli, cursori = classifica(client)
+
+    # stesso CSV con una ricetta in più: cambia la firma, quindi la chiave
+    csv = tmp_path / "recipes.csv"
+    shutil.copy(A.RECIPES_CSV_PATH, csv)
+    with open(csv, "a", encoding="utf-8") as f:
+        f.write('Pasta pomodoro e basilico,"pasta,pomodoro,basilico",10,"Nuova."\n')
+    catalogo = CatalogoRicette(str(csv), prepara=A.prepara_catalogo)
+    assert catalogo.snapshot().firma != A.CATALOGO_RICETTE.snapshot().firma
+    monkeypatch.setattr(A, "CATALOGO_RICETTE", catalogo)
+
+    vecchio = cursori[2]
+    r = chiedi(client, vecchio)
+    assert r.status_code == 200
+    nuovo = r.get_json()
+    # riparte dalla prima ricetta della nuova classifica, con un cursore nuovo
+    assert nuovo["ricetta"] == chiedi(client).get_json()["ricetta"]
+    assert nuovo["cursore"].split(".")[0] != vecchio.split(".")[0]
+    assert nuovo["cursore"].endswith(".1")
@@ -0,0 +1,131 @@
+# ricette_utente.py: journal append-only, replay, compattazione e crash.
+
+import json
+import threading
+import time
+
+import pytest
+
+import ricette_utente as RU
+from ricette_utente import JournalRicette, carica_ricette_utente
+
+
+@pytest.fixture
+def percorsi(tmp_path):
+    return str(tmp_path / "user_recipes.json"), str(tmp_path / "user_recipes.jsonl")
+
+
+def ricetta(titolo, peso=100):
+    return {"titolo": titolo, "peso_totale_piatto_g": peso,
+            "ingredienti": [{"nome": titolo.lower(), "quantita_g": peso}]}
+
+
+def righe(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_append_e_replay(percorsi):
+    snapshot, journal = percorsi
+    j = JournalRicette(snapshot, journal)
+    j.registra("mela", ricetta("Mela", 150))
+    j.registra_molte([("pera", ricetta("Pera")), ("mela", ricetta("Mela", 200))])
+    j.flush()
+
+    assert [json.loads(r)["key"] for r in righe(journal)] == ["mela", "pera", "mela"]
+    # l'ultima scrittura vince
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela", 200), "pera": ricetta("Pera")}
+
+
+def test_replay_sopra_lo_snapshot(percorsi):
+    snapshot, journal = percorsi
+    with open(snapshot, "w", encoding="utf-8") as f:
+        json.dump({"mela": ricetta("Mela"), "kiwi": ricetta("Kiwi")}, f)
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "mela", "ricetta": ricetta("Mela", 300)}) + "\n")
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela", 300), "kiwi": ricetta("Kiwi")}
+
+
+def test_compattazione_dopo_n_righe(percorsi):
+    snapshot, journal = percorsi
+    j = JournalRicette(snapshot, journal)
+    voci = [(f"r{i}", ricetta(f"R{i}")) for i in range(RU.COMPATTA_OGNI_RIGHE - 1)]
+    j.registra_molte(voci)
+    j.flush()
+    assert len(righe(journal)) == RU.COMPATTA_OGNI_RIGHE - 1
+
+    j.registra("ultima", ricetta("Ultima"))
+    j.flush()
+    assert righe(journal) == []
+    with open(snapshot, encoding="utf-8") as f:
+        assert json.load(f) == dict(voci, ultima=ricetta("Ultima"))
+    assert len(carica_ricette_utente(snapshot, journal)) == RU.COMPATTA_OGNI_RIGHE
+
+
+def test_compattazione_a_tempo(percorsi, monkeypatch):
+    snapshot, journal = percorsi
+    monkeypatch.setattr(RU, "COMPATTA_OGNI_SEC", 0.05)
+    j = JournalRicette(snapshot, journal)
+    j.registra("mela", ricetta("Mela"))
+    j.flush()
+
+    limite = time.monotonic() + 5
+    while righe(journal):
+        assert time.monotonic() < limite, "journal non compattato"
+        time.sleep(0.02)
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela")}
+
+
+def test_riga_troncata_dopo_un_crash(percorsi):
+    snapshot, journal = percorsi
+    buona = json.dumps({"key": "mela", "ricetta": ricetta("Mela")})
+    troncata = json.dumps({"key": "pera", "ricetta": ricetta("Pera")})[:25]
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(buona + "\n" + troncata)
+
+    # la riga a metà si salta
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela")}
+
+    # e la prossima scrittura non ci si attacca
+    j = JournalRicette(snapshot, journal)
+    j.registra("kiwi", ricetta("Kiwi"))
+    j.flush()
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela"), "kiwi": ricetta("Kiwi")}
+
+    j.compatta()
+    assert righe(journal) == []
+    assert carica_ricette_utente(snapshot, journal) == {"mela": ricetta("Mela"), "kiwi": ricetta("Kiwi")}
+
+
+def test_due_journal_concorrenti(percorsi, monkeypatch):
+    # come due worker gunicorn: stessi file, append sotto lo stesso LockFile
+    snapshot, journal = percorsi
+    monkeypatch.setattr(RU, "COMPATTA_OGNI_RIGHE", 10 ** 9)
+    journal_a = JournalRicette(snapshot, journal)
+    journal_b = JournalRicette(snapshot, journal)
+    # righe grandi: senza lock due append si mescolerebbero
+    testo = "x" * 20000
+    n = 100
+
+    def scrivi(j, nome):
+        for i in range(n):
+            r = ricetta(nome)
+            r["descrizione"] = testo
+            if i % 10:
+                j.registra(f"{nome}{i}", r)
+            else:
+                j.registra_molte([(f"{nome}{i}", r)])
+
+    thread = [threading.Thread(target=scrivi, args=(journal_a, "a")),
+              threading.Thread(target=scrivi, args=(journal_b, "b"))]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    journal_a.flush()
+    journal_b.flush()
+
+    voci = [json.loads(r) for r in righe(journal)]
+    assert len(voci) == 2 * n
+    assert {v["key"] for v in voci} == {f"{x}{i}" for x in "ab" for i in range(n)}
+    assert all(v["ricetta"]["descrizione"] == testo for v in voci)
@@ -0,0 +1,112 @@
+# ================================================================
+#  GoFoody AI - vocabolario_ingredienti.py (ingredienti → id interi)
+# ================================================================
+
+from collections import defaultdict
+
+from indice_ngram import IndiceNgram
+
+SOGLIA_FUZZY = 0.75
+MAX_VOCI_CACHE = 4096
+
+
+def _pulisci(termine):
+    return (termine or "").lower().strip()
+
+
+class VocabolarioIngredienti:
+    """
+    Ogni ingrediente delle ricette riceve un id intero al caricamento.
+    Per ogni id sono precalcolati:
+      - la forma canonica (canonicalizza_alimento, che applica già
+        ALIMENTI_ALIAS) e le classi di id con lo stesso canonico
+      - i vicini diretti da EQUIVALENZE, in entrambe le direzioni
+      - un indice n-grammi per il fallback fuzzy
+
+    Per una richiesta basta risolvere una volta ogni voce della dispensa
+    nell'insieme degli id che copre: la copertura di una ricetta diventa
+    un conteggio di appartenenze a un set.
+    """
+
+    def __init__(self, termini, canonicalizza, equivalenze=None):
+        self.canonicalizza = canonicalizza
+        self.ids = {}
+        self.termini = []
+        for t in termini:
+            self.interna(t)
+
+        # classi per forma canonica
+        self.classi_canon = defaultdict(set)
+        for i, t in enumerate(self.termini):
+            self.classi_canon[canonicalizza(t)].add(i)
+
+        # vicini da EQUIVALENZE: relazione diretta e simmetrica, non
+        # transitiva, esattamente come il confronto ing ↔ disp originale
+        vicini = defaultdict(set)
+        for k, valori in (equivalenze or {}).items():
+            k = _pulisci(k)
+            for v in valori:
+                v = _pulisci(v)
+                if v in self.ids:
+                    vicini[k].add(self.ids[v])
+                if k in self.ids:
+                    vicini[v].add(self.ids[k])
+        self.vicini = dict(vicini)
+
+        self.indice = IndiceNgram(self.termini)
+
+        # voce di dispensa → id coperti: il vocabolario non cambia, le voci
+        # (pasta, pomodoro, ...) si ripetono tra le richieste
+        self._voci = {}
+
+    def __len__(self):
+        return len(self.termini)
+
+    def interna(self, termine):
+        """Id del termine, assegnandone uno nuovo se manca (solo in costruzione)."""
+        t = _pulisci(termine)
+        i = self.ids.get(t)
+        if i is None:
+            i = len(self.termini)
+            self.ids[t] = i
+            self.termini.append(t)
+        return i
+
+    def ids_di(self, ingredienti):
+        """Id degli ingredienti (devono essere stati passati al costruttore)."""
+        return tuple(self.ids[_pulisci(i)] for i in ingredienti)
+
+    def risolvi_voce(self, voce):
+        """Insieme degli id che una voce di dispensa copre."""
+        coperti = self._voci.get(voce)
+        if coperti is None:
+            coperti = frozenset(self._risolvi_voce(voce))
+            if len(self._voci) >= MAX_VOCI_CACHE:
+                self._voci.clear()
+            self._voci[voce] = coperti
+        return coperti
+
+    def _risolvi_voce(self, voce):
+        d = _pulisci(voce)
+        coperti = set()
+
+        i = self.ids.get(d)
+        if i is not None:
+            coperti.add(i)
+        coperti |= self.vicini.get(d, set())
+        coperti |= self.classi_canon.get(self.canonicalizza(voce), set())
+        coperti.update(self.indice.sopra_soglia(d, SOGLIA_FUZZY))
+        return coperti
+
+    def risolvi_dispensa(self, dispensa_norm):
+        coperti = set()
+        for voce in dict.fromkeys(dispensa_norm):
+            coperti |= self.risolvi_voce(voce)
+        return frozenset(coperti)
+
+
+def copertura_ids(ids_ricetta, coperti):
+    if not ids_ricetta:
+        return 0
+    match = sum(1 for i in ids_ricetta if i in coperti)
+    return int((match / len(ids_ricetta)) * 100)